@@ -0,0 +1,182 @@
+import asyncio
+import time
+import psycopg
+
+class AsyncBatchWriter:
+    """Keep several workload batches in flight over a small pool of connections.
+
+    Each connection is a psycopg 3 AsyncConnection in pipeline mode: the
+    INSERT, UPDATE, DELETE and COMMIT of a batch go out back to back instead
+    of waiting a round trip per statement, and every connection works on its
+    own batch concurrently.
+
+    commit_ordering controls how transactions from different connections
+    commit relative to each other:
+      strict       batches commit in the order they were generated. The
+                   statements are flushed first, then COMMIT waits for the
+                   previous batch to commit (one extra round trip).
+      independent  every connection commits as soon as its batch is sent.
+
+    Inserted ids only enter the update pool, and updated ids only enter the
+    delete pool, once their transaction has committed, so no batch waits on
+    row locks held by another in-flight batch. With a key distribution other
+    than fifo, updated ids stay in the pool but are locked (excluded from
+    later updates and deletes) until their batch commits. Otherwise, under
+    strict ordering, a batch holding a row lock while it waits for the
+    previous batch to commit, and the previous batch waiting for that lock,
+    would be a cycle Postgres can't detect. As a last resort a batch that
+    waits commit_wait_timeout seconds for its predecessor rolls back.
+
+    A failed batch rolls back and returns its ids to the pools. If even the
+    rollback fails the connection is dropped and counted in
+    lost_connections; the run stops once every connection is lost.
+    """
+
+    COMMIT_ORDERINGS = ("strict", "independent")
+
+    def __init__(self, generator, connections=4, commit_ordering="strict", commit_wait_timeout=60.0):
+        if commit_ordering not in self.COMMIT_ORDERINGS:
+            raise ValueError(f"Unsupported commit ordering: {commit_ordering}")
+        self.generator = generator
+        self.connections = connections
+        self.commit_ordering = commit_ordering
+        self.commit_wait_timeout = commit_wait_timeout
+        # Set once the batch with that sequence number has committed (strict mode)
+        self.committed = {}
+        self.errors = 0
+        self.lost_connections = 0
+
+    def _build_batch(self, seq):
+        """Generate the next batch's statements, taking ids from the generator's pools"""
+        gen = self.generator
+        insert_count, update_count, delete_count = gen.next_batch_counts()
+        insert_sql = None
+        if insert_count:
+            insert_sql = gen.build_insert_sql(*gen.generate_rows(insert_count))
+
+        update_sql = None
+        ids_to_update = gen.take_update_ids(update_count)
+        if ids_to_update:
+            if gen.update_mode == "per-row":
+                update = gen.build_update_rows(ids_to_update)
+            else:
+                update = gen.build_update(ids_to_update)
+            update_sql = gen.cur.mogrify(*update).decode('utf-8')
+
+        delete_sql = None
+        ids_to_delete = gen.take_delete_ids(delete_count)
+        if ids_to_delete:
+            delete_sql = gen.build_delete_sql(ids_to_delete)
+
+        return seq, insert_sql, update_sql, ids_to_update, delete_sql, ids_to_delete, insert_count
+
+    async def _write_batch(self, conn, batch):
+        seq, insert_sql, update_sql, ids_to_update, delete_sql, ids_to_delete, _ = batch
+        async with conn.pipeline() as pipeline:
+            insert_cur = await conn.execute(insert_sql) if insert_sql else None
+            if update_sql:
+                await conn.execute(update_sql)
+            if delete_sql:
+                await conn.execute(delete_sql)
+            if self.commit_ordering == "strict" and seq > 0:
+                # Flush the statements, then hold COMMIT until the previous batch committed
+                await pipeline.sync()
+                try:
+                    await asyncio.wait_for(self.committed[seq - 1].wait(), self.commit_wait_timeout)
+                except asyncio.TimeoutError:
+                    raise RuntimeError(f"batch {seq - 1} did not commit within "
+                                       f"{self.commit_wait_timeout:.0f}s, rolling back") from None
+            await conn.commit()
+            new_ids = await insert_cur.fetchall() if insert_cur else []
+        return new_ids
+
+    async def _connection_worker(self, conn, batches, on_batch):
+        gen = self.generator
+        while True:
+            item = await batches.get()
+            if item is None:
+                break
+            batch, dispatch_time = item
+            seq, _, _, ids_to_update, _, ids_to_delete, _ = batch
+            try:
+                new_ids = await self._write_batch(conn, batch)
+            except Exception as e:
+                print(f"\n\nBatch {seq} failed: {e}")
+                self.errors += 1
+                lost = None
+                try:
+                    await conn.rollback()
+                except psycopg.Error as rollback_error:
+                    # The server rolls back a broken connection's transaction itself
+                    lost = rollback_error
+                # The rows are unchanged and unlocked again
+                gen.release_ids([], ids_to_update, ids_to_delete)
+                new_ids, ids_to_update, ids_to_delete = [], [], []
+                if lost is not None:
+                    print(f"\n\nConnection lost after batch {seq}: {lost}")
+                    self.lost_connections += 1
+                    return
+            finally:
+                if seq in self.committed:
+                    self.committed[seq].set()
+                    # Nobody waits on older batches any more
+                    self.committed.pop(seq - 1, None)
+
+            # The committed rows are now visible to batches on other connections
+            gen.release_ids(new_ids, ids_to_update)
+            on_batch(len(new_ids), len(ids_to_update), len(ids_to_delete), time.time() - dispatch_time)
+
+    async def _put(self, batches, item, workers):
+        """Queue item for the connections; False if none is left to take it"""
+        while not all(worker.done() for worker in workers):
+            try:
+                await asyncio.wait_for(batches.put(item), 1.0)
+                return True
+            except asyncio.TimeoutError:
+                continue
+        return False
+
+    async def run(self, duration_seconds, on_batch, scheduler=None):
+        """Dispatch batches until duration_seconds elapses, then wait for in-flight ones.
+
+        on_batch(inserts, updates, deletes, batch_elapsed) is called as each
+        batch commits. With a scheduler, batches are dispatched on its
+        open-loop schedule; otherwise the generator's interval is slept
+        between dispatches.
+        """
+        gen = self.generator
+        conns = [await psycopg.AsyncConnection.connect(**gen.db_params) for _ in range(self.connections)]
+        # Bounded so generation never runs far ahead of the connections
+        batches = asyncio.Queue(maxsize=self.connections)
+        workers = [asyncio.create_task(self._connection_worker(conn, batches, on_batch)) for conn in conns]
+        try:
+            start_time = time.time()
+            seq = 0
+            if scheduler:
+                scheduler.start()
+            while time.time() - start_time < duration_seconds:
+                if scheduler:
+                    await scheduler.wait_async()
+                if self.commit_ordering == "strict":
+                    self.committed[seq] = asyncio.Event()
+                batch = self._build_batch(seq)
+                if not await self._put(batches, (batch, time.time()), workers):
+                    gen.release_ids([], batch[3], batch[5])
+                    raise RuntimeError(f"all {self.connections} connections were lost")
+                seq += 1
+                if scheduler:
+                    scheduler.advance(batch[6] + len(batch[3]) + len(batch[5]))
+                else:
+                    await asyncio.sleep(gen.interval)
+        finally:
+            for _ in workers:
+                if not await self._put(batches, None, workers):
+                    break
+            for result in await asyncio.gather(*workers, return_exceptions=True):
+                if isinstance(result, Exception):
+                    print(f"\n\nConnection worker failed: {result}")
+            for conn in conns:
+                await conn.close()
+            if self.errors or self.lost_connections:
+                print(f"\n\n{self.errors} batches failed, {self.lost_connections} of "
+                      f"{self.connections} connections lost")
@@ -1,10 +1,22 @@
 from confluent_kafka import Consumer, KafkaError
 import time
+import csv
 import argparse
+from datetime import datetime
 from aws_msk_iam_sasl_signer import MSKAuthTokenProvider
+from formatting import format_data_rate
+
+def parse_trigger_ts(value):
+    """Epoch seconds, or an ISO-8601 timestamp (naive means local time)"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
 
 class KafkaBackfillCollector:
-    def __init__(self, bootstrap_servers, topic, use_iam=False):
+    def __init__(self, bootstrap_servers, topic, use_iam=False,
+                 timeline_file='backfill_timeline.csv', partitions_file='backfill_partitions.csv',
+                 consumer=None):
         # Common consumer configs - shared with cdc_stats.py
         consumer_config = {
             'bootstrap.servers': ','.join(bootstrap_servers),
@@ -32,58 +44,141 @@ class KafkaBackfillCollector:
                 'security.protocol': 'PLAINTEXT',
             })
 
-        self.consumer = Consumer(consumer_config)
-        self.consumer.subscribe([topic])
+        # A ready-made consumer (e.g. synthetic_load.FakeConsumer) replaces the Kafka one
+        if consumer is not None:
+            self.consumer = consumer
+        else:
+            self.consumer = Consumer(consumer_config)
+            self.consumer.subscribe([topic])
         self.topic = topic
+        self.timeline_file = timeline_file
+        self.partitions_file = partitions_file
 
-    def run(self, backfill_count):
+    def run(self, backfill_count, trigger_ts=None):
+        """Consume backfill_count messages, writing a per-second timeline as they arrive.
+
+        trigger_ts is the epoch time the backfill was started, for time to first message.
+        """
         try:
             message_count = 0
+            byte_count = 0
             start_time = None
             end_time = None
+            # partition -> [messages, bytes, first message time, last message time]
+            partitions = {}
 
             print(f"Starting to collect backfill statistics for {backfill_count} messages...")
 
-            while message_count < backfill_count:
-                msg = self.consumer.poll(1.0)
-                
-                if msg is None:
-                    continue
-                if msg.error():
-                    if msg.error().code() == KafkaError._PARTITION_EOF:
+            timeline_start = time.time()
+            second_messages = 0
+            second_bytes = 0
+            current_second = 0
+
+            with open(self.timeline_file, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['timestamp', 'elapsed_s', 'messages', 'bytes',
+                                 'cumulative_messages', 'cumulative_bytes'])
+
+                def flush_seconds(until_second):
+                    # One row per elapsed second, including seconds without messages
+                    nonlocal second_messages, second_bytes, current_second
+                    while current_second < until_second:
+                        writer.writerow([
+                            datetime.fromtimestamp(timeline_start + current_second + 1).isoformat(),
+                            current_second + 1, second_messages, second_bytes,
+                            message_count, byte_count
+                        ])
+                        if second_messages:
+                            print(f"Processed {message_count} messages "
+                                  f"({second_messages} msg/s, {format_data_rate(second_bytes)})...")
+                        second_messages = 0
+                        second_bytes = 0
+                        current_second += 1
+                    f.flush()
+
+                consumer_error = False
+                while message_count < backfill_count and not consumer_error:
+                    # Never read past the backfill, or live changes after it would be counted
+                    messages = self.consumer.consume(timeout=1.0,
+                                                     num_messages=min(1000, backfill_count - message_count))
+                    now = time.time()
+
+                    # Close out finished seconds before counting this batch
+                    flush_seconds(int(now - timeline_start))
+                    if not messages:
                         continue
-                    else:
-                        print(f"Consumer error: {msg.error()}")
-                        break
-
-                # Record timing for first message
-                if start_time is None:
-                    start_time = time.time()
-
-                message_count += 1
-                
-                # Print progress every 1000 messages
-                if message_count % 1000 == 0:
-                    print(f"Processed {message_count} messages...")
-
-                # Record timing for last message
-                end_time = time.time()
-
-            # Calculate and print statistics
-            if start_time and end_time:
-                total_time = end_time - start_time
-                messages_per_second = message_count / total_time
-                
-                print("\nBackfill Statistics:")
-                print(f"Total messages processed: {message_count}")
-                print(f"Total time elapsed: {total_time:.2f} seconds")
-                print(f"Average throughput: {messages_per_second:.2f} messages/second")
+
+                    for msg in messages:
+                        if msg.error():
+                            if msg.error().code() == KafkaError._PARTITION_EOF:
+                                continue
+                            else:
+                                print(f"Consumer error: {msg.error()}")
+                                consumer_error = True
+                                break
+
+                        # Record timing for first message
+                        if start_time is None:
+                            start_time = now
+
+                        size = len(msg.value() or b'') + len(msg.key() or b'')
+                        message_count += 1
+                        byte_count += size
+                        second_messages += 1
+                        second_bytes += size
+
+                        partition = partitions.get(msg.partition())
+                        if partition is None:
+                            partition = partitions[msg.partition()] = [0, 0, now, now]
+                        partition[0] += 1
+                        partition[1] += size
+                        partition[3] = now
+                        if message_count == backfill_count:
+                            break
+
+                    # Record timing for last message
+                    end_time = now
+
+                # Write the partial last second
+                flush_seconds(current_second + 1)
+
+            self.print_statistics(message_count, byte_count, start_time, end_time, partitions, trigger_ts)
 
         except KeyboardInterrupt:
             print("\nStopping backfill collection...")
         finally:
             self.consumer.close()
 
+    def print_statistics(self, message_count, byte_count, start_time, end_time, partitions, trigger_ts=None):
+        """Print the run summary and write per-partition counts and completion times"""
+        # Calculate and print statistics
+        if not (start_time and end_time):
+            return
+        total_time = end_time - start_time
+        messages_per_second = message_count / total_time if total_time > 0 else 0
+        bytes_per_second = byte_count / total_time if total_time > 0 else 0
+        
+        print("\nBackfill Statistics:")
+        print(f"Total messages processed: {message_count}")
+        print(f"Total data processed: {byte_count/1_000_000:.2f} MB")
+        print(f"Total time elapsed: {total_time:.2f} seconds")
+        print(f"Average throughput: {messages_per_second:.2f} messages/second")
+        print(f"Average data throughput: {format_data_rate(bytes_per_second)}")
+        if trigger_ts is not None:
+            print(f"Time to first message: {start_time - trigger_ts:.2f} seconds")
+            print(f"Time to last message: {end_time - trigger_ts:.2f} seconds")
+
+        # Completion times are relative to the trigger when given, else to the first message
+        origin = trigger_ts if trigger_ts is not None else start_time
+        print("\nPer-partition:")
+        with open(self.partitions_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['partition', 'messages', 'bytes', 'first_message_s', 'completed_s'])
+            for partition, (messages, size, first, last) in sorted(partitions.items()):
+                writer.writerow([partition, messages, size, round(first - origin, 3), round(last - origin, 3)])
+                print(f"  Partition {partition}: {messages} messages, {size/1_000_000:.2f} MB, "
+                      f"completed at {last - origin:.2f}s")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Collect Kafka backfill statistics')
     parser.add_argument('--bootstrap-servers', type=str, default='localhost:9092',
@@ -94,6 +189,13 @@ if __name__ == "__main__":
                       help='Use IAM authentication for MSK')
     parser.add_argument('--backfill-count', type=int, default=10000,
                       help='Number of messages to process for backfill statistics (default: 10000)')
+    parser.add_argument('--trigger-ts', type=parse_trigger_ts, default=None,
+                      help='When the backfill was started, as epoch seconds or ISO-8601, to report '
+                           'time to first message')
+    parser.add_argument('--timeline-file', type=str, default='backfill_timeline.csv',
+                      help='Per-second throughput CSV (default: backfill_timeline.csv)')
+    parser.add_argument('--partitions-file', type=str, default='backfill_partitions.csv',
+                      help='Per-partition counts and completion times CSV (default: backfill_partitions.csv)')
 
     args = parser.parse_args()
     
@@ -102,6 +204,8 @@ if __name__ == "__main__":
     collector = KafkaBackfillCollector(
         bootstrap_servers=bootstrap_servers,
         topic=args.topic,
-        use_iam=args.use_iam
+        use_iam=args.use_iam,
+        timeline_file=args.timeline_file,
+        partitions_file=args.partitions_file
     )
-    collector.run(args.backfill_count)
\ No newline at end of file
+    collector.run(args.backfill_count, trigger_ts=args.trigger_ts)
\ No newline at end of file
@@ -0,0 +1,419 @@
+import argparse
+import base64
+import glob
+import html
+import math
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from latency_histogram import LatencyHistogram
+
+# One color per run, in --run order
+COLORS = ['#1f77b4', '#d62728', '#2ca02c', '#ff7f0e', '#9467bd', '#8c564b', '#e377c2', '#17becf']
+
+# Percentiles reported for every run and plotted from raw samples
+PERCENTILES = (50, 95, 99, 99.9)
+CURVE_PERCENTILES = (50, 75, 90, 95, 99, 99.5, 99.9, 99.95, 99.99)
+
+def parse_labeled_path(value):
+    """--run / --raw-samples: label=path"""
+    label, sep, path = value.partition('=')
+    if not sep or not label or not path:
+        raise argparse.ArgumentTypeError(f"expected label=path, got {value!r}")
+    return label, path
+
+def load_stats(path, align='first-message'):
+    """A kafka_stats.csv as a DataFrame with t_s, seconds since the start of the run.
+
+    With align='first-message' t_s = 0 is the start of the first interval
+    that saw messages, so runs whose collector started at different times
+    line up; with 'elapsed' it is the collector's own start.
+    """
+    df = pd.read_csv(path)
+    t0_ms = 0
+    if align == 'first-message':
+        active = np.flatnonzero(df['throughput_msgs_per_sec'].to_numpy() > 0)
+        if len(active) and active[0] > 0:
+            t0_ms = df['time_elapsed_ms'].iloc[active[0] - 1]
+        elif len(active):
+            # No row before the first active one; its interval started one interval earlier
+            interval_ms = df['time_elapsed_ms'].diff().median() if len(df) > 1 else 1000
+            t0_ms = df['time_elapsed_ms'].iloc[0] - interval_ms
+    df['t_s'] = (df['time_elapsed_ms'] - t0_ms) / 1000
+    return df
+
+def steady_window(df, warmup_s=None, cooldown_s=None, threshold=0.9):
+    """(start_s, end_s] of the steady state of a run.
+
+    Explicit warmup/cooldown trim that many seconds from the start of
+    traffic and from the last row. Otherwise the window runs from the start
+    of the first to the end of the last interval reaching threshold times
+    the median throughput of the intervals that saw any messages, which
+    drops the ramp-up and the drain at the end.
+    """
+    active = df[(df['t_s'] > 0) & (df['throughput_msgs_per_sec'] > 0)]
+    if active.empty:
+        return 0.0, 0.0
+    reached = active[active['throughput_msgs_per_sec'] >= threshold * active['throughput_msgs_per_sec'].median()]
+    # Each row covers the interval ending at its t_s
+    interval_s = df['t_s'].diff().median() if len(df) > 1 else 1.0
+    start = warmup_s if warmup_s is not None else reached['t_s'].iloc[0] - interval_s
+    end = df['t_s'].max() - cooldown_s if cooldown_s is not None else reached['t_s'].iloc[-1]
+    return float(start), float(max(start, end))
+
+def summarize_intervals(df, start, end):
+    """Steady-state throughput and latency from the per-interval rows.
+
+    Interval percentiles can't be merged exactly, so p50..p99.9 are the
+    median across intervals; the average is weighted by throughput.
+    """
+    window = df[(df['t_s'] > start) & (df['t_s'] <= end)]
+    throughput = window['throughput_msgs_per_sec']
+    summary = {
+        'intervals': len(window),
+        'throughput': throughput.mean() if len(window) else None,
+        'throughput_min': throughput.min() if len(window) else None,
+        'latency_source': 'interval medians',
+    }
+    has_latency = window['avg_latency_ms'].notna() & (throughput > 0)
+    summary['avg'] = (float(np.average(window['avg_latency_ms'][has_latency], weights=throughput[has_latency]))
+                      if has_latency.any() else None)
+    # CSVs written before cdc_stats.py reported p99.9 and max end at throughput_msgs_per_sec
+    for p, column in zip(PERCENTILES, ['p50_latency_ms', 'p95_latency_ms', 'p99_latency_ms', 'p999_latency_ms']):
+        summary[f'p{p}'] = (window[column].median()
+                            if column in window and window[column].notna().any() else None)
+    summary['max'] = (window['max_latency_ms'].max()
+                      if 'max_latency_ms' in window and window['max_latency_ms'].notna().any() else None)
+    # Runs collected before cdc_stats.py profiled itself have no such column
+    summary['saturated'] = (int(window['collector_saturated'].fillna(0).sum())
+                            if 'collector_saturated' in window else None)
+    return summary
+
+def iter_raw_columns(paths, columns, batch_rows=1_000_000):
+    """Stream record batches of the given columns from raw-sample Parquet files"""
+    # pyarrow is only needed for raw samples
+    import pyarrow.parquet as pq
+    for path in paths:
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+            yield {name: batch.column(name).to_numpy() for name in columns}
+
+def stats_origin_us(df):
+    """Epoch microseconds of t_s = 0, from the local wall-clock timestamp the collector wrote on each row.
+
+    Raw samples carry epoch consume times, so this puts the steady window
+    on the same clock whatever the alignment.
+    """
+    row = df.iloc[0]
+    return int((datetime.fromisoformat(row['timestamp']).timestamp() - row['t_s']) * 1_000_000)
+
+def raw_histogram(paths, t0_us, start_s, end_s, latency='delivery'):
+    """LatencyHistogram of every raw sample consumed within the steady window, in one pass.
+
+    t0_us is the epoch time of t_s = 0 (see stats_origin_us).
+
+    Latency is delivery_ts - source_ts (as the collector's pipeline mode) or
+    consume_ts - source_ts (end-to-end mode).
+    """
+    histogram = LatencyHistogram()
+    end_column = 'delivery_ts_us' if latency == 'delivery' else 'consume_ts_us'
+    columns = ['source_ts_us', 'consume_ts_us'] + (['delivery_ts_us'] if latency == 'delivery' else [])
+    for batch in iter_raw_columns(paths, columns):
+        t_s = (batch['consume_ts_us'] - t0_us) / 1_000_000
+        in_window = (t_s > start_s) & (t_s <= end_s)
+        latencies = np.rint((batch[end_column][in_window] - batch['source_ts_us'][in_window]) / 1000)
+        histogram.record_many(latencies)
+    return histogram
+
+def summarize_histogram(histogram, duration_s):
+    summary = {
+        'throughput': histogram.count / duration_s if duration_s > 0 else None,
+        'latency_source': f'{histogram.count:,} raw samples',
+        'avg': histogram.mean(),
+        'max': histogram.max,
+    }
+    for p in PERCENTILES:
+        summary[f'p{p}'] = histogram.value_at_percentile(p)
+    return summary
+
+def nice_step(span, target_ticks=5):
+    """A 1/2/5 x 10^k tick step giving about target_ticks ticks over span"""
+    if span <= 0:
+        return 1.0
+    raw = span / target_ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 5, 10):
+        if raw <= multiple * magnitude:
+            return multiple * magnitude
+    return 10 * magnitude
+
+def format_tick(value):
+    if abs(value) >= 1_000_000:
+        return f"{value / 1_000_000:g}M"
+    if abs(value) >= 10_000:
+        return f"{value / 1_000:g}k"
+    return f"{value:g}"
+
+def svg_line_chart(title, series, x_label, y_label, x_ticks=None, markers=None, width=760, height=320):
+    """A self-contained SVG line chart.
+
+    series is a list of (label, color, xs, ys); NaN values break the line.
+    x_ticks optionally fixes the x axis as (value, label) pairs, and markers
+    draws dashed vertical lines as (x, color) pairs.
+    """
+    left, right, top, bottom = 70, 20, 36, 56
+    plot_width, plot_height = width - left - right, height - top - bottom
+    xs_all = np.concatenate([np.asarray(xs, dtype=float) for _, _, xs, _ in series]) if series else np.array([])
+    ys_all = np.concatenate([np.asarray(ys, dtype=float) for _, _, _, ys in series]) if series else np.array([])
+    xs_all, ys_all = xs_all[np.isfinite(xs_all)], ys_all[np.isfinite(ys_all)]
+    x_min, x_max = (float(xs_all.min()), float(xs_all.max())) if len(xs_all) else (0.0, 1.0)
+    y_max = float(ys_all.max()) if len(ys_all) else 1.0
+    if x_max <= x_min:
+        x_max = x_min + 1
+    y_step = nice_step(y_max or 1.0)
+    y_max = math.ceil((y_max or 1.0) / y_step) * y_step
+
+    def px(x):
+        return left + (x - x_min) / (x_max - x_min) * plot_width
+
+    def py(y):
+        return top + plot_height - y / y_max * plot_height
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<text x="{width / 2}" y="18" text-anchor="middle" font-size="14">{html.escape(title)}</text>',
+    ]
+    # Horizontal grid and y ticks
+    y = 0.0
+    while y <= y_max + y_step / 2:
+        parts.append(f'<line x1="{left}" x2="{left + plot_width}" y1="{py(y):.1f}" y2="{py(y):.1f}" stroke="#e5e5e5"/>')
+        parts.append(f'<text x="{left - 6}" y="{py(y) + 4:.1f}" text-anchor="end">{format_tick(y)}</text>')
+        y += y_step
+    # x ticks
+    if x_ticks is None:
+        x_step = nice_step(x_max - x_min, 8)
+        first = math.ceil(x_min / x_step) * x_step
+        x_ticks = [(x, format_tick(x)) for x in np.arange(first, x_max + x_step / 2, x_step)]
+    for x, label in x_ticks:
+        parts.append(f'<line x1="{px(x):.1f}" x2="{px(x):.1f}" y1="{top + plot_height}" '
+                     f'y2="{top + plot_height + 4}" stroke="#333"/>')
+        parts.append(f'<text x="{px(x):.1f}" y="{top + plot_height + 16}" text-anchor="middle">{html.escape(label)}</text>')
+    parts.append(f'<rect x="{left}" y="{top}" width="{plot_width}" height="{plot_height}" fill="none" stroke="#333"/>')
+    parts.append(f'<text x="{left + plot_width / 2}" y="{height - 26}" text-anchor="middle">{html.escape(x_label)}</text>')
+    parts.append(f'<text x="14" y="{top + plot_height / 2}" text-anchor="middle" '
+                 f'transform="rotate(-90 14 {top + plot_height / 2})">{html.escape(y_label)}</text>')
+
+    for x, color in markers or []:
+        if x_min <= x <= x_max:
+            parts.append(f'<line x1="{px(x):.1f}" x2="{px(x):.1f}" y1="{top}" y2="{top + plot_height}" '
+                         f'stroke="{color}" stroke-dasharray="4 3" opacity="0.7"/>')
+
+    for label, color, xs, ys in series:
+        segments, current = [], []
+        for x, y in zip(xs, ys):
+            if np.isfinite(x) and np.isfinite(y):
+                current.append(f"{px(x):.1f},{py(y):.1f}")
+            elif current:
+                segments.append(current)
+                current = []
+        if current:
+            segments.append(current)
+        for points in segments:
+            parts.append(f'<polyline fill="none" stroke="{color}" stroke-width="1.5" points="{" ".join(points)}"/>')
+
+    # Legend along the bottom
+    legend_x = left
+    for label, color, _, _ in series:
+        parts.append(f'<rect x="{legend_x}" y="{height - 14}" width="12" height="3" fill="{color}"/>')
+        parts.append(f'<text x="{legend_x + 16}" y="{height - 9}">{html.escape(label)}</text>')
+        legend_x += 24 + 7 * len(label)
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+def fmt(value, digits=1):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return '-'
+    return f"{value:,.{digits}f}"
+
+def relative(value, baseline):
+    if value is None or baseline is None or baseline == 0 or (isinstance(value, float) and math.isnan(value)):
+        return '-'
+    return f"{(value / baseline - 1) * 100:+.1f}%"
+
+class BenchmarkReport:
+    """Load several benchmark runs and render a Markdown or HTML comparison report"""
+
+    def __init__(self, runs, raw_samples=None, align='first-message', warmup_s=None, cooldown_s=None,
+                 raw_latency='delivery'):
+        self.runs = []
+        raw_samples = raw_samples or {}
+        for i, (label, path) in enumerate(runs):
+            df = load_stats(path, align)
+            start, end = steady_window(df, warmup_s, cooldown_s)
+            run = {
+                'label': label,
+                'path': path,
+                'color': COLORS[i % len(COLORS)],
+                'df': df,
+                'window': (start, end),
+                'summary': summarize_intervals(df, start, end),
+                'histogram': None,
+                'raw_paths': [],
+            }
+            if label in raw_samples:
+                paths = sorted(p for pattern in raw_samples[label] for p in glob.glob(pattern))
+                if not paths:
+                    raise FileNotFoundError(f"No raw sample files match {raw_samples[label]}")
+                print(f"Scanning raw samples for {label} ({len(paths)} files)...")
+                if len(df):
+                    run['histogram'] = raw_histogram(paths, stats_origin_us(df), start, end, raw_latency)
+                    run['summary'] = {**summarize_histogram(run['histogram'], end - start),
+                                      'intervals': run['summary']['intervals'],
+                                      'throughput_min': run['summary']['throughput_min'],
+                                      'saturated': run['summary']['saturated']}
+                run['raw_paths'] = paths
+            self.runs.append(run)
+
+    def summary_rows(self):
+        """One table row per run, compared against the first run"""
+        baseline = self.runs[0]['summary']
+        header = ['Run', 'Steady window (s)', 'Throughput (msg/s)', f"vs {self.runs[0]['label']}",
+                  'Avg (ms)', *[f'p{p} (ms)' for p in PERCENTILES], f"p99 vs {self.runs[0]['label']}",
+                  'Max (ms)', 'Latency from']
+        rows = []
+        for run in self.runs:
+            summary = run['summary']
+            start, end = run['window']
+            rows.append([
+                run['label'], f"{start:.0f}-{end:.0f}",
+                fmt(summary['throughput']), relative(summary['throughput'], baseline['throughput']),
+                fmt(summary['avg']), *[fmt(summary[f'p{p}']) for p in PERCENTILES],
+                relative(summary['p99'], baseline['p99']),
+                fmt(summary['max'], 0), summary['latency_source'],
+            ])
+        return header, rows
+
+    def charts(self):
+        """(title, svg) for every chart in the report"""
+        charts = []
+        markers = [(x, run['color']) for run in self.runs for x in run['window']]
+        charts.append(('Throughput', svg_line_chart(
+            'Throughput over time',
+            [(run['label'], run['color'], run['df']['t_s'], run['df']['throughput_msgs_per_sec']) for run in self.runs],
+            'seconds since first message', 'msg/s', markers=markers)))
+        for column, title in (('p99_latency_ms', 'p99 latency per interval'), ('p50_latency_ms', 'p50 latency per interval')):
+            charts.append((title, svg_line_chart(
+                title,
+                [(run['label'], run['color'], run['df']['t_s'], run['df'][column]) for run in self.runs],
+                'seconds since first message', 'ms', markers=markers)))
+        with_raw = [run for run in self.runs if run['histogram'] is not None and run['histogram'].count]
+        if with_raw:
+            positions = list(range(len(CURVE_PERCENTILES)))
+            charts.append(('Latency percentiles', svg_line_chart(
+                'Steady-state latency by percentile (raw samples)',
+                [(run['label'], run['color'], positions,
+                  [run['histogram'].value_at_percentile(p) for p in CURVE_PERCENTILES]) for run in with_raw],
+                'percentile', 'ms', x_ticks=[(i, f"p{p:g}") for i, p in zip(positions, CURVE_PERCENTILES)])))
+        return charts
+
+    def run_note(self, run):
+        note = f"{run['summary']['intervals']} steady-state intervals"
+        if run['summary']['saturated']:
+            note += f", {run['summary']['saturated']} with the collector saturated"
+        return note
+
+    def render_markdown(self):
+        header, rows = self.summary_rows()
+        lines = [
+            "# Benchmark comparison",
+            "",
+            f"Generated {datetime.now().isoformat(timespec='seconds')}. Runs are aligned on the first interval "
+            "with messages; dashed lines in the charts mark each run's steady-state window.",
+            "",
+            "| " + " | ".join(header) + " |",
+            "|" + "|".join("---" for _ in header) + "|",
+        ]
+        lines += ["| " + " | ".join(row) + " |" for row in rows]
+        lines += ["", "## Runs", ""]
+        for run in self.runs:
+            sources = ", ".join([run['path'], *run['raw_paths']])
+            lines.append(f"- **{run['label']}**: {sources} ({self.run_note(run)})")
+        for title, svg in self.charts():
+            data = base64.b64encode(svg.encode('utf-8')).decode('ascii')
+            lines += ["", f"## {title}", "", f'<img alt="{title}" src="data:image/svg+xml;base64,{data}"/>']
+        return "\n".join(lines) + "\n"
+
+    def render_html(self):
+        header, rows = self.summary_rows()
+        table = ["<table>", "<tr>" + "".join(f"<th>{html.escape(cell)}</th>" for cell in header) + "</tr>"]
+        table += ["<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in row) + "</tr>" for row in rows]
+        table.append("</table>")
+        runs = "".join(
+            f"<li><b>{html.escape(run['label'])}</b>: {html.escape(', '.join([run['path'], *run['raw_paths']]))} "
+            f"({html.escape(self.run_note(run))})</li>"
+            for run in self.runs
+        )
+        charts = "".join(f"<h2>{html.escape(title)}</h2>\n{svg}\n" for title, svg in self.charts())
+        return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Benchmark comparison</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: right; }}
+th:first-child, td:first-child, td:last-child {{ text-align: left; }}
+</style>
+</head>
+<body>
+<h1>Benchmark comparison</h1>
+<p>Generated {datetime.now().isoformat(timespec='seconds')}. Runs are aligned on the first interval with
+messages; dashed lines in the charts mark each run's steady-state window.</p>
+{''.join(table)}
+<h2>Runs</h2>
+<ul>{runs}</ul>
+{charts}</body>
+</html>
+"""
+
+    def write(self, path):
+        content = self.render_html() if path.endswith(('.html', '.htm')) else self.render_markdown()
+        with open(path, 'w') as f:
+            f.write(content)
+        print(f"Report written to {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare benchmark runs from kafka_stats.csv files')
+    parser.add_argument('--run', type=parse_labeled_path, action='append', required=True,
+                      help='A run as label=kafka_stats.csv, e.g. sequin=kafka_stats_20241205_181905.csv; '
+                           'repeat for every run, the first is the baseline')
+    parser.add_argument('--raw-samples', type=parse_labeled_path, action='append', default=[],
+                      help='Raw samples from cdc_stats.py --raw-samples for a run, as label=file.parquet '
+                           '(globs allowed, e.g. sequin=raw.worker*.parquet); gives exact percentiles')
+    parser.add_argument('--align', type=str, choices=['first-message', 'elapsed'], default='first-message',
+                      help='Align runs on their first interval with messages, or on collector start '
+                           '(default: first-message)')
+    parser.add_argument('--warmup', type=float, default=None,
+                      help='Seconds after the first message excluded as warmup (default: detected from throughput)')
+    parser.add_argument('--cooldown', type=float, default=None,
+                      help='Seconds before the last row excluded as drain (default: detected from throughput)')
+    parser.add_argument('--raw-latency', type=str, choices=['delivery', 'consume'], default='delivery',
+                      help='Raw-sample latency ends at delivery (pipeline mode) or consume (end-to-end mode) '
+                           '(default: delivery)')
+    parser.add_argument('--output', type=str, default='benchmark_report.html',
+                      help='Report file; .html for HTML, anything else for Markdown (default: benchmark_report.html)')
+
+    args = parser.parse_args()
+    labels = [label for label, _ in args.run]
+    raw_samples = {}
+    for label, pattern in args.raw_samples:
+        if label not in labels:
+            parser.error(f"--raw-samples label {label!r} does not match any --run")
+        raw_samples.setdefault(label, []).append(pattern)
+
+    report = BenchmarkReport(args.run, raw_samples, align=args.align, warmup_s=args.warmup,
+                             cooldown_s=args.cooldown, raw_latency=args.raw_latency)
+    report.write(args.output)
@@ -7,17 +7,157 @@ from datetime import datetime
 import csv
 from collections import deque
 import argparse
+import multiprocessing
+import os
+import queue
 from aws_msk_iam_sasl_signer import MSKAuthTokenProvider
-import re
+from latency_histogram import LatencyHistogram
+from metrics import LATENCY_BUCKETS_MS, create_metrics, parse_metrics_target, parse_tags
+from collector_profile import (PROFILE_HEADER, CollectorProfile, SamplingProfiler, is_saturated,
+                               merge_profiles, profile_columns)
+from message_parsers import parse_debezium_regex, parse_debezium_batch, parse_sequin_batch, parse_write_stamps
 
-class KafkaStatsCollector:
-    def __init__(self, bootstrap_servers, topic, use_iam=False, source='debezium'):
-        # Common consumer configs
+class StatsReporter:
+    """Latency histograms, message counts and the kafka_stats.csv they are written to"""
+
+    CSV_HEADER = ['timestamp', 'time_elapsed_ms', 'avg_latency_ms', 'p50_latency_ms',
+                  'p95_latency_ms', 'p99_latency_ms', 'throughput_msgs_per_sec',
+                  'p999_latency_ms', 'max_latency_ms',
+                  'cum_avg_latency_ms', 'cum_p50_latency_ms', 'cum_p95_latency_ms',
+                  'cum_p99_latency_ms', 'cum_p999_latency_ms', 'cum_max_latency_ms',
+                  *PROFILE_HEADER]
+
+    def __init__(self, stats_file='kafka_stats.csv'):
+        # Latencies since the last stats row, and since startup
+        self.interval_histogram = LatencyHistogram()
+        self.cumulative_histogram = LatencyHistogram()
+
+        self.stats_file = stats_file
+        self.last_stats_time = time.time()
+        self.stats_interval = 10  # Calculate stats every 10 seconds
+
+        # Initialize CSV file with headers
+        if self.stats_file:
+            with open(self.stats_file, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.CSV_HEADER)
+
+        self.start_time = time.time() * 1000  # Store start time in milliseconds
+
+        # Add message counter for accurate throughput
+        self.message_count = 0
+        self.last_message_count = 0
+        self.last_throughput_time = time.time()
+
+        # Optional live export (see metrics.py), fed once per stats row
+        self.metrics = None
+        self.exported_message_count = 0
+        # Exported bucket of every LatencyHistogram bucket
+        self.metrics_buckets = np.searchsorted(LATENCY_BUCKETS_MS, self.interval_histogram.bucket_values)
+
+    def announce_ready(self, what, worker_id=None):
+        """Print the line run_benchmark.py waits for before starting the load"""
+        name = "Collector" if worker_id is None else f"Collector {worker_id}"
+        elapsed = time.time() - self.start_time / 1000
+        print(f"{name} ready after {elapsed:.2f}s: {what}", flush=True)
+
+    def write_stats(self, current_time, consumer_lag, profile=None):
+        """Fold the interval into the cumulative histogram, append a CSV row and reset the interval.
+
+        profile is the collector's own cost over the interval (see CollectorProfile.snapshot).
+        """
+        # Fold this interval into the running totals before summarizing both
+        interval = self.interval_histogram
+        self.cumulative_histogram.add(interval)
+        
+        # Only calculate stats if we have data
+        if self.cumulative_histogram.count > 0:
+            avg_latency, p50, p95, p99, p999, max_latency = interval.summary()
+            cumulative_stats = self.cumulative_histogram.summary()
+            
+            # Calculate throughput using message counter
+            time_diff = current_time - self.last_throughput_time
+            message_diff = self.message_count - self.last_message_count
+            throughput = message_diff / time_diff if time_diff > 0 else 0
+            
+            # Update last values for next calculation
+            self.last_message_count = self.message_count
+            self.last_throughput_time = current_time
+
+            # Save stats to CSV; interval columns stay empty when no messages arrived
+            def fmt(value):
+                return '' if value is None else round(value, 2)
+            
+            time_elapsed = int((current_time * 1000) - self.start_time)
+            stats_row = [
+                datetime.now().isoformat(),
+                time_elapsed,
+                fmt(avg_latency),
+                fmt(p50),
+                fmt(p95),
+                fmt(p99),
+                round(throughput, 2),
+                fmt(p999),
+                fmt(max_latency),
+                *[fmt(value) for value in cumulative_stats],
+                *profile_columns(profile)
+            ]
+            
+            # Save to CSV
+            with open(self.stats_file, 'a', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(stats_row)
+            
+            # Print simplified stats
+            if interval.count:
+                latency_str = f"Latency avg: {avg_latency:>6.1f}ms p99: {p99:>6.1f}ms p999: {p999:>6.1f}ms"
+            else:
+                latency_str = "Latency avg:      -ms p99:      -ms p999:      -ms"
+            collector_str = ""
+            if profile is not None:
+                collector_str = (f" | Collector busy: {profile['busy_fraction'] * 100:>3.0f}% "
+                                 f"cpu: {profile['cpu_s'] / profile['wall_s'] * 100:>3.0f}%")
+                if is_saturated(profile):
+                    collector_str += " SATURATED (latencies include collector queueing)"
+            print(f"Throughput: {throughput:>6.1f} msg/s | {latency_str} | "
+                  f"Cumulative p99: {cumulative_stats[3]:>6.1f}ms | Lag: {consumer_lag:>6d}{collector_str}")
+        
+        if self.metrics is not None:
+            self.export_metrics(consumer_lag, profile)
+        interval.reset()
+
+    def export_metrics(self, consumer_lag, profile=None):
+        """Hand the interval's messages, latency buckets, lag and collector cost to the metrics exporter"""
+        interval = self.interval_histogram
+        self.metrics.increment('collector_messages', self.message_count - self.exported_message_count)
+        self.exported_message_count = self.message_count
+        if interval.count:
+            counts = np.bincount(self.metrics_buckets, weights=interval.counts,
+                                 minlength=len(LATENCY_BUCKETS_MS) + 1)
+            self.metrics.observe_counts('collector_latency_ms', LATENCY_BUCKETS_MS, counts, interval.sum)
+        self.metrics.gauge('collector_lag', consumer_lag)
+        if profile is not None:
+            self.metrics.gauge('collector_busy_fraction', round(profile['busy_fraction'], 3))
+            self.metrics.gauge('collector_cpu_fraction', round(profile['cpu_s'] / profile['wall_s'], 3))
+        self.metrics.flush()
+
+class KafkaStatsCollector(StatsReporter):
+    def __init__(self, bootstrap_servers, topic, use_iam=False, source='debezium',
+                 parser='fast', debezium_format='auto', worker_id=None, report_queue=None,
+                 latency_mode='pipeline', clock_offset_ms=0.0, raw_samples_file=None,
+                 profile_file=None, profile_interval_ms=5.0, consumer=None, stats_file='kafka_stats.csv'):
+        # With a report_queue this is one of several worker processes: interval
+        # histograms are shipped to a StatsCoordinator instead of written to CSV
+        super().__init__(stats_file=None if report_queue is not None else stats_file)
+        self.worker_id = worker_id
+        self.report_queue = report_queue
+
+        # Common consumer configs; workers share the group so partitions are split between them
         consumer_config = {
             'bootstrap.servers': ','.join(bootstrap_servers),
             'group.id': 'stats_collector_group',
             'auto.offset.reset': 'end',
-            'client.id': 'stats_collector'
+            'client.id': 'stats_collector' if worker_id is None else f'stats_collector_{worker_id}'
         }
 
         # Configure authentication based on use_iam flag
@@ -40,8 +180,12 @@ class KafkaStatsCollector:
                 'security.protocol': 'PLAINTEXT',
             })
 
-        self.consumer = Consumer(consumer_config)
-        self.consumer.subscribe([topic])
+        # A ready-made consumer (e.g. synthetic_load.FakeConsumer) replaces the Kafka one
+        if consumer is not None:
+            self.consumer = consumer
+        else:
+            self.consumer = Consumer(consumer_config)
+            self.consumer.subscribe([topic], on_assign=self.on_assign)
         
         # Add tracking for consumer lag
         self.topic = topic
@@ -50,8 +194,6 @@ class KafkaStatsCollector:
         
         # Replace deques with numpy arrays and add batch processing
         self.batch_size = 10000
-        self.latencies = np.zeros(100000)
-        self.latency_idx = 0
         self.message_batch = []
         self.last_batch_process_time = time.time()
         self.batch_interval = 0.1  # Process batch every 100ms
@@ -65,39 +207,51 @@ class KafkaStatsCollector:
         # self.throughput_times = np.zeros(100000)
         # self.throughput_idx = 0
         
-        self.stats_file = 'kafka_stats.csv'
-        self.last_stats_time = time.time()
-        self.stats_interval = 10  # Calculate stats every 10 seconds
-        
-        # Initialize CSV file with headers
-        with open(self.stats_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['timestamp', 'time_elapsed_ms', 'avg_latency_ms', 'p50_latency_ms', 
-                           'p95_latency_ms', 'p99_latency_ms', 'throughput_msgs_per_sec'])
-
         self.source = source  # Add source tracking
-        self.start_time = time.time() * 1000  # Store start time in milliseconds
+        # 'fast' parses whole batches from raw bytes, 'regex' is the original per-message path
+        self.parser = parser
+        self.debezium_format = debezium_format
+        # 'pipeline' measures inside the CDC pipeline (source ts_ms / commit_timestamp to
+        # delivery); 'end-to-end' measures from the generator's write_ts_us stamp to consume
+        self.latency_mode = latency_mode
+        # How far this host's clock is ahead of the generator's; subtracted from end-to-end latencies
+        self.clock_offset_ms = clock_offset_ms
+        self.consume_times = []
+        self.consume_time_us = None
+        self.stamps_seen = False
 
-        # Add message counter for accurate throughput
-        self.message_count = 0
-        self.last_message_count = 0
-        self.last_throughput_time = time.time()
+        # Optional per-message samples in Parquet for offline analysis (needs pyarrow)
+        self.sample_sink = None
+        if raw_samples_file:
+            from sample_sink import RawSampleSink
+            if worker_id is not None:
+                base, ext = os.path.splitext(raw_samples_file)
+                raw_samples_file = f"{base}.worker{worker_id}{ext}"
+            self.sample_sink = RawSampleSink(raw_samples_file)
 
-    def get_consumer_lag(self):
-        # Get topic partition metadata
-        assignments = self.consumer.assignment()
-        total_lag = 0
-        
-        for partition in assignments:
+        # Time spent in consume(), parsing and stats, always on; the sampling profiler is opt-in
+        self.profile = CollectorProfile()
+        self.consume_batch = 1000
+        self.profile_file = profile_file
+        self.profile_interval_ms = profile_interval_ms
+        if profile_file and worker_id is not None:
+            base, ext = os.path.splitext(profile_file)
+            self.profile_file = f"{base}.worker{worker_id}{ext}"
+
+    def get_partition_lags(self):
+        """{partition: lag} for the partitions currently assigned to this consumer"""
+        lags = {}
+        for partition in self.consumer.assignment():
             # Get end offset (latest available message)
             high_watermark = self.consumer.get_watermark_offsets(partition)[1]
             # Get current position (need to get the offset value, not the TopicPartition object)
             position = self.consumer.position([partition])[0].offset
-            
-            partition_lag = high_watermark - position
-            total_lag += partition_lag
-            
-        return total_lag
+            # Negative until the first fetch from a newly assigned partition
+            lags[partition.partition] = high_watermark - position if position >= 0 else 0
+        return lags
+
+    def get_consumer_lag(self):
+        return sum(self.get_partition_lags().values())
 
     def parse_message(self, message):
         """
@@ -122,11 +276,7 @@ class KafkaStatsCollector:
             if msg_str is None:
                 raise ValueError("Message is None or value is None")
             
-            source_ts_match = re.search(r'source=Struct{.*?ts_ms=(\d+)', msg_str)
-            delivery_ts_match = re.search(r',ts_ms=(\d+),ts_us=', msg_str)
-            
-            source_ts = int(source_ts_match.group(1)) if source_ts_match else None
-            delivery_ts = int(delivery_ts_match.group(1)) if delivery_ts_match else None
+            source_ts, delivery_ts = parse_debezium_regex(msg_str)
             
             if source_ts is None or delivery_ts is None:
                 print(f"Missing timestamps - source_ts: {source_ts}, delivery_ts: {delivery_ts}")
@@ -173,76 +323,148 @@ class KafkaStatsCollector:
     def calculate_latency(self, message):
         """Batch process messages for better performance"""
         self.message_batch.append(message)
+        if self.latency_mode == 'end-to-end' or self.sample_sink is not None:
+            self.consume_times.append(self.consume_time_us or time.time_ns() // 1000)
         current_time = time.time()
         
         # Process batch if size threshold or time threshold is met
         if (len(self.message_batch) >= self.batch_size or 
             current_time - self.last_batch_process_time >= self.batch_interval):
             
-            for msg in self.message_batch:
-                parsed_data = self.parse_message(msg)
-                if parsed_data:
-                    # Use circular buffer pattern with numpy arrays
-                    self.latencies[self.latency_idx] = parsed_data['latency']
-                    self.latency_idx = (self.latency_idx + 1) % len(self.latencies)
-                    self.message_count += 1
+            messages, consume_times = self.message_batch, self.consume_times
+            if self.sample_sink is not None:
+                # Tombstones carry no timestamps; dropping them here keeps consume times aligned
+                kept = [i for i, msg in enumerate(messages) if msg.value() is not None]
+                if len(kept) < len(messages):
+                    messages = [messages[i] for i in kept]
+                    consume_times = [consume_times[i] for i in kept]
+
+            if self.latency_mode == 'end-to-end':
+                self._process_end_to_end_batch(messages, consume_times)
+            elif self.parser == 'fast' and self.source == 'debezium':
+                self._process_debezium_batch(messages, consume_times)
+            elif self.parser == 'fast' and self.source == 'sequin':
+                self._process_sequin_batch(messages, consume_times)
+            else:
+                for msg in messages:
+                    parsed_data = self.parse_message(msg)
+                    if parsed_data:
+                        self.interval_histogram.record(parsed_data['latency'])
+                        self.message_count += 1
             
             self.message_batch = []
+            self.consume_times = []
             self.last_batch_process_time = current_time
 
+    def _process_debezium_batch(self, messages, consume_times=None):
+        """Parse a whole batch of Debezium messages from raw bytes and record their latencies"""
+        # Tombstones (None values) after deletes carry no timestamps
+        values = [value for value in (msg.value() for msg in messages) if value is not None]
+        source_ts, delivery_ts, failed = parse_debezium_batch(values, self.debezium_format)
+        self.interval_histogram.record_many(delivery_ts - source_ts)
+        self.message_count += len(source_ts)
+        if self.sample_sink is not None:
+            self._record_samples(messages, consume_times, failed, source_ts * 1000, delivery_ts * 1000)
+        if failed:
+            # Report once per batch rather than once per message
+            print(f"Missing timestamps in {len(failed)}/{len(values)} messages")
+            print(f"Message content: {values[failed[0]]}")
+
+    def _process_sequin_batch(self, messages, consume_times=None):
+        """Extract commit_timestamp from raw Sequin bytes for a whole batch and record latencies"""
+        messages = [msg for msg in messages if msg.value() is not None]
+        values = [msg.value() for msg in messages]
+        # Kafka's CreateTime; timestamp() returns (TimestampType, timestamp)
+        delivery_ts = [msg.timestamp()[1] for msg in messages]
+        source_ts, delivery_ts, failed = parse_sequin_batch(values, delivery_ts)
+        self.interval_histogram.record_many(delivery_ts - source_ts)
+        self.message_count += len(source_ts)
+        if self.sample_sink is not None:
+            self._record_samples(messages, consume_times, failed, source_ts * 1000, delivery_ts * 1000)
+        if failed:
+            print(f"Error processing {len(failed)}/{len(values)} Sequin messages")
+            print(f"Message content: {values[failed[0]]}")
+
+    def _process_end_to_end_batch(self, messages, consume_times):
+        """Record consume time minus the generator's write stamp for every stamped message"""
+        values = []
+        consumed = []
+        for msg, consume_time in zip(messages, consume_times):
+            value = msg.value()
+            if value is not None:
+                values.append(value)
+                consumed.append(consume_time)
+        write_ts, consume_ts, unstamped = parse_write_stamps(values, consumed, self.source)
+        latencies = np.rint((consume_ts - write_ts) / 1000 - self.clock_offset_ms)
+        self.interval_histogram.record_many(latencies)
+        if self.sample_sink is not None:
+            # The write stamp is the source time here; delivery is Kafka's CreateTime
+            create_ts = np.array([msg.timestamp()[1] for msg in messages], dtype=np.int64) * 1000
+            self._record_samples(messages, consume_times, unstamped, write_ts, np.delete(create_ts, unstamped))
+        # Throughput still counts every change, including unstamped deletes
+        self.message_count += len(values)
+        if len(write_ts):
+            self.stamps_seen = True
+        elif values and not self.stamps_seen:
+            print("No write_ts_us stamps found yet; was workload_generator.py run with --stamp-writes?")
+            self.stamps_seen = True
+
+    def _record_samples(self, messages, consume_times, failed, source_ts_us, delivery_ts_us):
+        """Send a raw sample for each parsed message to the sink; failed indexes are skipped"""
+        if failed:
+            failed = set(failed)
+            kept = [i for i in range(len(messages)) if i not in failed]
+            messages = [messages[i] for i in kept]
+            consume_times = [consume_times[i] for i in kept]
+        n = len(messages)
+        self.sample_sink.add(
+            np.fromiter((msg.partition() for msg in messages), np.int32, n),
+            np.fromiter((msg.offset() for msg in messages), np.int64, n),
+            source_ts_us,
+            delivery_ts_us,
+            np.asarray(consume_times, dtype=np.int64),
+            np.fromiter((len(msg.value()) for msg in messages), np.int32, n)
+        )
+
     def calculate_and_save_stats(self):
         current_time = time.time()
         
         if current_time - self.last_stats_time >= self.stats_interval:
-            consumer_lag = self.get_consumer_lag()
-            
-            # Only calculate stats if we have data
-            if self.latency_idx > 0:
-                # Use only the filled portion of the arrays
-                active_latencies = self.latencies[:self.latency_idx]
-                
-                # Calculate percentiles
-                p99 = np.percentile(active_latencies, 99)
-                avg_latency = np.mean(active_latencies)
-                
-                # Calculate throughput using message counter
-                time_diff = current_time - self.last_throughput_time
-                message_diff = self.message_count - self.last_message_count
-                throughput = message_diff / time_diff if time_diff > 0 else 0
-                
-                # Update last values for next calculation
-                self.last_message_count = self.message_count
-                self.last_throughput_time = current_time
-
-                # Save stats to CSV
-                time_elapsed = int((current_time * 1000) - self.start_time)
-                stats_row = [
-                    datetime.now().isoformat(),
-                    time_elapsed,
-                    round(avg_latency, 2),
-                    round(np.percentile(active_latencies, 50), 2),
-                    round(np.percentile(active_latencies, 95), 2),
-                    round(p99, 2),
-                    round(throughput, 2)
-                ]
-                
-                # Save to CSV
-                with open(self.stats_file, 'a', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(stats_row)
-                
-                # Print simplified stats
-                print(f"Throughput: {throughput:>6.1f} msg/s | Latency avg: {avg_latency:>6.1f}ms p99: {p99:>6.1f}ms | Lag: {consumer_lag:>6d}")
-            
+            if self.report_queue is not None:
+                self.report_stats()
+            else:
+                self.write_stats(current_time, self.get_consumer_lag(), self.profile.snapshot())
             self.last_stats_time = current_time
 
-    def run(self):
+    def on_assign(self, consumer, partitions):
+        # Called from consume() once the group has given this consumer its partitions
+        self.announce_ready("partitions " + (",".join(str(p.partition) for p in partitions) or "none"),
+                            self.worker_id)
+
+    def report_stats(self):
+        """Ship this worker's interval histogram, message count and partition lags to the coordinator"""
+        self.report_queue.put(('stats', self.worker_id, self.interval_histogram.snapshot(),
+                               self.message_count - self.last_message_count, self.get_partition_lags(),
+                               self.profile.snapshot()))
+        self.last_message_count = self.message_count
+        self.interval_histogram.reset()
+
+    def run(self, duration=None):
+        """Consume until interrupted, or for duration seconds"""
+        deadline = time.time() + duration if duration is not None else None
+        profiler = None
+        if self.profile_file:
+            profiler = SamplingProfiler(self.profile_file, self.profile_interval_ms / 1000)
         try:
-            while True:
+            while deadline is None or time.time() < deadline:
                 # Increase poll timeout for batch processing
-                messages = self.consumer.consume(timeout=1.0, num_messages=1000)
+                consume_start = time.perf_counter()
+                messages = self.consumer.consume(timeout=1.0, num_messages=self.consume_batch)
+                process_start = time.perf_counter()
+                self.profile.consumed(process_start - consume_start, len(messages), self.consume_batch)
                 if not messages:
                     continue
+                self.consume_time_us = time.time_ns() // 1000
 
                 for msg in messages:
                     if msg.error():
@@ -257,13 +479,152 @@ class KafkaStatsCollector:
                     except Exception as e:
                         print(f"Error processing message: {e}")
 
+                stats_start = time.perf_counter()
+                self.profile.processed(stats_start - process_start, len(self.message_batch))
                 self.calculate_and_save_stats()
+                self.profile.stats_s += time.perf_counter() - stats_start
 
         except KeyboardInterrupt:
-            print("\nStopping stats collection...")
+            if self.report_queue is None:
+                print("\nStopping stats collection...")
         finally:
+            if self.report_queue is not None:
+                # Latencies recorded since the last report would otherwise be lost
+                self.report_stats()
+                self.report_queue.put(('done', self.worker_id))
+            if self.sample_sink is not None:
+                self.sample_sink.close()
+            if profiler is not None:
+                profiler.close()
             self.consumer.close()
 
+def run_collector_process(worker_id, collector_kwargs, report_interval, report_queue):
+    """Entry point of a StatsCoordinator worker process"""
+    try:
+        collector = KafkaStatsCollector(worker_id=worker_id, report_queue=report_queue, **collector_kwargs)
+    except Exception as e:
+        report_queue.put(('error', worker_id, str(e)))
+        report_queue.put(('done', worker_id))
+        return
+    collector.stats_interval = report_interval
+    collector.run()
+
+class StatsCoordinator(StatsReporter):
+    """Run several collectors in one consumer group and merge what they measure.
+
+    Each worker process owns a subset of the topic's partitions and parses
+    them in parallel. About once a second it ships the non-empty buckets of
+    its latency histogram, its message count and the lag of each partition
+    it owns; the coordinator merges these into the usual kafka_stats.csv and
+    logs per-partition lag to kafka_partition_lag.csv.
+    """
+
+    def __init__(self, processes, collector_kwargs, stats_interval=10, stats_file='kafka_stats.csv',
+                 partition_lag_file='kafka_partition_lag.csv'):
+        super().__init__(stats_file=stats_file)
+        self.processes = processes
+        self.collector_kwargs = collector_kwargs
+        self.stats_interval = stats_interval
+        # Workers report more often than rows are written so each row is close to on time
+        self.report_interval = min(1.0, stats_interval)
+        # Latest {partition: lag} reported by each worker
+        self.worker_lags = {}
+        # Collector cost reports since the last row, merged when it is written
+        self.worker_profiles = []
+
+        self.partition_lag_file = partition_lag_file
+        with open(self.partition_lag_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp', 'time_elapsed_ms', 'partition', 'worker', 'lag'])
+
+    def partition_lags(self):
+        """{partition: (worker, lag)} from each worker's latest report"""
+        lags = {}
+        for worker_id, worker_lags in self.worker_lags.items():
+            for partition, lag in worker_lags.items():
+                lags[partition] = (worker_id, lag)
+        return dict(sorted(lags.items()))
+
+    def write_partition_lags(self, current_time):
+        lags = self.partition_lags()
+        time_elapsed = int((current_time * 1000) - self.start_time)
+        timestamp = datetime.now().isoformat()
+        with open(self.partition_lag_file, 'a', newline='') as f:
+            writer = csv.writer(f)
+            for partition, (worker_id, lag) in lags.items():
+                writer.writerow([timestamp, time_elapsed, partition, worker_id, lag])
+        if lags:
+            print("Partition lag: " + " ".join(f"{partition}:{lag}" for partition, (_, lag) in lags.items()))
+
+    def merged_profile(self):
+        """Collector cost since the last row; workers report several times per row"""
+        profile = merge_profiles(self.worker_profiles)
+        self.worker_profiles = []
+        if profile is not None:
+            # Each worker's times cover its own report intervals; CPU is per stats row
+            profile['wall_s'] = max(profile['wall_s'], time.time() - self.last_stats_time)
+        return profile
+
+    def handle_report(self, report):
+        kind, worker_id = report[0], report[1]
+        if kind == 'stats':
+            _, _, snapshot, messages, lags, profile = report
+            self.interval_histogram.add_snapshot(snapshot)
+            self.message_count += messages
+            self.worker_lags[worker_id] = lags
+            self.worker_profiles.append(profile)
+        elif kind == 'error':
+            print(f"Error in collector process {worker_id}: {report[2]}")
+        elif kind == 'done':
+            self.worker_lags.pop(worker_id, None)
+            return True
+        return False
+
+    def run(self):
+        ctx = multiprocessing.get_context('spawn')
+        report_queue = ctx.Queue()
+        procs = [
+            ctx.Process(target=run_collector_process,
+                        args=(worker_id, self.collector_kwargs, self.report_interval, report_queue))
+            for worker_id in range(self.processes)
+        ]
+        for proc in procs:
+            proc.start()
+        print(f"Started {self.processes} collector processes")
+
+        running = self.processes
+        try:
+            while running:
+                try:
+                    if self.handle_report(report_queue.get(timeout=0.5)):
+                        running -= 1
+                except queue.Empty:
+                    if not any(proc.is_alive() for proc in procs):
+                        break
+
+                current_time = time.time()
+                if current_time - self.last_stats_time >= self.stats_interval:
+                    self.write_stats(current_time, sum(lag for _, lag in self.partition_lags().values()),
+                                     self.merged_profile())
+                    self.write_partition_lags(current_time)
+                    self.last_stats_time = current_time
+
+        except KeyboardInterrupt:
+            print("\nStopping stats collection...")
+            # Workers got the interrupt too; collect their final reports
+            deadline = time.time() + 10
+            while running and time.time() < deadline:
+                try:
+                    if self.handle_report(report_queue.get(timeout=0.5)):
+                        running -= 1
+                except queue.Empty:
+                    pass
+        finally:
+            for proc in procs:
+                proc.join(timeout=5)
+                if proc.is_alive():
+                    proc.terminate()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Collect Kafka consumer statistics')
     parser.add_argument('--bootstrap-servers', type=str, default='localhost:9092',
@@ -274,18 +635,98 @@ if __name__ == "__main__":
                       help='Interval between stats calculations in seconds (default: 5.0)')
     parser.add_argument('--use-iam', action='store_true',
                       help='Use IAM authentication for MSK')
-    parser.add_argument('--source', type=str, choices=['debezium', 'sequin'], default='debezium',
-                      help='Source type of Kafka messages (default: debezium)')
+    parser.add_argument('--source', type=str, choices=['debezium', 'sequin', 'pg'], default='debezium',
+                      help='Source type of Kafka messages, or pg to read changes straight from a Postgres '
+                           'replication slot as a baseline (default: debezium)')
+    parser.add_argument('--parser', type=str, choices=['fast', 'regex'], default='fast',
+                      help='Parse whole batches from raw bytes, or each message with the original '
+                           'regex / json.loads path (default: fast)')
+    parser.add_argument('--debezium-format', type=str, choices=['auto', 'struct', 'json'], default='auto',
+                      help='Debezium converter output: Struct toString or JsonConverter (default: auto)')
+    parser.add_argument('--latency-mode', type=str, choices=['pipeline', 'end-to-end'], default='pipeline',
+                      help='Measure source to delivery timestamps inside the CDC pipeline, or from the '
+                           'write_ts_us stamp of workload_generator.py --stamp-writes to consume (default: pipeline)')
+    parser.add_argument('--clock-offset-ms', type=float, default=0.0,
+                      help='How far this host\'s clock is ahead of the generator host\'s (the database '
+                           'host\'s with --source pg), subtracted from end-to-end latencies (default: 0)')
+    parser.add_argument('--processes', type=int, default=1,
+                      help='Consumer processes in the group, each parsing its own partitions (default: 1)')
+    parser.add_argument('--raw-samples', type=str, default=None,
+                      help='Also write every message\'s partition, offset, timestamps and size to this '
+                           'Parquet file (one file per process with --processes; needs pyarrow)')
+    parser.add_argument('--profile', type=str, default=None,
+                      help='Sample the consume loop\'s Python stack and write collapsed stacks (flamegraph '
+                           'format) to this file on exit (one file per process with --processes)')
+    parser.add_argument('--profile-interval-ms', type=float, default=5.0,
+                      help='Sampling interval of --profile in milliseconds (default: 5)')
+    parser.add_argument('--pg-dsn', type=str,
+                      default='host=localhost port=5432 dbname=postgres user=postgres password=postgres',
+                      help='libpq connection string for --source pg (default: host=localhost port=5432 '
+                           'dbname=postgres user=postgres password=postgres)')
+    parser.add_argument('--pg-plugin', type=str, choices=['pgoutput', 'wal2json'], default='pgoutput',
+                      help='Logical decoding plugin for --source pg (default: pgoutput)')
+    parser.add_argument('--pg-slot', type=str, default=None,
+                      help='Replication slot for --source pg, created if missing and kept '
+                           '(default: a temporary slot)')
+    parser.add_argument('--pg-publication', type=str, default='stats_collector_pub',
+                      help='pgoutput publication, created for --table-name if missing (default: stats_collector_pub)')
+    parser.add_argument('--table-name', type=str, default='benchmark_records',
+                      help='Table streamed with --source pg (default: benchmark_records)')
+    parser.add_argument('--metrics', type=parse_metrics_target, default=None,
+                      help='Export throughput, latency buckets and lag live, once per stats interval: '
+                           'prometheus:PORT serves /metrics, statsd:HOST:PORT sends to a DogStatsD agent '
+                           '(default: off)')
+    parser.add_argument('--metrics-tags', type=parse_tags, default={},
+                      help='key:value,... added to every exported metric, e.g. run:sequin')
+    parser.add_argument('--stats-file', type=str, default='kafka_stats.csv',
+                      help='Stats CSV (default: kafka_stats.csv)')
+    parser.add_argument('--partition-lag-file', type=str, default='kafka_partition_lag.csv',
+                      help='Per-partition lag CSV written with --processes (default: kafka_partition_lag.csv)')
 
     args = parser.parse_args()
+    if args.raw_samples and args.parser == 'regex' and args.latency_mode == 'pipeline':
+        parser.error('--raw-samples needs --parser fast')
+    if args.source == 'pg' and (args.processes > 1 or args.raw_samples or args.latency_mode != 'pipeline'):
+        parser.error('--source pg reads one slot in one process; it takes no --processes, --raw-samples '
+                     'or --latency-mode end-to-end')
     
     bootstrap_servers = args.bootstrap_servers.split(',')
+    metrics = None
+    if args.metrics:
+        metrics = create_metrics(args.metrics, tags={'source': args.source, **args.metrics_tags})
     
-    collector = KafkaStatsCollector(
+    collector_kwargs = dict(
         bootstrap_servers=bootstrap_servers,
         topic=args.topic,
         use_iam=args.use_iam,
-        source=args.source  # Add source parameter
+        source=args.source,  # Add source parameter
+        parser=args.parser,
+        debezium_format=args.debezium_format,
+        latency_mode=args.latency_mode,
+        clock_offset_ms=args.clock_offset_ms,
+        raw_samples_file=args.raw_samples,
+        profile_file=args.profile,
+        profile_interval_ms=args.profile_interval_ms,
+        stats_file=args.stats_file
     )
-    collector.stats_interval = args.stats_interval
-    collector.run() 
\ No newline at end of file
+
+    if args.source == 'pg':
+        # Commit-to-receive latency straight off the slot, into the same kafka_stats.csv
+        from pg_replication import PgReplicationCollector
+        collector = PgReplicationCollector(args.pg_dsn, plugin=args.pg_plugin, slot=args.pg_slot,
+                                           publication=args.pg_publication, table_name=args.table_name,
+                                           clock_offset_ms=args.clock_offset_ms, stats_file=args.stats_file,
+                                           profile_file=args.profile, profile_interval_ms=args.profile_interval_ms)
+        collector.stats_interval = args.stats_interval
+        collector.metrics = metrics
+        collector.run()
+    elif args.processes > 1:
+        coordinator = StatsCoordinator(args.processes, collector_kwargs, stats_interval=args.stats_interval,
+                                       stats_file=args.stats_file, partition_lag_file=args.partition_lag_file)
+        coordinator.metrics = metrics
+        coordinator.run()
+    else:
+        collector = KafkaStatsCollector(**collector_kwargs)
+        collector.stats_interval = args.stats_interval
+        collector.metrics = metrics
+        collector.run() 
\ No newline at end of file
@@ -0,0 +1,183 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Columns appended to kafka_stats.csv for the collector's own cost
+PROFILE_HEADER = ['consume_ms', 'parse_ms', 'stats_ms', 'msgs_per_consume', 'queue_depth_avg',
+                  'queue_depth_max', 'cpu_pct', 'rss_mb', 'busy_pct', 'collector_saturated']
+
+# A consume loop busy for this fraction of an interval can't keep up with more
+SATURATED_BUSY_FRACTION = 0.9
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def cpu_seconds():
+    """User plus system CPU time of this process, all threads included"""
+    times = os.times()
+    return times.user + times.system
+
+def rss_bytes():
+    """Resident set size of this process from /proc/self/statm, or None off Linux"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+class CollectorProfile:
+    """Where a collector's consume loop spends its time, per stats interval.
+
+    The loop adds the wall time of its three phases: consume() (fetching
+    from librdkafka's queue, or waiting for the broker), processing
+    (batching and parsing messages) and stats (summaries, CSV, reports to
+    the coordinator). A consume() call that returns fewer messages than
+    asked for ran out of messages, so its time counts as idle; the rest of
+    the interval is busy. A loop busy for nearly the whole interval is the
+    bottleneck, and the latencies it measures include its own queueing.
+
+    Stats time is spent after the interval's snapshot is taken, so it shows
+    up in the next row.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.consume_s = 0.0
+        self.parse_s = 0.0
+        self.stats_s = 0.0
+        self.idle_s = 0.0
+        self.consume_calls = 0
+        self.messages = 0
+        self.batches = 0
+        self.queue_depth_total = 0
+        self.queue_depth_max = 0
+        self.start_wall = time.perf_counter()
+        self.start_cpu = cpu_seconds()
+
+    def consumed(self, seconds, count, requested):
+        self.consume_s += seconds
+        self.consume_calls += 1
+        self.messages += count
+        if count < requested:
+            self.idle_s += seconds
+
+    def processed(self, seconds, queue_depth):
+        """Time spent on one consume() call's messages, and how many are left waiting for the next batch"""
+        self.parse_s += seconds
+        self.batches += 1
+        self.queue_depth_total += queue_depth
+        self.queue_depth_max = max(self.queue_depth_max, queue_depth)
+
+    def snapshot(self):
+        """The interval's totals as a plain dict (picklable for the coordinator); starts a new interval"""
+        wall_s = time.perf_counter() - self.start_wall
+        snapshot = {
+            'consume_s': self.consume_s,
+            'parse_s': self.parse_s,
+            'stats_s': self.stats_s,
+            'consume_calls': self.consume_calls,
+            'messages': self.messages,
+            'batches': self.batches,
+            'queue_depth_total': self.queue_depth_total,
+            'queue_depth_max': self.queue_depth_max,
+            'cpu_s': cpu_seconds() - self.start_cpu,
+            'wall_s': wall_s,
+            'rss_bytes': rss_bytes(),
+            'busy_fraction': 1 - self.idle_s / wall_s if wall_s > 0 else 0.0,
+        }
+        self.reset()
+        return snapshot
+
+def merge_profiles(snapshots):
+    """Combine the snapshots of several collector processes; None if there are none.
+
+    Times, counts, CPU and memory add up; the busiest worker decides whether
+    the collector as a whole is saturated.
+    """
+    snapshots = [snapshot for snapshot in snapshots if snapshot]
+    if not snapshots:
+        return None
+    merged = {key: sum(snapshot[key] for snapshot in snapshots)
+              for key in ('consume_s', 'parse_s', 'stats_s', 'consume_calls', 'messages',
+                          'batches', 'queue_depth_total', 'cpu_s')}
+    merged['queue_depth_max'] = max(snapshot['queue_depth_max'] for snapshot in snapshots)
+    merged['wall_s'] = max(snapshot['wall_s'] for snapshot in snapshots)
+    merged['busy_fraction'] = max(snapshot['busy_fraction'] for snapshot in snapshots)
+    rss = [snapshot['rss_bytes'] for snapshot in snapshots if snapshot['rss_bytes'] is not None]
+    merged['rss_bytes'] = sum(rss) if rss else None
+    return merged
+
+def is_saturated(profile):
+    return profile is not None and profile['busy_fraction'] >= SATURATED_BUSY_FRACTION
+
+def profile_columns(profile):
+    """Values for PROFILE_HEADER; empty when nothing was profiled"""
+    if profile is None:
+        return [''] * len(PROFILE_HEADER)
+    wall_s = profile['wall_s']
+    return [
+        round(profile['consume_s'] * 1000, 1),
+        round(profile['parse_s'] * 1000, 1),
+        round(profile['stats_s'] * 1000, 1),
+        round(profile['messages'] / profile['consume_calls'], 1) if profile['consume_calls'] else '',
+        round(profile['queue_depth_total'] / profile['batches'], 1) if profile['batches'] else '',
+        profile['queue_depth_max'],
+        round(profile['cpu_s'] / wall_s * 100, 1) if wall_s > 0 else '',
+        round(profile['rss_bytes'] / 2**20, 1) if profile['rss_bytes'] is not None else '',
+        round(profile['busy_fraction'] * 100, 1),
+        int(is_saturated(profile)),
+    ]
+
+class SamplingProfiler:
+    """Sample one thread's Python stack at a fixed interval and count the stacks seen.
+
+    A daemon thread reads sys._current_frames(), so the profiled thread runs
+    without tracing hooks and pays only for the GIL hand-offs. Time inside
+    C calls such as consume() is attributed to the Python line that made
+    them. close() writes one "frame;frame;frame count" line per stack, the
+    collapsed format flamegraph.pl and speedscope read, and prints the
+    lines that were sampled most often.
+    """
+
+    def __init__(self, path, interval_s=0.005, thread_id=None):
+        self.path = path
+        self.interval_s = interval_s
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        while not self.stop_event.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top_lines(self, count=10):
+        """[(frame, samples)] for the innermost frames sampled most often"""
+        leaves = Counter()
+        for stack, samples in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += samples
+        return leaves.most_common(count)
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+        with open(self.path, 'w') as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(f"{stack} {samples}\n")
+        print(f"Wrote {self.samples} profile samples to {self.path}")
+        for frame, samples in self.top_lines():
+            print(f"  {samples / self.samples * 100:>5.1f}%  {frame}")
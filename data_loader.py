@@ -1,79 +1,70 @@
-import psycopg2
 import json
-import random
-from datetime import datetime
+import os
+import time
 import argparse
+import multiprocessing
+import queue
+from workload_generator import WorkloadGenerator
 
 class DataLoader:
     def __init__(self, table_name="benchmark_records",
-                 dbname="testdb", user="postgres", password="postgres", 
-                 host="localhost", port="5432"):
-        self.conn = psycopg2.connect(
+                 dbname="testdb", user="postgres", password="postgres",
+                 host="localhost", port="5432", insert_method="values", copy_format="text",
+                 schema_type="benchmark", num_columns=1, target_bytes=100, generator="python"):
+        # Schemas and row generation are shared with the workload generator, so the
+        # loaded table is the one it later runs against
+        self.workload = WorkloadGenerator(
+            table_name=table_name,
             dbname=dbname,
             user=user,
             password=password,
             host=host,
-            port=port
+            port=port,
+            target_bytes=target_bytes,
+            num_columns=num_columns,
+            schema_type=schema_type,
+            insert_method=insert_method,
+            copy_format=copy_format,
+            generator=generator
         )
+        self.conn = self.workload.conn
+        self.cur = self.workload.cur
         self.table_name = table_name
-        self.cur = self.conn.cursor()
-        
-    def setup_table(self):
-        """Create the table if it doesn't exist and truncate it"""
-        self.cur.execute(f"""
-            CREATE TABLE IF NOT EXISTS {self.table_name} (
-                id SERIAL PRIMARY KEY,
-                string_field TEXT,
-                numeric_field DECIMAL,
-                timestamp_field TIMESTAMP WITH TIME ZONE,
-                json_field JSONB,
-                inserted_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        self.conn.commit()
-        
-    def generate_record(self):
-        """Generate a single record with random data"""
-        return {
-            "string_field": f"test-{random.randint(1, 1000)}",
-            "numeric_field": round(random.uniform(1, 1000), 2),
-            "timestamp_field": datetime.now(),
-            "json_field": json.dumps({"hello": f"world-{random.randint(1, 100)}"})
-        }
-    
-    def load_data(self, count, batch_size=1000):
+        self.schema_type = schema_type
+        self.insert_method = insert_method
+        self.copy_format = copy_format
+
+    def setup_table(self, create_indexes=True):
+        """Create the table if it doesn't exist; existing rows are kept"""
+        self.workload.setup_table(truncate=False, create_indexes=create_indexes)
+
+    def load_data(self, count, batch_size=1000, workers=1, chunk_size=100000,
+                  checkpoint_file=None, build_indexes_after=False, server_side=False):
         """Load specified number of records in batches"""
+        if workers > 1 or checkpoint_file or build_indexes_after or server_side:
+            return self.load_parallel(count, batch_size, workers, chunk_size,
+                                      checkpoint_file or 'data_loader_checkpoint.json',
+                                      build_indexes_after, server_side)
+        records_loaded = 0
         try:
             self.setup_table()
-            
+
             total_batches = (count + batch_size - 1) // batch_size
-            records_loaded = 0
-            
+
             print(f"Loading {count} records in {total_batches} batches...")
-            
+
             for batch_num in range(total_batches):
                 # Calculate batch size for last batch
                 current_batch_size = min(batch_size, count - records_loaded)
-                
-                records = [self.generate_record() for _ in range(current_batch_size)]
-                args_str = ','.join(self.cur.mogrify(
-                    "(%(string_field)s, %(numeric_field)s, %(timestamp_field)s, %(json_field)s)",
-                    record
-                ).decode('utf-8') for record in records)
-                
-                self.cur.execute(f"""
-                    INSERT INTO {self.table_name} 
-                    (string_field, numeric_field, timestamp_field, json_field)
-                    VALUES {args_str}
-                """)
-                
+
+                self.workload.insert_rows(*self.workload.generate_rows(current_batch_size))
+
                 self.conn.commit()
                 records_loaded += current_batch_size
-                
+
                 print(f"Batch {batch_num + 1}/{total_batches} complete. "
                       f"Loaded {records_loaded}/{count} records...")
-                
+
         except Exception as e:
             print(f"Error loading data: {e}")
         finally:
@@ -81,6 +72,214 @@ class DataLoader:
             print(f"Total records loaded: {records_loaded}")
             self.conn.close()
 
+    def read_checkpoint(self, checkpoint_file, count, chunk_size):
+        """Completed chunks and base id from a previous run of the same load, or None"""
+        if not os.path.exists(checkpoint_file):
+            return None
+        with open(checkpoint_file) as f:
+            checkpoint = json.load(f)
+        expected = {"table_name": self.table_name, "schema_type": self.schema_type,
+                    "count": count, "chunk_size": chunk_size}
+        mismatched = [key for key, value in expected.items() if checkpoint.get(key) != value]
+        if mismatched:
+            raise ValueError(f"Checkpoint {checkpoint_file} is for a different load "
+                             f"({', '.join(mismatched)} differ); remove it to start over")
+        return checkpoint
+
+    def loaded_chunks(self, checkpoint):
+        """Chunks with rows in the table; a chunk commits in one transaction, so any row means all"""
+        base_id, chunk_size = checkpoint["base_id"], checkpoint["chunk_size"]
+        # One pass over the table: without indexes, a lookup per chunk would scan it every time
+        self.cur.execute(f"SELECT DISTINCT (id - %s - 1) / %s FROM {self.table_name} WHERE id > %s",
+                         (base_id, chunk_size, base_id))
+        chunks = {row[0] for row in self.cur.fetchall()}
+        self.conn.commit()
+        return chunks
+
+    def write_checkpoint(self, checkpoint_file, checkpoint):
+        # Write then rename, so a crash never leaves a truncated checkpoint
+        tmp_file = f"{checkpoint_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_file, checkpoint_file)
+
+    def load_parallel(self, count, batch_size, workers, chunk_size, checkpoint_file,
+                      build_indexes_after, server_side=False):
+        """Load count records with worker processes COPYing disjoint id ranges.
+
+        The ids are split into chunks of chunk_size, each loaded and committed
+        in one transaction. Completed chunks are recorded in checkpoint_file,
+        so rerunning the same command after a crash only loads the rest. A
+        chunk can commit before it is recorded, so on resume chunks already in
+        the table count as completed too.
+        With server_side, each chunk is instead generated inside Postgres by a
+        single INSERT ... SELECT FROM generate_series, and no row data crosses
+        the network.
+        """
+        records_loaded = 0
+        start_time = time.time()
+        try:
+            checkpoint = self.read_checkpoint(checkpoint_file, count, chunk_size)
+            if checkpoint is None:
+                self.setup_table(create_indexes=not build_indexes_after)
+                # New rows go after any that are already there
+                self.cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.table_name}")
+                checkpoint = {
+                    "table_name": self.table_name,
+                    "schema_type": self.schema_type,
+                    "count": count,
+                    "chunk_size": chunk_size,
+                    "base_id": self.cur.fetchone()[0],
+                    "completed": []
+                }
+                self.conn.commit()
+                self.write_checkpoint(checkpoint_file, checkpoint)
+            else:
+                # Committed but not recorded before the last run stopped
+                recorded = set(checkpoint["completed"])
+                unrecorded = sorted(self.loaded_chunks(checkpoint) - recorded)
+                if unrecorded:
+                    checkpoint["completed"].extend(unrecorded)
+                    self.write_checkpoint(checkpoint_file, checkpoint)
+                print(f"Resuming from {checkpoint_file}: "
+                      f"{len(checkpoint['completed'])} chunks already loaded"
+                      + (f" ({len(unrecorded)} found in the table)" if unrecorded else ""))
+
+            total_chunks = (count + chunk_size - 1) // chunk_size
+            completed = set(checkpoint["completed"])
+            records_loaded = sum(min(chunk_size, count - chunk * chunk_size) for chunk in completed)
+            pending = [chunk for chunk in range(total_chunks) if chunk not in completed]
+
+            print(f"Loading {count} records in {total_chunks} chunks of {chunk_size} "
+                  f"with {workers} workers" + (", generated server-side" if server_side else "") + "...")
+
+            if pending:
+                ctx = multiprocessing.get_context('spawn')
+                chunks = ctx.Queue()
+                results = ctx.Queue()
+                for chunk in pending:
+                    chunks.put(chunk)
+                worker_count = min(workers, len(pending))
+                # One stop marker per worker after the chunks
+                for _ in range(worker_count):
+                    chunks.put(None)
+                generator_kwargs = {
+                    **self.workload.worker_kwargs(),
+                    "insert_method": "copy",
+                    "copy_format": self.copy_format
+                }
+                processes = [
+                    ctx.Process(target=load_worker_process,
+                                args=(generator_kwargs, checkpoint["base_id"], count, chunk_size,
+                                      batch_size, chunks, results, server_side))
+                    for _ in range(worker_count)
+                ]
+                for process in processes:
+                    process.start()
+
+                running = len(processes)
+
+                def handle(message):
+                    nonlocal records_loaded, running
+                    if message[0] == 'chunk':
+                        _, chunk, rows = message
+                        checkpoint["completed"].append(chunk)
+                        self.write_checkpoint(checkpoint_file, checkpoint)
+                        records_loaded += rows
+                        elapsed = time.time() - start_time
+                        print(f"Chunk {chunk + 1}/{total_chunks} complete. "
+                              f"Loaded {records_loaded}/{count} records "
+                              f"({records_loaded / elapsed:.0f} rows/s overall)...")
+                    elif message[0] == 'error':
+                        print(f"Error in loader process: {message[1]}")
+                    elif message[0] == 'done':
+                        running -= 1
+
+                try:
+                    while running:
+                        try:
+                            message = results.get(timeout=1.0)
+                        except queue.Empty:
+                            if not any(process.is_alive() for process in processes):
+                                break
+                            continue
+                        handle(message)
+                finally:
+                    # Record chunks committed while stopping; workers can't exit with unread results either
+                    deadline = time.time() + 10
+                    while running and time.time() < deadline:
+                        try:
+                            handle(results.get(timeout=0.5))
+                        except queue.Empty:
+                            if not any(process.is_alive() for process in processes):
+                                break
+                        except KeyboardInterrupt:
+                            break
+                    for process in processes:
+                        process.join(timeout=5)
+                        if process.is_alive():
+                            process.terminate()
+
+            if len(checkpoint["completed"]) < total_chunks:
+                print(f"\n{total_chunks - len(checkpoint['completed'])} chunks not loaded; "
+                      f"rerun the same command to resume from {checkpoint_file}")
+                return
+
+            # Rows were COPYed with explicit ids, so move the sequence past them
+            self.cur.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), (SELECT MAX(id) FROM {self.table_name}))",
+                (self.table_name,)
+            )
+            self.conn.commit()
+            if build_indexes_after:
+                print("Building indexes...")
+                index_start_time = time.time()
+                self.workload.create_indexes()
+                print(f"Indexes built in {time.time() - index_start_time:.2f}s")
+            os.remove(checkpoint_file)
+
+        except KeyboardInterrupt:
+            print(f"\nStopping data loader; rerun the same command to resume from {checkpoint_file}")
+        except Exception as e:
+            print(f"Error loading data: {e}")
+        finally:
+            elapsed = time.time() - start_time
+            print(f"\nFinal Statistics:")
+            print(f"Total records loaded: {records_loaded}")
+            print(f"Total time: {elapsed:.2f}s")
+            self.conn.close()
+
+def load_worker_process(generator_kwargs, base_id, count, chunk_size, batch_size, chunks, results,
+                        server_side=False):
+    """Entry point for a loader process: COPY chunks from the queue until a stop marker"""
+    generator = None
+    try:
+        generator = WorkloadGenerator(**generator_kwargs)
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            first_id = base_id + chunk * chunk_size + 1
+            rows_in_chunk = min(chunk_size, count - chunk * chunk_size)
+            # The whole chunk is one transaction, so a crash never leaves it half loaded
+            if server_side:
+                generator.cur.execute(generator.build_series_insert_sql(first_id, first_id + rows_in_chunk - 1))
+            else:
+                for offset in range(0, rows_in_chunk, batch_size):
+                    n = min(batch_size, rows_in_chunk - offset)
+                    columns, rows = generator.generate_rows(n)
+                    generator.copy_rows(range(first_id + offset, first_id + offset + n), columns, rows)
+            generator.conn.commit()
+            results.put(('chunk', chunk, rows_in_chunk))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        results.put(('error', str(e)))
+    finally:
+        results.put(('done',))
+        if generator is not None:
+            generator.conn.close()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Load test data into database')
     parser.add_argument('--count', type=int, required=True,
@@ -99,15 +298,52 @@ if __name__ == "__main__":
                       help='Database port (default: 5432)')
     parser.add_argument('--table-name', type=str, default='benchmark_records',
                       help='Table name (default: benchmark_records)')
-    
+    parser.add_argument('--schema-type', type=str, choices=['benchmark', 'holdings', 'devices'], default='benchmark',
+                      help='Schema type to use, as for workload_generator.py (default: benchmark)')
+    parser.add_argument('--byte-size', type=int, default=100,
+                      help='Target size in bytes for each row (default: 100)')
+    parser.add_argument('--columns', type=int, default=1,
+                      help='Number of additional columns (default: 1)')
+    parser.add_argument('--generator', type=str, choices=['python', 'numpy'], default='python',
+                      help='Generate batches row by row or column by column with NumPy (default: python)')
+    parser.add_argument('--insert-method', type=str, choices=['values', 'copy'], default='values',
+                      help='Insert with a multi-row INSERT ... VALUES or with COPY FROM STDIN (default: values)')
+    parser.add_argument('--copy-format', type=str, choices=['text', 'binary'], default='text',
+                      help='COPY format used by --insert-method copy (default: text)')
+    parser.add_argument('--workers', type=int, default=1,
+                      help='Loader processes; more than one always loads with COPY (default: 1)')
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                      help='Rows per checkpointed chunk in parallel mode (default: 100000)')
+    parser.add_argument('--checkpoint-file', type=str, default=None,
+                      help='Resumable checkpoint for parallel mode (default: data_loader_checkpoint.json)')
+    parser.add_argument('--build-indexes-after', action='store_true',
+                      help='Create the primary key and indexes after loading instead of before')
+    parser.add_argument('--server-side', action='store_true',
+                      help='Generate rows inside Postgres with INSERT ... SELECT FROM generate_series, '
+                           'one transaction per chunk')
+
     args = parser.parse_args()
-    
+
     loader = DataLoader(
         table_name=args.table_name,
         dbname=args.dbname,
         user=args.user,
         password=args.password,
         host=args.host,
-        port=args.port
+        port=args.port,
+        insert_method=args.insert_method,
+        copy_format=args.copy_format,
+        schema_type=args.schema_type,
+        num_columns=args.columns,
+        target_bytes=args.byte_size,
+        generator=args.generator
+    )
+    loader.load_data(
+        count=args.count,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        checkpoint_file=args.checkpoint_file,
+        build_indexes_after=args.build_indexes_after,
+        server_side=args.server_side
     )
-    loader.load_data(count=args.count, batch_size=args.batch_size)
\ No newline at end of file
@@ -0,0 +1,8 @@
+def format_data_rate(bytes_per_sec):
+    """Bytes per second as B/s, KB/s or MB/s, shared by the generator and the collectors"""
+    if bytes_per_sec >= 1_000_000:
+        return f"{bytes_per_sec/1_000_000:.2f} MB/s"
+    elif bytes_per_sec >= 1_000:
+        return f"{bytes_per_sec/1_000:.2f} KB/s"
+    else:
+        return f"{bytes_per_sec:.2f} B/s"
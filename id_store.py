@@ -0,0 +1,111 @@
+import numpy as np
+
+class IdStore:
+    """Live row ids in a list, with a position index for O(1) sampling and removal.
+
+    Removal swaps the last id into the freed slot, so positions roughly
+    follow insertion order: low positions hold long-lived rows and the end
+    of the list the most recent inserts.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, id_record):
+        if id_record in self.positions:
+            return
+        self.positions[id_record] = len(self.ids)
+        self.ids.append(id_record)
+
+    def extend(self, id_records):
+        for id_record in id_records:
+            self.append(id_record)
+
+    def remove(self, id_record):
+        """Remove an id; returns False if it was not in the store"""
+        pos = self.positions.pop(id_record, None)
+        if pos is None:
+            return False
+        last = self.ids.pop()
+        if pos < len(self.ids):
+            self.ids[pos] = last
+            self.positions[last] = pos
+        return True
+
+    def clear(self):
+        self.ids.clear()
+        self.positions.clear()
+
+    def sample(self, distribution, count, exclude=()):
+        """Up to count distinct ids drawn from distribution; hot ids may repeat and are merged.
+
+        Ids in exclude, e.g. rows locked by another open transaction, are skipped.
+        """
+        positions = np.unique(distribution.positions(len(self.ids), count))
+        return [self.ids[pos] for pos in positions if self.ids[pos] not in exclude]
+
+    def take(self, distribution, count, exclude=()):
+        """Sample up to count distinct ids and remove them"""
+        id_records = self.sample(distribution, count, exclude)
+        for id_record in id_records:
+            self.remove(id_record)
+        return id_records
+
+class KeyDistribution:
+    """Which positions of an IdStore an operation touches.
+
+      uniform  every live row equally likely
+      zipf     rank r (0 = oldest row) chosen with probability ~ 1/(r+1)**s
+      latest   zipf over recency: the newest rows are the hottest
+      hotspot  hot_fraction of the rows (the oldest) get hot_probability of the accesses
+    """
+
+    NAMES = ("uniform", "zipf", "latest", "hotspot")
+
+    def __init__(self, name, rng, zipf_s=0.99, hot_fraction=0.2, hot_probability=0.8):
+        if name not in self.NAMES:
+            raise ValueError(f"Unsupported key distribution: {name}")
+        self.name = name
+        self.rng = rng
+        self.zipf_s = zipf_s
+        self.hot_fraction = hot_fraction
+        self.hot_probability = hot_probability
+
+    def zipf_ranks(self, n, count):
+        """Zipf ranks in [0, n) by inverting the continuous (bounded Pareto) CDF.
+
+        Rank r covers [r + 0.5, r + 1.5), which tracks the discrete
+        distribution closely (rank 0 gets ~8% extra weight at s=0.99) without
+        computing its normalising sum, so n can change from one call to the next.
+        """
+        u = self.rng.random(count)
+        s = self.zipf_s
+        low, high = 0.5, n + 0.5
+        if abs(s - 1.0) < 1e-9:
+            x = low * (high / low) ** u
+        else:
+            a, b = low ** (1.0 - s), high ** (1.0 - s)
+            x = (a + u * (b - a)) ** (1.0 / (1.0 - s))
+        return np.clip((x + 0.5).astype(np.int64) - 1, 0, n - 1)
+
+    def positions(self, n, count):
+        """count positions in [0, n), possibly repeating"""
+        if n == 0 or count <= 0:
+            return np.empty(0, dtype=np.int64)
+        if self.name == "uniform":
+            return self.rng.integers(0, n, count)
+        if self.name == "zipf":
+            return self.zipf_ranks(n, count)
+        if self.name == "latest":
+            return n - 1 - self.zipf_ranks(n, count)
+        # hotspot
+        hot_n = max(1, int(n * self.hot_fraction))
+        hot = self.rng.random(count) < self.hot_probability
+        cold_n = n - hot_n
+        if cold_n == 0:
+            return self.rng.integers(0, n, count)
+        return np.where(hot, self.rng.integers(0, hot_n, count), hot_n + self.rng.integers(0, cold_n, count))
@@ -0,0 +1,129 @@
+import math
+import numpy as np
+
+class LatencyHistogram:
+    """HDR-style log-bucketed histogram of integer latencies in milliseconds.
+
+    Values below 2**sub_bucket_bits are counted exactly. Above that, every
+    power-of-two range is split into 2**(sub_bucket_bits - 1) buckets, so a
+    reported percentile is within ~1.6% of the true value (with the default
+    of 7 bits). Counts live in one fixed-size NumPy array: recording is O(1)
+    per value and memory does not grow with the number of samples.
+
+    Values are clamped to [0, max_value_ms] for bucketing (negative latencies
+    come from clock skew between source and broker), but count, sum, min and
+    max are tracked exactly.
+    """
+
+    def __init__(self, max_value_ms=3_600_000, sub_bucket_bits=7):
+        self.max_value_ms = max_value_ms
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count // 2
+        max_shift = max(0, max_value_ms.bit_length() - sub_bucket_bits)
+        self.bucket_count = self.sub_bucket_count + max_shift * self.sub_bucket_half
+        self.counts = np.zeros(self.bucket_count, dtype=np.int64)
+        self.bucket_values = self._bucket_midpoints()
+        self.reset()
+
+    def _bucket_midpoints(self):
+        """Representative value of every bucket"""
+        idx = np.arange(self.bucket_count)
+        offset = idx - self.sub_bucket_count
+        shift = np.where(offset >= 0, offset // self.sub_bucket_half + 1, 0)
+        top = np.where(offset >= 0, offset % self.sub_bucket_half + self.sub_bucket_half, idx)
+        lower = top << shift
+        return lower + ((1 << shift) - 1) / 2
+
+    def _index(self, value):
+        value = min(max(int(value), 0), self.max_value_ms)
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        if shift == 0:
+            return value
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + ((value >> shift) - self.sub_bucket_half)
+
+    def _indexes(self, values):
+        values = np.clip(values, 0, self.max_value_ms)
+        # frexp's exponent is the bit length for positive integers
+        shift = np.maximum(np.frexp(values)[1] - self.sub_bucket_bits, 0)
+        return np.where(
+            shift == 0,
+            values,
+            self.sub_bucket_count + (shift - 1) * self.sub_bucket_half
+            + ((values >> shift) - self.sub_bucket_half)
+        )
+
+    def reset(self):
+        self.counts[:] = 0
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """Record one latency"""
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def record_many(self, values):
+        """Record an array of latencies at once"""
+        values = np.asarray(values, dtype=np.int64)
+        if len(values) == 0:
+            return
+        self.counts += np.bincount(self._indexes(values), minlength=self.bucket_count)
+        self.count += len(values)
+        self.sum += int(values.sum())
+        low, high = int(values.min()), int(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def add(self, other):
+        """Merge another histogram with the same layout into this one"""
+        if other.count == 0:
+            return
+        self.counts += other.counts
+        self.count += other.count
+        self.sum += other.sum
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def value_at_percentile(self, percentile):
+        """Latency at the given percentile (0-100), or None when empty"""
+        if self.count == 0:
+            return None
+        target = max(1, math.ceil(percentile / 100 * self.count))
+        idx = int(np.searchsorted(np.cumsum(self.counts), target))
+        # The exact extremes are known, so never report outside them
+        return float(min(max(self.bucket_values[idx], self.min), self.max))
+
+    def summary(self, percentiles=(50, 95, 99, 99.9)):
+        """avg, the requested percentiles and max, as a list"""
+        return [self.mean(), *[self.value_at_percentile(p) for p in percentiles], self.max]
+
+    def snapshot(self):
+        """Compact, picklable form: only the non-empty buckets are kept"""
+        idx = np.flatnonzero(self.counts)
+        return {
+            'idx': idx.astype(np.int32),
+            'counts': self.counts[idx],
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    def add_snapshot(self, snapshot):
+        """Merge a snapshot() taken from a histogram with the same layout"""
+        if snapshot['count'] == 0:
+            return
+        self.counts[snapshot['idx']] += snapshot['counts']
+        self.count += snapshot['count']
+        self.sum += snapshot['sum']
+        self.min = snapshot['min'] if self.min is None else min(self.min, snapshot['min'])
+        self.max = snapshot['max'] if self.max is None else max(self.max, snapshot['max'])
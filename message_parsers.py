@@ -0,0 +1,335 @@
+import json
+import re
+from datetime import datetime
+import numpy as np
+
+# Reference implementation: two backtracking searches over the decoded message
+DEBEZIUM_SOURCE_TS_RE = re.compile(r'source=Struct{.*?ts_ms=(\d+)')
+DEBEZIUM_DELIVERY_TS_RE = re.compile(r',ts_ms=(\d+),ts_us=')
+
+DIGITS = b'0123456789'
+
+# Struct.toString() output, e.g. "...source=Struct{...,ts_ms=1,snapshot=...},op=c,ts_ms=2,ts_us=..."
+STRUCT_SOURCE = b'source=Struct{'
+STRUCT_TS_MS = b'ts_ms='
+STRUCT_ENVELOPE_TS_MS = b',ts_ms='
+STRUCT_ENVELOPE_TS_US = b',ts_us='
+
+# JsonConverter output, with or without the schema/payload wrapper. Compact
+# keys are tried first; keys without the colon catch pretty-printed JSON
+JSON_SOURCE_COMPACT = b'"source":{'
+JSON_TS_MS_COMPACT = b'"ts_ms":'
+JSON_SOURCE = b'"source"'
+JSON_TS_MS = b'"ts_ms"'
+JSON_WHITESPACE = b' \t\r\n'
+
+# Sequin messages: {"record": {...}, "metadata": {..., "commit_timestamp": "2024-12-05T18:19:05.123456Z", ...}}
+SEQUIN_METADATA = b'"metadata":'
+SEQUIN_COMMIT_TS = b'"commit_timestamp":'
+SEQUIN_RECORD = b'"record":'
+SEQUIN_DELETE = b'"action":"delete"'
+
+# Write time stamped by workload_generator.py --stamp-writes, in epoch microseconds.
+# It shows up as write_ts_us=1 (Struct column), "write_ts_us":1 (JSON column or
+# Sequin json_field), "write_ts_us": 1 (jsonb text) or \"write_ts_us\": 1 (JSON string)
+WRITE_TS_US = b'write_ts_us'
+WRITE_TS_SEPARATORS = b'"\\:= '
+STRUCT_AFTER = b'after='
+JSON_AFTER = b'"after":'
+
+def parse_debezium_regex(msg_str):
+    """(source_ts, delivery_ts) from a decoded Struct message; either may be None"""
+    source_ts_match = DEBEZIUM_SOURCE_TS_RE.search(msg_str)
+    delivery_ts_match = DEBEZIUM_DELIVERY_TS_RE.search(msg_str)
+    source_ts = int(source_ts_match.group(1)) if source_ts_match else None
+    delivery_ts = int(delivery_ts_match.group(1)) if delivery_ts_match else None
+    return source_ts, delivery_ts
+
+def _digits_at(value, pos):
+    """Number of ASCII digits starting at pos"""
+    chunk = value[pos:pos + 20]
+    return len(chunk) - len(chunk.lstrip(DIGITS))
+
+def _int_at(value, pos):
+    ndigits = _digits_at(value, pos)
+    if ndigits == 0:
+        return None
+    return int(value[pos:pos + ndigits])
+
+def debezium_struct_timestamps(value):
+    """(source_ts, delivery_ts) from raw Struct bytes without decoding, or None"""
+    start = value.find(STRUCT_SOURCE)
+    if start < 0:
+        return None
+    pos = value.find(STRUCT_TS_MS, start + 14)
+    if pos < 0:
+        return None
+    pos += 6
+    # Inside the source struct ts_ms is always followed by another field
+    end = value.find(b',', pos, pos + 21)
+
+    # The envelope ts_ms is the last one in the message and is directly
+    # followed by ts_us; search backwards since it sits near the end
+    env = value.rfind(STRUCT_ENVELOPE_TS_MS)
+    env_end = value.find(STRUCT_ENVELOPE_TS_US, env + 7, env + 28) if env >= 0 else -1
+    if end < 0 or env_end < 0:
+        return _debezium_struct_fallback(value, start)
+    try:
+        return int(value[pos:end]), int(value[env + 7:env_end])
+    except ValueError:
+        return _debezium_struct_fallback(value, start)
+
+def _debezium_struct_fallback(value, start):
+    """Slower scan for messages the fast path can't handle, e.g. field data containing ts_ms="""
+    pos = value.find(STRUCT_TS_MS, start + len(STRUCT_SOURCE))
+    source_ts = _int_at(value, pos + len(STRUCT_TS_MS)) if pos >= 0 else None
+    if source_ts is None:
+        return None
+    pos = value.rfind(STRUCT_ENVELOPE_TS_MS)
+    while pos >= 0:
+        digits_start = pos + len(STRUCT_ENVELOPE_TS_MS)
+        ndigits = _digits_at(value, digits_start)
+        if ndigits and value.startswith(STRUCT_ENVELOPE_TS_US, digits_start + ndigits):
+            return source_ts, int(value[digits_start:digits_start + ndigits])
+        pos = value.rfind(STRUCT_ENVELOPE_TS_MS, 0, pos)
+    return None
+
+def _json_value_at(value, pos):
+    """Start of the value after a JSON key ending at pos, or -1 if no colon follows (e.g. a string value)"""
+    if value[pos:pos + 1] != b':':
+        # Whitespace before the colon, or not a key at all
+        pos += len(value[pos:pos + 16]) - len(value[pos:pos + 16].lstrip(JSON_WHITESPACE))
+        if value[pos:pos + 1] != b':':
+            return -1
+    pos += 1
+    if value[pos:pos + 1] in JSON_WHITESPACE:
+        pos += len(value[pos:pos + 16]) - len(value[pos:pos + 16].lstrip(JSON_WHITESPACE))
+    return pos
+
+def _json_ts_ms(value, start, last=False):
+    """(key position, value) of the first, or last, "ts_ms" key after start with an integer value, or None"""
+    pos = value.rfind(JSON_TS_MS_COMPACT, start) if last else value.find(JSON_TS_MS_COMPACT, start)
+    if pos >= 0:
+        ts = _int_at(value, pos + len(JSON_TS_MS_COMPACT))
+        if ts is not None:
+            return pos, ts
+    pos = value.rfind(JSON_TS_MS, start) if last else value.find(JSON_TS_MS, start)
+    while pos >= 0:
+        value_pos = _json_value_at(value, pos + len(JSON_TS_MS))
+        ts = _int_at(value, value_pos) if value_pos >= 0 else None
+        if ts is not None:
+            return pos, ts
+        pos = value.rfind(JSON_TS_MS, start, pos) if last else value.find(JSON_TS_MS, pos + 1)
+    return None
+
+def _json_source_start(value):
+    """Position of the source block's opening brace, or -1"""
+    start = value.find(JSON_SOURCE_COMPACT)
+    if start >= 0:
+        return start + len(JSON_SOURCE_COMPACT) - 1
+    # With the schema wrapper "source" also appears as a field name string; the key is followed by an object
+    pos = value.find(JSON_SOURCE)
+    while pos >= 0:
+        start = _json_value_at(value, pos + len(JSON_SOURCE))
+        if start >= 0 and value[start:start + 1] == b'{':
+            return start
+        pos = value.find(JSON_SOURCE, pos + 1)
+    return -1
+
+def debezium_json_timestamps(value):
+    """(source_ts, delivery_ts) from raw JsonConverter bytes without decoding, or None"""
+    start = _json_source_start(value)
+    if start < 0:
+        return None
+    source = _json_ts_ms(value, start)
+    if source is None:
+        return None
+    # The envelope ts_ms comes after the source block
+    delivery = _json_ts_ms(value, source[0] + 1, last=True)
+    if delivery is None:
+        return None
+    return source[1], delivery[1]
+
+def debezium_timestamps(value):
+    """Detect the converter from the first byte: JSON starts with '{', Struct with 'Struct{'"""
+    if value[:1] == b'{':
+        return debezium_json_timestamps(value)
+    return debezium_struct_timestamps(value)
+
+DEBEZIUM_PARSERS = {
+    'auto': debezium_timestamps,
+    'struct': debezium_struct_timestamps,
+    'json': debezium_json_timestamps,
+}
+
+def parse_debezium_batch(values, message_format='auto'):
+    """Parse a whole consume() batch of raw Debezium message values.
+
+    Each value is still parsed by a Python call of its own; the gain over
+    the regex path comes from skipping the decode and the backtracking
+    searches, so it is modest for small Struct messages and grows with
+    message size (see parser_benchmark.py). Only building the result
+    arrays is done once per batch.
+
+    Returns (source_ts, delivery_ts, failed): int64 arrays for the messages
+    that parsed, and the indexes of the ones that did not.
+    """
+    parse = DEBEZIUM_PARSERS[message_format]
+    parsed = [parse(value) if value is not None else None for value in values]
+    failed = [i for i, timestamps in enumerate(parsed) if timestamps is None]
+    if failed:
+        parsed = [timestamps for timestamps in parsed if timestamps is not None]
+    if not parsed:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, failed
+    timestamps = np.array(parsed, dtype=np.int64)
+    return timestamps[:, 0], timestamps[:, 1], failed
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 for a proleptic Gregorian date"""
+    year -= month <= 2
+    era = (year if year >= 0 else year - 399) // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+class Iso8601Parser:
+    """Convert ISO-8601 timestamps (bytes) to epoch milliseconds.
+
+    Commit timestamps within a run share a handful of distinct minutes, so
+    the epoch value of each "YYYY-MM-DDTHH:MM" prefix is cached and only the
+    seconds, fraction and offset are parsed per message.
+    """
+
+    def __init__(self, max_cache_size=10000):
+        self.minute_cache = {}
+        self.max_cache_size = max_cache_size
+
+    def to_epoch_ms(self, ts):
+        minute_key = ts[:16]
+        base_ms = self.minute_cache.get(minute_key)
+        if base_ms is None:
+            if ts[4:5] != b'-' or ts[10:11] not in (b'T', b' ') or ts[13:14] != b':':
+                raise ValueError(f"Not an ISO-8601 timestamp: {ts!r}")
+            days = _days_from_civil(int(ts[0:4]), int(ts[5:7]), int(ts[8:10]))
+            base_ms = ((days * 24 + int(ts[11:13])) * 60 + int(ts[14:16])) * 60_000
+            if len(self.minute_cache) >= self.max_cache_size:
+                self.minute_cache.clear()
+            self.minute_cache[minute_key] = base_ms
+
+        ms = base_ms + int(ts[17:19]) * 1000
+        rest = ts[19:]
+        if rest[:1] == b'.':
+            fraction = rest[1:]
+            ndigits = len(fraction) - len(fraction.lstrip(DIGITS))
+            ms += int(fraction[:3].ljust(3, b'0')) if ndigits >= 3 else int(fraction[:ndigits].ljust(3, b'0'))
+            rest = fraction[ndigits:]
+        if rest in (b'', b'Z', b'+00:00'):
+            return ms
+        sign = 1 if rest[:1] == b'+' else -1
+        if rest[:1] not in (b'+', b'-'):
+            raise ValueError(f"Unsupported timezone in {ts!r}")
+        # +HH, +HHMM or +HH:MM
+        if len(rest) == 3:
+            offset_minutes = int(rest[1:3]) * 60
+        elif len(rest) == 5 or (len(rest) == 6 and rest[3:4] == b':'):
+            offset_minutes = int(rest[1:3]) * 60 + int(rest[-2:])
+        else:
+            raise ValueError(f"Unsupported timezone in {ts!r}")
+        return ms - sign * offset_minutes * 60_000
+
+ISO8601 = Iso8601Parser()
+
+def sequin_commit_ts_ms(value):
+    """commit_timestamp in epoch ms, extracted from the raw bytes, or None"""
+    start = value.find(SEQUIN_METADATA)
+    pos = value.find(SEQUIN_COMMIT_TS, start if start >= 0 else 0)
+    if pos < 0:
+        return None
+    pos = value.find(b'"', pos + len(SEQUIN_COMMIT_TS))
+    end = value.find(b'"', pos + 1, pos + 40)
+    if pos < 0 or end < 0:
+        return None
+    try:
+        return ISO8601.to_epoch_ms(value[pos + 1:end])
+    except (ValueError, IndexError):
+        return None
+
+def sequin_commit_ts_ms_json(value):
+    """Full json.loads + fromisoformat path, used when the fast path fails"""
+    metadata = json.loads(value).get('metadata', {})
+    commit_ts = datetime.fromisoformat(metadata['commit_timestamp'].replace('Z', '+00:00'))
+    return int(commit_ts.timestamp() * 1000)
+
+def parse_sequin_batch(values, delivery_ts):
+    """Parse a whole consume() batch of Sequin message values.
+
+    delivery_ts holds each message's Kafka CreateTime. Returns (source_ts,
+    delivery_ts, failed) like parse_debezium_batch.
+    """
+    source_ts = []
+    delivered = []
+    failed = []
+    for i, value in enumerate(values):
+        commit_ts = sequin_commit_ts_ms(value)
+        if commit_ts is None:
+            try:
+                commit_ts = sequin_commit_ts_ms_json(value)
+            except Exception:
+                failed.append(i)
+                continue
+        source_ts.append(commit_ts)
+        delivered.append(delivery_ts[i])
+    return np.array(source_ts, dtype=np.int64), np.array(delivered, dtype=np.int64), failed
+
+def write_ts_us(value, start=0):
+    """First write_ts_us stamp at or after start, or None"""
+    pos = value.find(WRITE_TS_US, start)
+    if pos < 0:
+        return None
+    pos += len(WRITE_TS_US)
+    chunk = value[pos:pos + 6]
+    return _int_at(value, pos + len(chunk) - len(chunk.lstrip(WRITE_TS_SEPARATORS)))
+
+def debezium_write_ts_us(value):
+    """Stamp from the new row image; None for deletes, whose after is null"""
+    after = value.find(JSON_AFTER if value[:1] == b'{' else STRUCT_AFTER)
+    if after < 0:
+        return None
+    return write_ts_us(value, after)
+
+def sequin_write_ts_us(value):
+    """Stamp from the record; deletes carry the old row, and changes the old values"""
+    if SEQUIN_DELETE in value:
+        return None
+    record = value.find(SEQUIN_RECORD)
+    if record < 0:
+        return None
+    return write_ts_us(value, record)
+
+WRITE_STAMP_PARSERS = {
+    'debezium': debezium_write_ts_us,
+    'sequin': sequin_write_ts_us,
+}
+
+def parse_write_stamps(values, consume_ts, source):
+    """Pair each stamped message's write time with its consume time.
+
+    consume_ts holds each message's consume time in epoch microseconds.
+    Returns (write_ts_us, consume_ts_us, unstamped): int64 arrays for the
+    messages that carry a stamp, and the indexes of the ones that do not
+    (deletes and rows written without --stamp-writes).
+    """
+    parse = WRITE_STAMP_PARSERS[source]
+    write_ts = []
+    consumed = []
+    unstamped = []
+    for i, (value, consume_time) in enumerate(zip(values, consume_ts)):
+        stamp = parse(value)
+        if stamp is not None:
+            write_ts.append(stamp)
+            consumed.append(consume_time)
+        else:
+            unstamped.append(i)
+    return np.array(write_ts, dtype=np.int64), np.array(consumed, dtype=np.int64), unstamped
@@ -0,0 +1,247 @@
+import argparse
+import atexit
+import bisect
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds of the exported histogram buckets; one more bucket holds everything above
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+DURATION_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def parse_metrics_target(value):
+    """--metrics: prometheus:PORT, or statsd:HOST:PORT for a DogStatsD agent"""
+    kind, _, rest = value.partition(':')
+    try:
+        if kind == 'prometheus':
+            return kind, int(rest)
+        if kind == 'statsd':
+            host, _, port = rest.rpartition(':')
+            return kind, (host or '127.0.0.1', int(port))
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError("metrics target must be prometheus:PORT or statsd:HOST:PORT")
+
+def parse_tags(value):
+    """--metrics-tags: comma-separated key:value pairs, e.g. run:sequin,instance:a"""
+    tags = {}
+    for pair in filter(None, value.split(',')):
+        key, sep, tag_value = pair.partition(':')
+        if not sep or not key:
+            raise argparse.ArgumentTypeError(f"expected key:value, got {pair!r}")
+        tags[key] = tag_value
+    return tags
+
+def create_metrics(target, prefix='cdc_benchmark', tags=None):
+    """Metrics exported as parse_metrics_target describes"""
+    kind, address = target
+    if kind == 'prometheus':
+        return PrometheusMetrics(address, prefix, tags)
+    return StatsdMetrics(address, prefix, tags)
+
+class Metrics:
+    """Counters, gauges and histograms kept in this process for an exporter.
+
+    Callers update them once per batch or stats interval, never per message
+    or row, and an update is a dict operation under a lock, so they cost
+    next to nothing at full load. Labels become Prometheus labels or
+    DogStatsD tags; tags are added to every metric.
+    """
+
+    def __init__(self, prefix, tags=None):
+        self.prefix = prefix
+        self.tags = dict(tags or {})
+        self.lock = threading.Lock()
+        # (name, labels) -> value
+        self.counters = {}
+        self.gauges = {}
+        # (name, labels) -> [bounds, bucket counts with the overflow last, sum, count]
+        self.histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def _histogram(self, name, bounds, labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [tuple(bounds), [0] * (len(bounds) + 1), 0, 0]
+        return histogram
+
+    def observe(self, name, value, bounds, **labels):
+        """Count one value into the bucket of the first bound it doesn't exceed"""
+        with self.lock:
+            histogram = self._histogram(name, bounds, labels)
+            histogram[1][bisect.bisect_left(bounds, value)] += 1
+            histogram[2] += value
+            histogram[3] += 1
+
+    def observe_counts(self, name, bounds, counts, total, **labels):
+        """Add values already bucketed by bounds; total is their sum"""
+        with self.lock:
+            histogram = self._histogram(name, bounds, labels)
+            for i, count in enumerate(counts):
+                histogram[1][i] += int(count)
+                histogram[3] += int(count)
+            histogram[2] += total
+
+    def copy(self):
+        """Consistent copies of (counters, gauges, histograms)"""
+        with self.lock:
+            return (dict(self.counters), dict(self.gauges),
+                    {key: (bounds, list(counts), total, count)
+                     for key, (bounds, counts, total, count) in self.histograms.items()})
+
+    def maybe_flush(self):
+        """Push metrics if this exporter pushes and it is time to; Prometheus is scraped instead"""
+
+    def flush(self):
+        pass
+
+class PrometheusMetrics(Metrics):
+    """Metrics served in the Prometheus text format at http://<host>:port/metrics.
+
+    A daemon thread answers scrapes; rendering copies the values under the
+    lock, so the caller's loop only ever waits for the copy.
+    """
+
+    def __init__(self, port, prefix, tags=None):
+        super().__init__(prefix, tags)
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('', port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Serving metrics on http://0.0.0.0:{port}/metrics")
+
+    def label_string(self, labels, extra=()):
+        pairs = [*self.tags.items(), *labels, *extra]
+        return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}' if pairs else ''
+
+    def render(self):
+        counters, gauges, histograms = self.copy()
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                lines.append(f"# TYPE {name} {kind}")
+                declared.add(name)
+
+        for (name, labels), value in sorted(counters.items()):
+            declare(f"{self.prefix}_{name}_total", 'counter')
+            lines.append(f"{self.prefix}_{name}_total{self.label_string(labels)} {value}")
+        for (name, labels), value in sorted(gauges.items()):
+            declare(f"{self.prefix}_{name}", 'gauge')
+            lines.append(f"{self.prefix}_{name}{self.label_string(labels)} {value}")
+        for (name, labels), (bounds, counts, total, count) in sorted(histograms.items()):
+            full_name = f"{self.prefix}_{name}"
+            declare(full_name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip((*bounds, '+Inf'), counts):
+                cumulative += bucket_count
+                lines.append(f"{full_name}_bucket{self.label_string(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{full_name}_sum{self.label_string(labels)} {total}")
+            lines.append(f"{full_name}_count{self.label_string(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+class StatsdMetrics(Metrics):
+    """Metrics sent to a DogStatsD agent over UDP at most every flush_interval seconds.
+
+    Counters and histogram buckets (name.bucket tagged le:<bound>, plus
+    name.sum and name.count) go out as the change since the last flush,
+    gauges as their latest value, packed into datagrams of at most
+    MAX_DATAGRAM bytes. The socket is non-blocking: when the send buffer
+    is full the datagram is dropped, so a slow or missing agent never
+    stalls the caller. Whatever is left is flushed at exit.
+    """
+
+    MAX_DATAGRAM = 1432
+
+    def __init__(self, address, prefix, tags=None, flush_interval=1.0):
+        super().__init__(prefix, tags)
+        host, port = address
+        # Resolved once, so flushing never waits for DNS
+        self.address = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+        self.flush_interval = flush_interval
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.last_flush = time.time()
+        # What the agent has already been sent, to turn running totals into deltas
+        self.sent = {}
+        self.dropped = 0
+        atexit.register(self.flush)
+
+    def tag_string(self, labels, extra=()):
+        pairs = [*self.tags.items(), *labels, *extra]
+        return '|#' + ','.join(f"{key}:{value}" for key, value in pairs) if pairs else ''
+
+    def delta(self, key, total):
+        change = total - self.sent.get(key, 0)
+        self.sent[key] = total
+        return change
+
+    def lines(self):
+        counters, gauges, histograms = self.copy()
+        lines = []
+        for (name, labels), value in counters.items():
+            change = self.delta(('c', name, labels), value)
+            if change:
+                lines.append(f"{self.prefix}.{name}:{change}|c{self.tag_string(labels)}")
+        for (name, labels), value in gauges.items():
+            lines.append(f"{self.prefix}.{name}:{value}|g{self.tag_string(labels)}")
+        for (name, labels), (bounds, counts, total, count) in histograms.items():
+            count_change = self.delta(('n', name, labels), count)
+            if not count_change:
+                continue
+            for bound, bucket_count in zip((*bounds, 'inf'), counts):
+                change = self.delta(('b', name, labels, bound), bucket_count)
+                if change:
+                    lines.append(f"{self.prefix}.{name}.bucket:{change}|c"
+                                 f"{self.tag_string(labels, [('le', bound)])}")
+            lines.append(f"{self.prefix}.{name}.sum:{self.delta(('s', name, labels), total)}|c"
+                         f"{self.tag_string(labels)}")
+            lines.append(f"{self.prefix}.{name}.count:{count_change}|c{self.tag_string(labels)}")
+        return lines
+
+    def maybe_flush(self):
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.time()
+        datagram = b''
+        for line in self.lines():
+            encoded = line.encode('utf-8')
+            if datagram and len(datagram) + 1 + len(encoded) > self.MAX_DATAGRAM:
+                self.send(datagram)
+                datagram = b''
+            datagram = datagram + b'\n' + encoded if datagram else encoded
+        if datagram:
+            self.send(datagram)
+
+    def send(self, datagram):
+        try:
+            self.sock.sendto(datagram, self.address)
+        except OSError:
+            # Full buffer (BlockingIOError) or no agent listening; metrics are best effort
+            self.dropped += 1
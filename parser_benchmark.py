@@ -0,0 +1,158 @@
+import argparse
+import json
+import random
+import string
+import time
+from datetime import datetime, timezone
+from message_parsers import (parse_debezium_regex, parse_debezium_batch,
+                             parse_sequin_batch, sequin_commit_ts_ms_json)
+
+def debezium_struct_message(row_id, source_ts, delivery_ts, padding):
+    """A Debezium change event as rendered by Struct.toString()"""
+    return (
+        f"Struct{{after=Struct{{id={row_id},string_field=test-{random.randint(1, 1000)},"
+        f"numeric_field={random.uniform(1, 1000):.2f},timestamp_field=2024-12-01T12:00:00.000000Z,"
+        f"json_field={{\"hello\": \"world-{random.randint(1, 100)}\", \"padding\": \"{padding}\"}},"
+        f"extra_col_0=extra-{random.randint(1, 1000)},inserted_at={source_ts * 1000},updated_at={source_ts * 1000}}},"
+        f"source=Struct{{version=2.7.3.Final,connector=postgresql,name=postgres,ts_ms={source_ts},"
+        f"snapshot=false,db=postgres,sequence=[\"{row_id * 100}\",\"{row_id * 100 + 8}\"],"
+        f"ts_us={source_ts * 1000},ts_ns={source_ts * 1000000},schema=public,table=benchmark_records,"
+        f"txId={row_id},lsn={row_id * 100 + 8}}},op=c,"
+        f"ts_ms={delivery_ts},ts_us={delivery_ts * 1000},ts_ns={delivery_ts * 1000000}}}"
+    ).encode('utf-8')
+
+def debezium_json_message(row_id, source_ts, delivery_ts, padding):
+    """The same change event as rendered by the JsonConverter without schemas"""
+    return json.dumps({
+        "before": None,
+        "after": {
+            "id": row_id,
+            "string_field": f"test-{random.randint(1, 1000)}",
+            "numeric_field": round(random.uniform(1, 1000), 2),
+            "timestamp_field": "2024-12-01T12:00:00.000000Z",
+            "json_field": json.dumps({"hello": f"world-{random.randint(1, 100)}", "padding": padding}),
+            "extra_col_0": f"extra-{random.randint(1, 1000)}",
+            "inserted_at": source_ts * 1000,
+            "updated_at": source_ts * 1000
+        },
+        "source": {
+            "version": "2.7.3.Final", "connector": "postgresql", "name": "postgres",
+            "ts_ms": source_ts, "snapshot": "false", "db": "postgres",
+            "sequence": f"[\"{row_id * 100}\",\"{row_id * 100 + 8}\"]",
+            "ts_us": source_ts * 1000, "ts_ns": source_ts * 1000000,
+            "schema": "public", "table": "benchmark_records", "txId": row_id, "lsn": row_id * 100 + 8
+        },
+        "transaction": None,
+        "op": "c",
+        "ts_ms": delivery_ts,
+        "ts_us": delivery_ts * 1000,
+        "ts_ns": delivery_ts * 1000000
+    }, separators=(',', ':')).encode('utf-8')
+
+def sequin_message(row_id, source_ts, delivery_ts, padding):
+    """A Sequin change message as delivered to the Kafka sink"""
+    commit_timestamp = datetime.fromtimestamp(source_ts / 1000, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return json.dumps({
+        "record": {
+            "id": row_id,
+            "string_field": f"test-{random.randint(1, 1000)}",
+            "numeric_field": round(random.uniform(1, 1000), 2),
+            "timestamp_field": "2024-12-01T12:00:00.000000Z",
+            "json_field": {"hello": f"world-{random.randint(1, 100)}", "padding": padding},
+            "extra_col_0": f"extra-{random.randint(1, 1000)}",
+            "inserted_at": "2024-12-01T12:00:00.000000",
+            "updated_at": "2024-12-01T12:00:00.000000"
+        },
+        "changes": None,
+        "action": "insert",
+        "metadata": {
+            "table_schema": "public",
+            "table_name": "benchmark_records",
+            "commit_timestamp": commit_timestamp,
+            "commit_lsn": row_id * 100 + 8,
+            "database_name": "postgres",
+            "consumer": {"id": "2b5e7f0c-0c8b-4a43-9b7b-9d0e8f6f5a01", "name": "kafka-sink"}
+        }
+    }, separators=(',', ':')).encode('utf-8')
+
+MESSAGE_BUILDERS = {
+    'struct': debezium_struct_message,
+    'json': debezium_json_message,
+    'sequin': sequin_message,
+}
+
+def make_padding(byte_size):
+    """Filler for json_field so rows come out at about byte_size bytes"""
+    return ''.join(random.choices(string.ascii_lowercase, k=max(0, byte_size - 93)))
+
+def build_messages(count, message_format, byte_size):
+    builder = MESSAGE_BUILDERS[message_format]
+    padding = make_padding(byte_size)
+    now_ms = int(time.time() * 1000)
+    return [builder(i, now_ms, now_ms + random.randint(5, 500), padding) for i in range(count)]
+
+def regex_path(values):
+    """What KafkaStatsCollector did per message before the batch parser"""
+    latencies = []
+    for value in values:
+        source_ts, delivery_ts = parse_debezium_regex(value.decode('utf-8'))
+        if source_ts is not None and delivery_ts is not None:
+            latencies.append(delivery_ts - source_ts)
+    return latencies
+
+def sequin_json_path(values):
+    """What KafkaStatsCollector did per Sequin message before the batch parser"""
+    return [sequin_commit_ts_ms_json(value) for value in values]
+
+def fast_path(values, message_format):
+    if message_format == 'sequin':
+        source_ts, delivery_ts, _ = parse_sequin_batch(values, [0] * len(values))
+    else:
+        source_ts, delivery_ts, _ = parse_debezium_batch(values, message_format)
+    return delivery_ts - source_ts
+
+def best_of(repeat, fn, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare collector message parsers on synthetic messages')
+    parser.add_argument('--messages', type=int, default=100000,
+                      help='Number of synthetic messages (default: 100000)')
+    parser.add_argument('--byte-size', type=int, default=100,
+                      help='Approximate row size, as for workload_generator.py (default: 100)')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                      help='Messages per parse batch, like one consume() call (default: 1000)')
+    parser.add_argument('--repeat', type=int, default=3,
+                      help='Runs per parser; the best is reported (default: 3)')
+
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(f"{args.messages} messages, ~{args.byte_size} byte rows, batches of {args.batch_size}\n")
+    for message_format in ('struct', 'json', 'sequin'):
+        values = build_messages(args.messages, message_format, args.byte_size)
+        batches = [values[i:i + args.batch_size] for i in range(0, len(values), args.batch_size)]
+        avg_size = sum(len(v) for v in values) / len(values)
+
+        fast_time, fast_result = best_of(
+            args.repeat, lambda: [fast_path(batch, message_format) for batch in batches])
+        fast_count = sum(len(r) for r in fast_result)
+        label = "Sequin" if message_format == 'sequin' else f"Debezium {message_format}"
+        print(f"{label} ({avg_size:.0f} B/msg):")
+        print(f"  fast:  {args.messages / fast_time:>12,.0f} msgs/s ({fast_count} parsed)")
+        if message_format == 'struct':
+            # The regex path only ever understood Struct output
+            regex_time, regex_result = best_of(args.repeat, regex_path, values)
+            print(f"  regex: {args.messages / regex_time:>12,.0f} msgs/s ({len(regex_result)} parsed)")
+            print(f"  speedup: {regex_time / fast_time:.1f}x")
+        elif message_format == 'sequin':
+            json_time, json_result = best_of(args.repeat, sequin_json_path, values)
+            print(f"  json:  {args.messages / json_time:>12,.0f} msgs/s ({len(json_result)} parsed)")
+            print(f"  speedup: {json_time / fast_time:.1f}x")
+        print()
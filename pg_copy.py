@@ -0,0 +1,197 @@
+import io
+import json
+import struct
+import uuid
+from datetime import datetime, date, timedelta, timezone
+from decimal import Decimal
+from functools import partial
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Postgres binary timestamps and dates count from 2000-01-01
+PG_EPOCH = datetime(2000, 1, 1)
+PG_EPOCH_UTC = datetime(2000, 1, 1, tzinfo=timezone.utc)
+PG_EPOCH_ORDINAL = date(2000, 1, 1).toordinal()
+
+BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+BINARY_TRAILER = struct.pack('!h', -1)
+NULL_FIELD = struct.pack('!i', -1)
+
+NUMERIC_POS = 0x0000
+NUMERIC_NEG = 0x4000
+
+def column_types(cur, table_name):
+    """Return a {column: type name} map for a table, e.g. {'id': 'integer'}"""
+    cur.execute("""
+        SELECT attname, atttypid::regtype::text
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+    """, (table_name,))
+    return dict(cur.fetchall())
+
+def session_timezone(cur):
+    """The session's TimeZone setting, which the server applies to naive timestamptz text input"""
+    cur.execute("SHOW TimeZone")
+    name = cur.fetchone()[0]
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        # Not an IANA name, e.g. a POSIX spec like <+05>-05; use its current offset
+        cur.execute("SELECT EXTRACT(TIMEZONE FROM now())")
+        return timezone(timedelta(seconds=int(cur.fetchone()[0])))
+
+def preallocate_ids(cur, table_name, count, id_column="id"):
+    """Reserve count ids from the table's serial sequence in one round trip.
+
+    Returns rows shaped like the result of INSERT ... RETURNING id.
+    """
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+        (table_name, id_column, count)
+    )
+    return cur.fetchall()
+
+def _escape_text(value):
+    return (value.replace('\\', '\\\\')
+                 .replace('\t', '\\t')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r'))
+
+def encode_text_field(value):
+    """Encode one value in COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return _escape_text(str(value))
+
+def encode_numeric(value):
+    """Encode a number in the Postgres binary numeric format (base 10000 digits)"""
+    sign, digits, exponent = Decimal(str(value)).as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError(f"Cannot encode {value!r} as numeric")
+    dscale = max(0, -exponent)
+    digit_str = ''.join(map(str, digits))
+    if exponent > 0:
+        digit_str += '0' * exponent
+        exponent = 0
+    # Make sure there is at least one integer digit before splitting at the decimal point
+    digit_str = digit_str.rjust(-exponent + 1, '0')
+    split = len(digit_str) + exponent
+    int_part, frac_part = digit_str[:split], digit_str[split:]
+    int_part = int_part.rjust((len(int_part) + 3) // 4 * 4, '0')
+    frac_part = frac_part.ljust((len(frac_part) + 3) // 4 * 4, '0')
+    groups = [int(int_part[i:i + 4]) for i in range(0, len(int_part), 4)]
+    weight = len(groups) - 1
+    groups += [int(frac_part[i:i + 4]) for i in range(0, len(frac_part), 4)]
+    # Leading and trailing zero groups are implied by weight and ndigits
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+    body = struct.pack(f'!hhHH{len(groups)}H', len(groups), weight,
+                       NUMERIC_NEG if sign else NUMERIC_POS, dscale, *groups)
+    return struct.pack('!i', len(body)) + body
+
+def _pack_bytes(data):
+    return struct.pack('!i', len(data)) + data
+
+def _encode_timestamp(value):
+    delta = value - PG_EPOCH
+    return struct.pack('!iq', 8, (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+
+def _encode_timestamptz(value, tz=timezone.utc):
+    # Binary input carries no zone; naive datetimes are taken in tz, the session's
+    # TimeZone, so they land where text input of the same value would
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    delta = value - PG_EPOCH_UTC
+    return struct.pack('!iq', 8, (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+
+def _encode_jsonb(value):
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    return _pack_bytes(b'\x01' + value.encode('utf-8'))
+
+def _encode_json(value):
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    return _pack_bytes(value.encode('utf-8'))
+
+BINARY_ENCODERS = {
+    'smallint': lambda v: struct.pack('!ih', 2, v),
+    'integer': lambda v: struct.pack('!ii', 4, v),
+    'bigint': lambda v: struct.pack('!iq', 8, v),
+    'numeric': encode_numeric,
+    'text': lambda v: _pack_bytes(str(v).encode('utf-8')),
+    'character varying': lambda v: _pack_bytes(str(v).encode('utf-8')),
+    'boolean': lambda v: struct.pack('!i?', 1, v),
+    'uuid': lambda v: _pack_bytes((v if isinstance(v, uuid.UUID) else uuid.UUID(str(v))).bytes),
+    'date': lambda v: struct.pack('!ii', 4, v.toordinal() - PG_EPOCH_ORDINAL),
+    'timestamp without time zone': _encode_timestamp,
+    'timestamp with time zone': _encode_timestamptz,
+    'jsonb': _encode_jsonb,
+    'json': _encode_json,
+}
+
+class CopyWriter:
+    """Stream rows into a table with COPY ... FROM STDIN from an in-memory buffer"""
+
+    def __init__(self, cur, table_name, columns, copy_format="text"):
+        if copy_format not in ("text", "binary"):
+            raise ValueError(f"Unsupported COPY format: {copy_format}")
+        self.cur = cur
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.copy_format = copy_format
+        self.sql = (
+            f"COPY {table_name} ({', '.join(self.columns)}) FROM STDIN"
+            + (" WITH (FORMAT binary)" if copy_format == "binary" else "")
+        )
+        if copy_format == "binary":
+            types = column_types(cur, table_name)
+            try:
+                self.encoders = [BINARY_ENCODERS[types[col]] for col in self.columns]
+            except KeyError as e:
+                raise ValueError(f"No binary COPY encoder for column type {e}")
+            if _encode_timestamptz in self.encoders:
+                tz = session_timezone(cur)
+                self.encoders = [partial(_encode_timestamptz, tz=tz) if encode is _encode_timestamptz else encode
+                                 for encode in self.encoders]
+            self.row_header = struct.pack('!h', len(self.columns))
+
+    def _text_buffer(self, rows):
+        buf = io.StringIO()
+        for row in rows:
+            buf.write('\t'.join([encode_text_field(value) for value in row]))
+            buf.write('\n')
+        buf.seek(0)
+        return buf
+
+    def _binary_buffer(self, rows):
+        buf = io.BytesIO()
+        buf.write(BINARY_HEADER)
+        encoders = self.encoders
+        row_header = self.row_header
+        for row in rows:
+            buf.write(row_header)
+            buf.write(b''.join([
+                NULL_FIELD if value is None else encode(value)
+                for encode, value in zip(encoders, row)
+            ]))
+        buf.write(BINARY_TRAILER)
+        buf.seek(0)
+        return buf
+
+    def copy_rows(self, rows):
+        """COPY rows (tuples in column order) into the table; returns the row count"""
+        if self.copy_format == "binary":
+            buf = self._binary_buffer(rows)
+        else:
+            buf = self._text_buffer(rows)
+        self.cur.copy_expert(self.sql, buf)
+        return self.cur.rowcount
@@ -0,0 +1,202 @@
+import json
+import os
+import select
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+from cdc_stats import StatsReporter
+from collector_profile import CollectorProfile, SamplingProfiler
+
+# Postgres timestamps count microseconds from 2000-01-01 UTC
+PG_EPOCH_US = 946684800 * 1_000_000
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# pgoutput message types (first payload byte)
+PGOUTPUT_BEGIN = ord('B')
+PGOUTPUT_CHANGES = (ord('I'), ord('U'), ord('D'))
+
+def pgoutput_commit_ts_us(payload):
+    """Commit time in epoch microseconds from a pgoutput Begin: 'B', final LSN, commit timestamp, xid"""
+    return int.from_bytes(payload[9:17], 'big', signed=True) + PG_EPOCH_US
+
+def wal2json_commit_ts_us(payload):
+    """Commit time in epoch microseconds from a wal2json format-version 2 "B" message.
+
+    The timestamp is Postgres text output, e.g. 2024-01-01 12:00:00.12345+00.
+    Before Python 3.11 datetime.fromisoformat only takes 3 or 6 fraction
+    digits and +HH:MM offsets, so both are normalized first.
+    """
+    timestamp = json.loads(payload)['timestamp']
+    sign_at = max(timestamp.rfind('+'), timestamp.rfind('-'))
+    if sign_at > 10:
+        clock, offset = timestamp[:sign_at], timestamp[sign_at:]
+    else:
+        clock, offset = timestamp, '+00:00'
+    if len(offset) == 3:
+        offset += ':00'
+    seconds, dot, fraction = clock.partition('.')
+    if dot:
+        seconds += '.' + fraction.ljust(6, '0')[:6]
+    return (datetime.fromisoformat(seconds + offset) - UNIX_EPOCH) // timedelta(microseconds=1)
+
+class PgReplicationCollector(StatsReporter):
+    """Changes read straight from a logical replication slot: the floor for Sequin and Debezium.
+
+    Latency is each row change's commit timestamp to the moment this
+    process read it off the replication stream, and throughput counts
+    inserts, updates and deletes, so rows land in the same kafka_stats.csv
+    as the Kafka collectors. Messages are drained in batches of up to
+    batch_size, and their timestamps are decoded with a byte slice. Only
+    the Begin message of each transaction is decoded. Flush feedback goes
+    back at most every feedback_interval seconds, not per message.
+
+    Without slot, a temporary slot is created and disappears on disconnect;
+    a named slot is created if missing and kept. pgoutput needs a
+    publication, which is created for table_name if it doesn't exist.
+    The lag column is WAL bytes not yet confirmed flushed.
+    """
+
+    def __init__(self, dsn, plugin='pgoutput', slot=None, publication='stats_collector_pub',
+                 table_name='benchmark_records', clock_offset_ms=0.0, feedback_interval=1.0,
+                 batch_size=10000, stats_file='kafka_stats.csv', profile_file=None, profile_interval_ms=5.0):
+        super().__init__(stats_file=stats_file)
+        self.plugin = plugin
+        self.clock_offset_ms = clock_offset_ms
+        self.feedback_interval = feedback_interval
+        self.batch_size = batch_size
+        self.profile = CollectorProfile()
+        self.profile_file = profile_file
+        self.profile_interval_ms = profile_interval_ms
+
+        # A regular connection for the publication and for measuring lag
+        self.query_conn = psycopg2.connect(dsn)
+        self.query_conn.autocommit = True
+        if plugin == 'pgoutput':
+            with self.query_conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM pg_publication WHERE pubname = %s", (publication,))
+                if cur.fetchone() is None:
+                    print(f"Creating publication {publication} for {table_name}")
+                    cur.execute(f"CREATE PUBLICATION {publication} FOR TABLE {table_name}")
+
+        self.conn = psycopg2.connect(dsn, connection_factory=psycopg2.extras.LogicalReplicationConnection)
+        self.cur = self.conn.cursor()
+        if slot is None:
+            slot = f"stats_collector_{os.getpid()}"
+            self.cur.execute(f"CREATE_REPLICATION_SLOT {slot} TEMPORARY LOGICAL {plugin}")
+        else:
+            try:
+                self.cur.create_replication_slot(slot, output_plugin=plugin)
+            except psycopg2.errors.DuplicateObject:
+                print(f"Using existing replication slot {slot}")
+        self.slot = slot
+
+        if plugin == 'pgoutput':
+            options = {'proto_version': '1', 'publication_names': publication}
+        else:
+            options = {'format-version': '2', 'include-timestamp': '1', 'add-tables': f'*.{table_name}'}
+        self.cur.start_replication(slot_name=slot, decode=False, options=options)
+        self.announce_ready(f"slot {slot}")
+
+        # Commit time of the transaction being streamed; changes follow its Begin
+        self.commit_ts_us = None
+        self.received_lsn = 0
+        self.flushed_lsn = 0
+        self.last_feedback_time = time.time()
+
+    def read_batch(self):
+        """Drain up to batch_size messages already received; ([payload], [receive time us])"""
+        payloads = []
+        receive_times = []
+        while len(payloads) < self.batch_size:
+            msg = self.cur.read_message()
+            if msg is None:
+                break
+            payloads.append(msg.payload)
+            receive_times.append(time.time_ns() // 1000)
+            self.received_lsn = msg.data_start
+        return payloads, receive_times
+
+    def process_batch(self, payloads, receive_times):
+        """Record commit-to-receive latency for every row change in the batch"""
+        latencies_us = []
+        if self.plugin == 'pgoutput':
+            for payload, receive_time in zip(payloads, receive_times):
+                kind = payload[0]
+                if kind in PGOUTPUT_CHANGES and self.commit_ts_us is not None:
+                    latencies_us.append(receive_time - self.commit_ts_us)
+                elif kind == PGOUTPUT_BEGIN:
+                    self.commit_ts_us = pgoutput_commit_ts_us(payload)
+        else:
+            for payload, receive_time in zip(payloads, receive_times):
+                # Every format-version 2 message starts with {"action":"X"
+                kind = payload[11:12]
+                if kind in (b'I', b'U', b'D') and self.commit_ts_us is not None:
+                    latencies_us.append(receive_time - self.commit_ts_us)
+                elif kind == b'B':
+                    self.commit_ts_us = wal2json_commit_ts_us(payload)
+        if latencies_us:
+            self.interval_histogram.record_many(
+                np.rint(np.array(latencies_us, dtype=np.int64) / 1000 - self.clock_offset_ms))
+            self.message_count += len(latencies_us)
+
+    def send_feedback(self, force=False):
+        """Confirm everything read so far, at most once per feedback_interval"""
+        now = time.time()
+        if self.received_lsn > self.flushed_lsn and (force or now - self.last_feedback_time >= self.feedback_interval):
+            # psycopg2 would otherwise hold unforced feedback until its own status interval
+            self.cur.send_feedback(write_lsn=self.received_lsn, flush_lsn=self.received_lsn, force=True)
+            self.flushed_lsn = self.received_lsn
+            self.last_feedback_time = now
+
+    def get_lag_bytes(self):
+        """WAL written since the last position confirmed to the slot"""
+        with self.query_conn.cursor() as cur:
+            cur.execute("SELECT pg_current_wal_lsn() - confirmed_flush_lsn FROM pg_replication_slots "
+                        "WHERE slot_name = %s", (self.slot,))
+            row = cur.fetchone()
+        return int(row[0]) if row and row[0] is not None else 0
+
+    def calculate_and_save_stats(self):
+        current_time = time.time()
+        if current_time - self.last_stats_time >= self.stats_interval:
+            self.write_stats(current_time, self.get_lag_bytes(), self.profile.snapshot())
+            self.last_stats_time = current_time
+
+    def run(self, duration=None):
+        """Stream until interrupted, or for duration seconds"""
+        deadline = time.time() + duration if duration is not None else None
+        profiler = None
+        if self.profile_file:
+            profiler = SamplingProfiler(self.profile_file, self.profile_interval_ms / 1000)
+        try:
+            while deadline is None or time.time() < deadline:
+                read_start = time.perf_counter()
+                payloads, receive_times = self.read_batch()
+                if not payloads:
+                    # Nothing buffered; wait for the socket rather than spinning
+                    select.select([self.cur], [], [], 1.0)
+                process_start = time.perf_counter()
+                self.profile.consumed(process_start - read_start, len(payloads), self.batch_size)
+                if payloads:
+                    self.process_batch(payloads, receive_times)
+
+                stats_start = time.perf_counter()
+                self.profile.processed(stats_start - process_start, 0)
+                self.send_feedback()
+                self.calculate_and_save_stats()
+                self.profile.stats_s += time.perf_counter() - stats_start
+
+        except KeyboardInterrupt:
+            print("\nStopping stats collection...")
+        finally:
+            try:
+                self.send_feedback(force=True)
+            except psycopg2.Error:
+                pass
+            if profiler is not None:
+                profiler.close()
+            self.conn.close()
+            self.query_conn.close()
@@ -0,0 +1,345 @@
+import argparse
+import json
+import os
+import queue
+import re
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SSH_OPTS = ['-o', 'StrictHostKeyChecking=no', '-o', 'UserKnownHostsFile=/dev/null', '-o', 'LogLevel=ERROR']
+
+# Printed by cdc_stats.py once its consumer has partitions (or its slot is streaming)
+READY_PATTERN = re.compile(r"Collector(?: (\d+))? ready after ([\d.]+)s: (.*)")
+# Printed by workload_generator.py once the table is set up
+GENERATOR_STARTED = "Running workload generator"
+
+def timestamp(epoch):
+    return datetime.fromtimestamp(epoch).isoformat(timespec='milliseconds')
+
+class LaunchedProcess:
+    """A command run on this machine or on host over ssh.
+
+    Output goes to log_path and is scanned line by line for wait_for.
+    Remote commands run under ssh -tt, so interrupt() is a Ctrl-C on the
+    remote terminal and reaches the whole process group, workers included,
+    just as when the scripts are run by hand.
+    """
+
+    def __init__(self, argv, host, ssh_key, log_path):
+        self.host = host
+        self.log_path = log_path
+        if host == 'local':
+            # Started from a background job SIGINT would be ignored, and interrupt() couldn't stop it
+            self.proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT, start_new_session=True,
+                                         preexec_fn=lambda: signal.signal(signal.SIGINT, signal.SIG_DFL))
+        else:
+            remote_command = ' '.join(shlex.quote(arg) for arg in argv)
+            # Own session, so a Ctrl-C here doesn't kill ssh before the remote side is interrupted
+            self.proc = subprocess.Popen(['ssh', '-tt', *SSH_OPTS, '-i', os.path.expanduser(ssh_key),
+                                          host, remote_command],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                         start_new_session=True)
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        with open(self.log_path, 'wb') as log:
+            for line in self.proc.stdout:
+                log.write(line)
+                log.flush()
+                self.lines.put((time.time(), line.decode('utf-8', 'replace').rstrip('\r\n')))
+        self.lines.put(None)
+
+    def wait_for(self, predicate, timeout):
+        """(time, line) of the first line predicate accepts; None on timeout or exit"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                item = self.lines.get(timeout=max(0.0, min(1.0, deadline - time.time())))
+            except queue.Empty:
+                if time.time() >= deadline:
+                    return None
+                continue
+            if item is None:
+                return None
+            if predicate(item[1]):
+                return item
+
+    def running(self):
+        return self.proc.poll() is None
+
+    def interrupt(self):
+        if not self.running():
+            return
+        if self.host == 'local':
+            os.killpg(self.proc.pid, signal.SIGINT)
+        else:
+            try:
+                self.proc.stdin.write(b'\x03')
+                self.proc.stdin.flush()
+            except OSError:
+                pass
+
+    def stop(self, timeout):
+        """Interrupt, wait up to timeout seconds, then kill; returns the exit code"""
+        self.interrupt()
+        try:
+            return self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            print(f"Error: process did not stop within {timeout:.0f}s, killing it")
+            self.proc.kill()
+            return self.proc.wait()
+
+class BenchmarkRun:
+    """One benchmark run: collector, generator phases and the manifest describing them.
+
+    The collector starts first and the load only starts once every
+    collector process has its partitions, so the first changes aren't
+    missed. The generator then runs warmup + steady seconds. The collector
+    keeps consuming for drain seconds after the generator exits, and is then
+    interrupted. Phase times are recorded on this machine's clock and as
+    seconds on the collector's time_elapsed_ms clock, so the warmup and
+    drain can be cut out of kafka_stats.csv afterwards.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.run_id = args.run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.run_dir = os.path.join(args.output_dir, self.run_id)
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.manifest_path = os.path.join(self.run_dir, 'manifest.json')
+        self.collector = None
+        self.generator = None
+        # Epoch time at which the collector's time_elapsed_ms was 0
+        self.collector_t0 = None
+        self.manifest = {
+            'run_id': self.run_id,
+            'label': args.label,
+            'status': 'starting',
+            'git_commit': self.git_commit(),
+            'parameters': vars(args),
+            'phases': {},
+            'outputs': {},
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def output_path(self, host, name):
+        """Where a process on host writes name: the run directory locally, the home directory remotely"""
+        if host == 'local':
+            return os.path.abspath(os.path.join(self.run_dir, name))
+        return f"{self.run_id}_{name}"
+
+    def command(self, host, script, *args):
+        if host == 'local':
+            return [sys.executable, '-u', os.path.join(REPO_DIR, script), *args]
+        return ['python3', '-u', script, *args]
+
+    def write_manifest(self):
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    def mark(self, phase, edge, when=None):
+        """Record the start or end of a phase"""
+        when = time.time() if when is None else when
+        entry = self.manifest['phases'].setdefault(phase, {})
+        entry[edge] = when
+        entry[f'{edge}_iso'] = timestamp(when)
+        if self.collector_t0 is not None:
+            entry[f'{edge}_collector_elapsed_s'] = round(when - self.collector_t0, 3)
+        print(f"[{timestamp(when)}] {phase} {'started' if edge == 'start' else 'ended'}")
+        self.write_manifest()
+
+    def start_collector(self):
+        args = self.args
+        host = args.collector_host
+        outputs = {'stats': self.output_path(host, 'kafka_stats.csv')}
+        argv = self.command(host, 'cdc_stats.py', '--source', args.source,
+                            '--bootstrap-servers', args.bootstrap_servers, '--topic', args.topic,
+                            '--stats-interval', str(args.stats_interval), '--stats-file', outputs['stats'])
+        if args.processes > 1:
+            outputs['partition_lag'] = self.output_path(host, 'kafka_partition_lag.csv')
+            argv += ['--processes', str(args.processes), '--partition-lag-file', outputs['partition_lag']]
+        argv += shlex.split(args.collector_args)
+        log_path = os.path.join(self.run_dir, 'collector.log')
+        self.manifest['collector'] = {'host': host, 'command': argv, 'log': log_path, 'outputs': outputs}
+        self.mark('collector_startup', 'start')
+        self.collector = LaunchedProcess(argv, host, args.ssh_key, log_path)
+
+        # Every collector process announces its assignment; with several, the
+        # group rebalances as each joins, so wait until all have been assigned
+        ready = {}
+        deadline = time.time() + args.ready_timeout
+        while len(ready) < args.processes:
+            item = self.collector.wait_for(READY_PATTERN.match, deadline - time.time())
+            if item is None:
+                return False
+            seen_at, line = item
+            worker, elapsed, what = READY_PATTERN.match(line).groups()
+            ready[worker] = what
+            if self.collector_t0 is None:
+                self.collector_t0 = seen_at - float(elapsed)
+        self.manifest['collector']['assignment'] = ready
+        time.sleep(args.settle)
+        self.mark('collector_startup', 'end')
+        return True
+
+    def run_generator(self):
+        args = self.args
+        host = args.generator_host
+        outputs = {'wal_samples': self.output_path(host, 'replication_lag.csv')}
+        argv = self.command(host, 'workload_generator.py', '--duration', str(args.warmup + args.steady),
+                            '--wal-sample-file', outputs['wal_samples'], *shlex.split(args.generator_args))
+        log_path = os.path.join(self.run_dir, 'generator.log')
+        self.manifest['generator'] = {'host': host, 'command': argv, 'log': log_path, 'outputs': outputs}
+        self.write_manifest()
+        self.generator = LaunchedProcess(argv, host, args.ssh_key, log_path)
+
+        item = self.generator.wait_for(lambda line: GENERATOR_STARTED in line, args.ready_timeout)
+        if item is None:
+            return False
+        self.mark('warmup', 'start', item[0])
+        steady_start = item[0] + args.warmup
+        while self.generator.running() and time.time() < steady_start:
+            time.sleep(0.1)
+        self.mark('warmup', 'end')
+        self.mark('steady', 'start')
+        self.manifest['generator']['exit_code'] = self.generator.proc.wait()
+        self.mark('steady', 'end')
+        return self.manifest['generator']['exit_code'] == 0
+
+    def fetch_outputs(self):
+        """Copy remote output files into the run directory"""
+        for role in ('collector', 'generator'):
+            info = self.manifest.get(role)
+            if not info:
+                continue
+            local = {}
+            for name, path in info['outputs'].items():
+                if info['host'] == 'local':
+                    local[name] = path if os.path.exists(path) else None
+                    continue
+                destination = os.path.join(self.run_dir, path[len(self.run_id) + 1:])
+                result = subprocess.run(['scp', *SSH_OPTS, '-i', os.path.expanduser(self.args.ssh_key),
+                                         f"{info['host']}:{path}", destination], capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"Error fetching {path} from {info['host']}: {result.stderr.strip()}")
+                local[name] = destination if result.returncode == 0 else None
+            self.manifest['outputs'].update({f"{role}_{name}": path for name, path in local.items()})
+            self.manifest['outputs'][f"{role}_log"] = info['log']
+
+    def report_args(self):
+        """benchmark_report.py options cutting this run down to its steady phase"""
+        phases = self.manifest['phases']
+        steady, drain = phases.get('steady', {}), phases.get('drain', {})
+        if 'start_collector_elapsed_s' not in steady or 'end_collector_elapsed_s' not in drain:
+            return None
+        cooldown = drain['end_collector_elapsed_s'] - steady['end_collector_elapsed_s']
+        return ['--align', 'elapsed', '--warmup', f"{steady['start_collector_elapsed_s']:.1f}",
+                '--cooldown', f"{cooldown:.1f}"]
+
+    def run(self):
+        status = 'failed'
+        try:
+            if not self.start_collector():
+                print(f"Error: collector was not ready within {self.args.ready_timeout:.0f}s, "
+                      f"see {self.manifest['collector']['log']}")
+                return False
+            if not self.run_generator():
+                print(f"Error: generator failed, see {self.manifest['generator']['log']}")
+                return False
+            self.mark('drain', 'start')
+            deadline = time.time() + self.args.drain
+            while self.collector.running() and time.time() < deadline:
+                time.sleep(0.1)
+            status = 'completed'
+            return True
+        except KeyboardInterrupt:
+            print("\nStopping benchmark run...")
+            status = 'interrupted'
+            return False
+        finally:
+            if self.generator is not None and self.generator.running():
+                self.manifest['generator']['exit_code'] = self.generator.stop(self.args.stop_timeout)
+            if self.collector is not None:
+                self.manifest['collector']['exit_code'] = self.collector.stop(self.args.stop_timeout)
+                if 'drain' in self.manifest['phases']:
+                    self.mark('drain', 'end')
+            self.fetch_outputs()
+            self.manifest['status'] = status
+            self.manifest['report_args'] = self.report_args()
+            self.write_manifest()
+            print(f"Run {self.run_id} {status}; manifest written to {self.manifest_path}")
+            stats = self.manifest['outputs'].get('collector_stats')
+            if stats and self.manifest['report_args']:
+                print("Steady-state report: python3 benchmark_report.py "
+                      f"--run {self.args.label}={stats} {' '.join(self.manifest['report_args'])}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Run the collector and the workload generator as one benchmark run and write a manifest')
+    parser.add_argument('--label', type=str, default='run',
+                      help='Name of the run, e.g. sequin or debezium (default: run)')
+    parser.add_argument('--run-id', type=str, default=None,
+                      help='Run directory name under --output-dir (default: the start time)')
+    parser.add_argument('--output-dir', type=str, default='runs',
+                      help='Where run directories are created (default: runs)')
+    parser.add_argument('--collector-host', type=str, default='local',
+                      help='Where cdc_stats.py runs: local, or user@host reached over ssh (default: local)')
+    parser.add_argument('--generator-host', type=str, default='local',
+                      help='Where workload_generator.py runs: local, or user@host reached over ssh '
+                           '(default: local)')
+    parser.add_argument('--ssh-key', type=str, default='~/.ssh/benchmark-key',
+                      help='Private key for remote hosts (default: ~/.ssh/benchmark-key)')
+    parser.add_argument('--warmup', type=int, default=60,
+                      help='Seconds of load before the steady phase (default: 60)')
+    parser.add_argument('--steady', type=int, default=300,
+                      help='Seconds of steady-state load (default: 300)')
+    parser.add_argument('--drain', type=float, default=30.0,
+                      help='Seconds the collector keeps consuming after the generator stops (default: 30)')
+    parser.add_argument('--source', type=str, choices=['debezium', 'sequin', 'pg'], default='debezium',
+                      help='cdc_stats.py --source (default: debezium)')
+    parser.add_argument('--bootstrap-servers', type=str, default='localhost:9092',
+                      help='Kafka bootstrap servers (default: localhost:9092)')
+    parser.add_argument('--topic', type=str, default='postgres.public.benchmark_records',
+                      help='Kafka topic to consume from (default: postgres.public.benchmark_records)')
+    parser.add_argument('--stats-interval', type=float, default=5.0,
+                      help='cdc_stats.py --stats-interval (default: 5.0)')
+    parser.add_argument('--processes', type=int, default=1,
+                      help='cdc_stats.py --processes; the load starts once all of them have partitions (default: 1)')
+    parser.add_argument('--collector-args', type=str, default='',
+                      help='Further cdc_stats.py options, as one quoted string')
+    parser.add_argument('--generator-args', type=str, default='',
+                      help='Further workload_generator.py options, as one quoted string, e.g. '
+                           '"--host db.example.com --target-ops-per-sec 5000"')
+    parser.add_argument('--ready-timeout', type=float, default=120.0,
+                      help='Seconds to wait for partition assignment and for the generator\'s table setup '
+                           '(default: 120)')
+    parser.add_argument('--settle', type=float, default=2.0,
+                      help='Seconds between partition assignment and starting the load, for the consumers '
+                           'to resolve their start offsets (default: 2)')
+    parser.add_argument('--stop-timeout', type=float, default=60.0,
+                      help='Seconds to wait for a process to exit after interrupting it (default: 60)')
+
+    args = parser.parse_args()
+    for option in ('--duration', '--wal-sample-file'):
+        if option in shlex.split(args.generator_args):
+            parser.error(f'{option} is set by run_benchmark.py; use --warmup/--steady')
+    for option in ('--stats-file', '--partition-lag-file', '--processes'):
+        if option in shlex.split(args.collector_args):
+            parser.error(f'{option} is set by run_benchmark.py')
+
+    sys.exit(0 if BenchmarkRun(args).run() else 1)
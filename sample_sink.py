@@ -0,0 +1,113 @@
+import queue
+import threading
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class RawSampleSink:
+    """Write one record per consumed message to a Parquet file.
+
+    Records are copied into preallocated NumPy column chunks; every full
+    chunk becomes one Parquet row group, written by a background thread so
+    the consume loop never waits on disk. There is a fixed pool of chunks:
+    if the writer falls behind and none is free, new records are dropped and
+    counted instead of growing memory.
+
+    All timestamps are epoch microseconds.
+    """
+
+    COLUMNS = (
+        ('partition', np.int32),
+        ('offset', np.int64),
+        ('source_ts_us', np.int64),
+        ('delivery_ts_us', np.int64),
+        ('consume_ts_us', np.int64),
+        ('size', np.int32),
+    )
+
+    def __init__(self, path, chunk_rows=65536, max_chunks=8):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.schema = pa.schema([(name, pa.from_numpy_dtype(dtype)) for name, dtype in self.COLUMNS])
+        # Chunks not in use; the only memory the sink ever holds
+        self.free_chunks = queue.Queue()
+        for _ in range(max_chunks):
+            self.free_chunks.put({name: np.empty(chunk_rows, dtype=dtype) for name, dtype in self.COLUMNS})
+        self.full_chunks = queue.Queue()
+        self.chunk = self.free_chunks.get()
+        self.fill = 0
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+        self.writer_thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self.writer_thread.start()
+
+    def add(self, partition, offset, source_ts_us, delivery_ts_us, consume_ts_us, size):
+        """Append a batch of records; each argument is an array (or scalar) of the batch's values"""
+        values = (partition, offset, source_ts_us, delivery_ts_us, consume_ts_us, size)
+        count = max(np.size(value) for value in values)
+        start = 0
+        while start < count:
+            if self.chunk is None:
+                try:
+                    self.chunk = self.free_chunks.get_nowait()
+                except queue.Empty:
+                    if not self.dropped:
+                        print("Raw sample writer is falling behind; dropping samples")
+                    self.dropped += count - start
+                    return
+            n = min(self.chunk_rows - self.fill, count - start)
+            for (name, _), value in zip(self.COLUMNS, values):
+                column = self.chunk[name]
+                column[self.fill:self.fill + n] = value[start:start + n] if np.ndim(value) else value
+            self.fill += n
+            start += n
+            if self.fill == self.chunk_rows:
+                self._hand_off()
+
+    def _hand_off(self):
+        self.full_chunks.put((self.chunk, self.fill))
+        self.chunk = None
+        self.fill = 0
+
+    def _write_chunks(self):
+        writer = None
+        try:
+            # Dictionary-encoding the unique offsets and timestamps costs 3x the write
+            # throughput for nothing; lz4 keeps the writer at several million rows/s
+            writer = pq.ParquetWriter(self.path, self.schema, compression='lz4',
+                                      use_dictionary=['partition', 'size'])
+            while True:
+                item = self.full_chunks.get()
+                if item is None:
+                    break
+                chunk, rows = item
+                # pa.array over a NumPy slice doesn't copy, so return the chunk only once written
+                table = pa.Table.from_arrays([pa.array(chunk[name][:rows]) for name, _ in self.COLUMNS],
+                                             schema=self.schema)
+                writer.write_table(table)
+                self.written += rows
+                self.free_chunks.put(chunk)
+        except Exception as e:
+            self.error = e
+            print(f"Error writing raw samples to {self.path}: {e}")
+            # Recycle whatever is queued until close(), so add() still finds free chunks
+            while True:
+                item = self.full_chunks.get()
+                if item is None:
+                    break
+                self.free_chunks.put(item[0])
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def close(self):
+        """Flush the partly filled chunk, wait for the writer and close the file"""
+        if self.chunk is not None and self.fill:
+            self._hand_off()
+        self.full_chunks.put(None)
+        self.writer_thread.join()
+        message = f"Wrote {self.written} raw samples to {self.path}"
+        if self.dropped:
+            message += f" ({self.dropped} dropped while the writer was behind)"
+        print(message)
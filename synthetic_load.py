@@ -0,0 +1,367 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from confluent_kafka import TopicPartition
+from parser_benchmark import MESSAGE_BUILDERS, make_padding
+
+# Placeholder timestamps baked into the message templates. Both are 13-digit
+# epoch milliseconds, so replacing the digits also rewrites the derived
+# microsecond and nanosecond fields (ts_us = ts_ms followed by 000).
+SOURCE_TOKEN_MS = 1000000000001
+DELIVERY_TOKEN_MS = 1000000000002
+
+# Collector configurations whose ceiling the search measures: (collector, source, format, parser)
+MODES = {
+    'debezium-struct-fast': ('stats', 'debezium', 'struct', 'fast'),
+    'debezium-struct-regex': ('stats', 'debezium', 'struct', 'regex'),
+    'debezium-json-fast': ('stats', 'debezium', 'json', 'fast'),
+    'sequin-fast': ('stats', 'sequin', 'sequin', 'fast'),
+    'sequin-regex': ('stats', 'sequin', 'sequin', 'regex'),
+    'backfill': ('backfill', 'debezium', 'struct', None),
+}
+
+def iso_timestamp_bytes(ts_ms):
+    """Sequin's commit_timestamp rendering of epoch milliseconds"""
+    return datetime.fromtimestamp(ts_ms / 1000, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ').encode('ascii')
+
+class FakeMessage:
+    """The parts of confluent_kafka.Message the collectors use"""
+
+    __slots__ = ('_value', '_key', '_partition', '_offset', '_timestamp')
+
+    def __init__(self, value, key, partition, offset, timestamp):
+        self._value = value
+        self._key = key
+        self._partition = partition
+        self._offset = offset
+        self._timestamp = timestamp
+
+    def value(self):
+        return self._value
+
+    def key(self):
+        return self._key
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def timestamp(self):
+        # (TIMESTAMP_CREATE_TIME, ms)
+        return (1, self._timestamp)
+
+    def error(self):
+        return None
+
+class FakeConsumer:
+    """Stand-in for confluent_kafka.Consumer that makes up change events on a schedule.
+
+    Message i is due rate seconds * i after the first consume() call and is
+    stamped as delivered then, with a source timestamp pipeline_latency_ms
+    earlier; a collector that keeps up sees that latency, one that falls
+    behind sees lag build up instead. Payloads come from a pool of
+    parser_benchmark messages. Each millisecond takes the next one and
+    patches its timestamps in once, and every message due in that
+    millisecond shares the result, so the fake costs the collector little
+    more than the message objects. With rate=None every consume() returns a
+    full batch. limit stops the schedule after that many messages.
+    """
+
+    def __init__(self, message_format='struct', rate=None, byte_size=100, partitions=8,
+                 pipeline_latency_ms=50, limit=None, topic='benchmark_records', pool_size=1024, stamp=True):
+        builder = MESSAGE_BUILDERS[message_format]
+        padding = make_padding(byte_size)
+        self.templates = [builder(i, SOURCE_TOKEN_MS, DELIVERY_TOKEN_MS, padding) for i in range(pool_size)]
+        self.keys = [b'%d' % i for i in range(pool_size)]
+        self.sequin = message_format == 'sequin'
+        self.source_token = iso_timestamp_bytes(SOURCE_TOKEN_MS) if self.sequin else b'%d' % SOURCE_TOKEN_MS
+        self.delivery_token = b'%d' % DELIVERY_TOKEN_MS
+        # Backfill collectors don't read timestamps, so the templates can go out as they are
+        self.stamp = stamp
+        self.rate = rate
+        self.partitions = partitions
+        self.pipeline_latency_ms = pipeline_latency_ms
+        self.limit = limit
+        self.topic = topic
+        self.start = None
+        self.start_ms = None
+        self.delivered = 0
+        self.generate_s = 0.0
+        # The payload stamped for the current millisecond
+        self.stamped_ms = None
+        self.stamped_value = None
+        self.stamped_key = None
+
+    def due(self, now):
+        """Messages scheduled by now (perf_counter time)"""
+        if self.start is None:
+            return 0
+        due = int((now - self.start) * self.rate) if self.rate else self.delivered
+        return min(due, self.limit) if self.limit is not None else due
+
+    def behind_s(self):
+        """How long the oldest undelivered message has been due (or, after limit, how late the last one was)"""
+        if self.start is None or not self.rate:
+            return 0.0
+        return max(0.0, time.perf_counter() - self.start - self.delivered / self.rate)
+
+    def consume(self, num_messages=1, timeout=-1):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+            self.start_ms = time.time() * 1000
+        if self.rate:
+            available = self.due(now) - self.delivered
+            if available <= 0:
+                # Block until the next message is due, as a real poll would
+                if self.limit is not None and self.delivered >= self.limit:
+                    wait = timeout
+                else:
+                    wait = self.start + (self.delivered + 1) / self.rate - now
+                    if timeout >= 0:
+                        wait = min(wait, timeout)
+                time.sleep(max(0.0, wait))
+                available = self.due(time.perf_counter()) - self.delivered
+                if available <= 0:
+                    return []
+            count = min(num_messages, available)
+        else:
+            count = num_messages if self.limit is None else min(num_messages, self.limit - self.delivered)
+        generate_start = time.perf_counter()
+        messages = self.make_messages(count)
+        self.generate_s += time.perf_counter() - generate_start
+        return messages
+
+    def make_messages(self, count):
+        messages = []
+        pool_size = len(self.templates)
+        if self.rate:
+            interval_ms = 1000 / self.rate
+            first_ms = self.start_ms + self.delivered * interval_ms
+        else:
+            interval_ms = 0.0
+            first_ms = time.time() * 1000
+        partitions = self.partitions
+        for k in range(count):
+            i = self.delivered + k
+            delivery_ms = int(first_ms + k * interval_ms)
+            if delivery_ms != self.stamped_ms:
+                self.stamped_ms = delivery_ms
+                template = delivery_ms % pool_size
+                self.stamped_key = self.keys[template]
+                self.stamped_value = self.stamp_template(self.templates[template], delivery_ms)
+            messages.append(FakeMessage(self.stamped_value, self.stamped_key, i % partitions,
+                                        i // partitions, delivery_ms))
+        self.delivered += count
+        return messages
+
+    def stamp_template(self, value, delivery_ms):
+        if not self.stamp:
+            return value
+        source_ms = delivery_ms - self.pipeline_latency_ms
+        source = iso_timestamp_bytes(source_ms) if self.sequin else b'%d' % source_ms
+        return value.replace(self.delivery_token, b'%d' % delivery_ms).replace(self.source_token, source)
+
+    def assignment(self):
+        return [TopicPartition(self.topic, partition) for partition in range(self.partitions)]
+
+    def get_watermark_offsets(self, partition, timeout=None, cached=False):
+        due = self.due(time.perf_counter())
+        # Messages go round-robin over partitions
+        return 0, max(0, (due - partition.partition + self.partitions - 1) // self.partitions)
+
+    def position(self, partitions):
+        return [TopicPartition(self.topic, p.partition,
+                               (self.delivered - p.partition + self.partitions - 1) // self.partitions)
+                for p in partitions]
+
+    def subscribe(self, topics, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+def run_trial(mode, rate, seconds, byte_size=100, partitions=8, pipeline_latency_ms=50, quiet=True):
+    """Run one collector against a FakeConsumer for about seconds; returns a result dict.
+
+    With rate=None the collector runs flat out and the delivered rate is its ceiling.
+    """
+    # Imported here so producing to a real Kafka doesn't need the collectors' dependencies
+    from cdc_stats import KafkaStatsCollector
+    from backfill_stats import KafkaBackfillCollector
+
+    collector_type, source, message_format, parser = MODES[mode]
+    output = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+    with tempfile.TemporaryDirectory() as tmp, output:
+        if collector_type == 'backfill':
+            # Backfills run to a message count rather than a duration
+            limit = int(rate * seconds) if rate else 500_000
+            consumer = FakeConsumer(message_format, rate, byte_size, partitions, pipeline_latency_ms,
+                                    limit=limit, stamp=False)
+            collector = KafkaBackfillCollector([], 'benchmark_records', consumer=consumer,
+                                               timeline_file=os.path.join(tmp, 'timeline.csv'),
+                                               partitions_file=os.path.join(tmp, 'partitions.csv'))
+            start = time.perf_counter()
+            collector.run(limit)
+            processed = limit
+        else:
+            consumer = FakeConsumer(message_format, rate, byte_size, partitions, pipeline_latency_ms)
+            collector = KafkaStatsCollector([], 'benchmark_records', source=source, parser=parser,
+                                            debezium_format=message_format if source == 'debezium' else 'auto',
+                                            consumer=consumer, stats_file=os.path.join(tmp, 'kafka_stats.csv'))
+            # No rows during a trial; the profile covers the whole run instead
+            collector.stats_interval = seconds + 1
+            start = time.perf_counter()
+            collector.run(duration=seconds)
+            processed = collector.message_count
+        elapsed = time.perf_counter() - start
+    behind_s = consumer.behind_s()
+    profile = collector.profile.snapshot() if collector_type == 'stats' else None
+    return {
+        'mode': mode,
+        'rate': rate,
+        'delivered': consumer.delivered,
+        'processed': processed,
+        'elapsed_s': elapsed,
+        'throughput': consumer.delivered / elapsed if elapsed > 0 else 0.0,
+        'behind_s': behind_s,
+        'generate_fraction': consumer.generate_s / elapsed if elapsed > 0 else 0.0,
+        'busy_fraction': profile['busy_fraction'] if profile else None,
+    }
+
+def find_max_rate(mode, seconds=10.0, max_behind_s=0.25, tolerance=0.05, byte_size=100, partitions=8,
+                  pipeline_latency_ms=50):
+    """Highest rate the collector keeps up with, to within tolerance.
+
+    A flat-out run gives the ceiling; paced runs then bisect between half
+    and just above it. A rate is sustainable if, at the end of the run, no
+    message has been waiting longer than max_behind_s; the collector parses
+    in 100ms batches, so it needs to be a little longer than that.
+    """
+    trial_args = dict(byte_size=byte_size, partitions=partitions, pipeline_latency_ms=pipeline_latency_ms)
+    ceiling = run_trial(mode, None, seconds, **trial_args)
+    print(f"{mode}: flat out {ceiling['throughput']:,.0f} msg/s "
+          f"({ceiling['generate_fraction'] * 100:.0f}% of it spent generating messages)")
+    low, high = 0.0, ceiling['throughput'] * 1.05
+    best = None
+    rate = ceiling['throughput'] * 0.9
+    while rate >= 1:
+        result = run_trial(mode, rate, seconds, **trial_args)
+        sustained = result['behind_s'] <= max_behind_s
+        busy = f", busy {result['busy_fraction'] * 100:.0f}%" if result['busy_fraction'] is not None else ""
+        print(f"  {rate:>12,.0f} msg/s: {'kept up' if sustained else 'fell behind'} "
+              f"({result['behind_s'] * 1000:.0f}ms behind{busy})")
+        if sustained:
+            low, best = rate, result
+        else:
+            high = rate
+        if high - low <= tolerance * high:
+            break
+        # Halve until some rate keeps up, then bisect
+        rate = (low + high) / 2 if low else rate / 2
+    return best
+
+def produce(bootstrap_servers, topic, message_format, rate, duration, byte_size=100, pipeline_latency_ms=50):
+    """Produce synthetic change events to a real Kafka topic at rate for duration seconds"""
+    from confluent_kafka import Producer
+
+    producer = Producer({
+        'bootstrap.servers': ','.join(bootstrap_servers),
+        'linger.ms': 5,
+        'queue.buffering.max.messages': 1000000,
+    })
+    source = FakeConsumer(message_format, rate, byte_size, pipeline_latency_ms=pipeline_latency_ms)
+    errors = 0
+
+    def on_delivery(err, msg):
+        nonlocal errors
+        if err is not None:
+            errors += 1
+
+    deadline = time.time() + duration
+    last_report = time.time()
+    last_count = 0
+    try:
+        while time.time() < deadline:
+            for msg in source.consume(num_messages=1000, timeout=0.1):
+                while True:
+                    try:
+                        producer.produce(topic, msg.value(), key=msg.key(), timestamp=msg.timestamp()[1],
+                                         on_delivery=on_delivery)
+                        break
+                    except BufferError:
+                        # Local queue full; let librdkafka drain it
+                        producer.poll(0.1)
+            producer.poll(0)
+            now = time.time()
+            if now - last_report >= 5:
+                print(f"Produced {source.delivered} messages ({(source.delivered - last_count) / (now - last_report):,.0f} msg/s, "
+                      f"{source.behind_s() * 1000:.0f}ms behind schedule, {errors} errors)")
+                last_report, last_count = now, source.delivered
+    except KeyboardInterrupt:
+        print("\nStopping producer...")
+    finally:
+        remaining = producer.flush(30)
+        print(f"Produced {source.delivered} messages to {topic} ({remaining} undelivered, {errors} errors)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Synthetic Debezium/Sequin load to find the collectors\' own maximum sustainable rate')
+    parser.add_argument('--modes', type=str, default=','.join(MODES),
+                      help=f'Comma-separated collector modes to test (default: {",".join(MODES)})')
+    parser.add_argument('--rate', type=float, default=None,
+                      help='Run at this fixed rate in msg/s instead of searching for the maximum')
+    parser.add_argument('--trial-seconds', type=float, default=10.0,
+                      help='Duration of each search trial, or of the --rate run (default: 10)')
+    parser.add_argument('--max-behind-ms', type=float, default=250,
+                      help='How far behind schedule a collector may end a trial and still count as '
+                           'keeping up (default: 250)')
+    parser.add_argument('--tolerance', type=float, default=0.05,
+                      help='Stop searching once the rate is known to within this fraction (default: 0.05)')
+    parser.add_argument('--byte-size', type=int, default=100,
+                      help='Approximate row size, as for workload_generator.py (default: 100)')
+    parser.add_argument('--partitions', type=int, default=8,
+                      help='Partitions the fake consumer spreads messages over (default: 8)')
+    parser.add_argument('--pipeline-latency-ms', type=int, default=50,
+                      help='Source-to-delivery latency stamped into each message (default: 50)')
+    parser.add_argument('--bootstrap-servers', type=str, default=None,
+                      help='Produce to this Kafka at --rate instead of testing collectors in-process')
+    parser.add_argument('--topic', type=str, default='postgres.public.benchmark_records',
+                      help='Topic to produce to (default: postgres.public.benchmark_records)')
+    parser.add_argument('--format', type=str, choices=list(MESSAGE_BUILDERS), default='struct',
+                      help='Message format to produce (default: struct)')
+    parser.add_argument('--duration', type=float, default=60.0,
+                      help='Seconds to produce for (default: 60)')
+
+    args = parser.parse_args()
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"Unknown mode {mode!r}; choose from {', '.join(MODES)}")
+    if args.bootstrap_servers and not args.rate:
+        parser.error('--bootstrap-servers needs --rate')
+
+    if args.bootstrap_servers:
+        produce(args.bootstrap_servers.split(','), args.topic, args.format, args.rate, args.duration,
+                args.byte_size, args.pipeline_latency_ms)
+    elif args.rate:
+        for mode in modes:
+            result = run_trial(mode, args.rate, args.trial_seconds, args.byte_size, args.partitions,
+                               args.pipeline_latency_ms)
+            busy = f", busy {result['busy_fraction'] * 100:.0f}%" if result['busy_fraction'] is not None else ""
+            print(f"{mode}: {result['throughput']:,.0f} msg/s delivered at {args.rate:,.0f} msg/s, "
+                  f"{result['behind_s'] * 1000:.0f}ms behind{busy}")
+    else:
+        results = {}
+        for mode in modes:
+            results[mode] = find_max_rate(mode, args.trial_seconds, args.max_behind_ms / 1000, args.tolerance,
+                                          args.byte_size, args.partitions, args.pipeline_latency_ms)
+        print("\nMaximum sustainable rate:")
+        for mode, result in results.items():
+            print(f"  {mode:<24} {result['rate']:>12,.0f} msg/s" if result else f"  {mode:<24} {'-':>12}")
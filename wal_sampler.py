@@ -0,0 +1,220 @@
+import argparse
+import bisect
+import csv
+import threading
+import time
+from datetime import datetime
+import psycopg2
+
+SLOTS_QUERY = """
+    SELECT s.slot_name, s.plugin, s.active,
+           pg_current_wal_lsn() - s.confirmed_flush_lsn,
+           pg_current_wal_lsn() - s.restart_lsn,
+           s.confirmed_flush_lsn - '0/0'::pg_lsn,
+           EXTRACT(EPOCH FROM r.write_lag), EXTRACT(EPOCH FROM r.flush_lag), EXTRACT(EPOCH FROM r.replay_lag)
+    FROM pg_replication_slots s
+    LEFT JOIN pg_stat_replication r ON r.pid = s.active_pid
+    ORDER BY s.slot_name
+"""
+
+def format_bytes(value):
+    if value >= 1_000_000:
+        return f"{value/1_000_000:.2f} MB"
+    elif value >= 1_000:
+        return f"{value/1_000:.2f} KB"
+    return f"{value:.0f} B"
+
+class ReplicationLagSampler:
+    """Poll the WAL position and every replication slot's lag on a separate connection.
+
+    A background thread samples pg_current_wal_lsn(), pg_replication_slots
+    and pg_stat_replication every interval seconds and appends one row per
+    slot (one row with no slot when there are none) to output_file:
+      wal_bytes_per_sec          WAL written since the previous sample
+      confirmed_flush_lag_bytes  WAL the slot's consumer hasn't confirmed
+      restart_lag_bytes          WAL the slot keeps on disk
+      confirmed_flush_lag_s      how long ago the server's WAL position passed
+                                 confirmed_flush_lsn, from this sampler's own history
+      write/flush/replay_lag_s   pg_stat_replication's view, empty when idle
+    The sampler only reads, so it runs alongside the workload; the DB
+    round trips release the GIL.
+    """
+
+    CSV_HEADER = ['timestamp', 'time_elapsed_ms', 'wal_lsn', 'wal_bytes_per_sec', 'slot_name', 'plugin',
+                  'active', 'confirmed_flush_lag_bytes', 'restart_lag_bytes', 'confirmed_flush_lag_s',
+                  'write_lag_s', 'flush_lag_s', 'replay_lag_s']
+
+    def __init__(self, db_params, output_file='replication_lag.csv', interval=1.0, history_seconds=3600,
+                 verbose=False):
+        self.db_params = db_params
+        self.output_file = output_file
+        self.interval = interval
+        self.verbose = verbose
+        # (time, WAL position) of recent samples, to turn slot positions into seconds behind
+        self.max_history = max(2, int(history_seconds / interval))
+        self.history_times = []
+        self.history_lsns = []
+        self.first_lsn = None
+        self.last_lsn = None
+        self.first_time = None
+        self.last_time = None
+        # Worst confirmed_flush lag seen per slot: {slot: (bytes, seconds)}
+        self.max_lags = {}
+        self.conn = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Connect, take the first sample and keep sampling in the background"""
+        self.conn = psycopg2.connect(**self.db_params)
+        self.conn.autocommit = True
+        self.start_time = time.time()
+        with open(self.output_file, 'w', newline='') as f:
+            csv.writer(f).writerow(self.CSV_HEADER)
+        self.sample()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        next_sample = time.time() + self.interval
+        while not self.stop_event.wait(max(0.0, next_sample - time.time())):
+            # Keep to the schedule even when a sample is slow
+            next_sample += self.interval
+            try:
+                self.sample()
+            except psycopg2.Error as e:
+                print(f"Error sampling replication lag: {e}")
+                return
+
+    def seconds_behind(self, lsn, now):
+        """How long ago the WAL position passed lsn, interpolated between samples"""
+        if lsn is None:
+            return None
+        i = bisect.bisect_right(self.history_lsns, lsn)
+        if i >= len(self.history_lsns):
+            return 0.0
+        if i == 0:
+            # Behind everything remembered; at least this far
+            return now - self.history_times[0]
+        t0, t1 = self.history_times[i - 1], self.history_times[i]
+        l0, l1 = self.history_lsns[i - 1], self.history_lsns[i]
+        passed = t0 + (t1 - t0) * (lsn - l0) / (l1 - l0) if l1 > l0 else t1
+        return max(0.0, now - passed)
+
+    def sample(self):
+        """Take one sample and append its rows; returns the rows"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn")
+            wal_lsn = int(cur.fetchone()[0])
+            cur.execute(SLOTS_QUERY)
+            slots = cur.fetchall()
+        now = time.time()
+
+        wal_rate = ''
+        if self.last_lsn is not None and now > self.last_time:
+            wal_rate = round((wal_lsn - self.last_lsn) / (now - self.last_time), 1)
+        if self.first_lsn is None:
+            self.first_lsn, self.first_time = wal_lsn, now
+        self.last_lsn, self.last_time = wal_lsn, now
+        self.history_times.append(now)
+        self.history_lsns.append(wal_lsn)
+        if len(self.history_times) > self.max_history:
+            del self.history_times[0], self.history_lsns[0]
+
+        def fmt(value):
+            return '' if value is None else round(float(value), 3)
+
+        def as_int(value):
+            return '' if value is None else int(value)
+
+        timestamp = datetime.now().isoformat()
+        elapsed_ms = int((now - self.start_time) * 1000)
+        rows = []
+        for slot_name, plugin, active, flush_lag, restart_lag, confirmed_lsn, write_s, flush_s, replay_s in slots:
+            behind_s = self.seconds_behind(int(confirmed_lsn) if confirmed_lsn is not None else None, now)
+            rows.append([timestamp, elapsed_ms, wal_lsn, wal_rate, slot_name, plugin or '', active,
+                         as_int(flush_lag), as_int(restart_lag), fmt(behind_s), fmt(write_s), fmt(flush_s),
+                         fmt(replay_s)])
+            if flush_lag is not None:
+                worst_bytes, worst_s = self.max_lags.get(slot_name, (0, 0.0))
+                self.max_lags[slot_name] = (max(worst_bytes, int(flush_lag)), max(worst_s, behind_s or 0.0))
+        if not slots:
+            rows.append([timestamp, elapsed_ms, wal_lsn, wal_rate] + [''] * 9)
+        with open(self.output_file, 'a', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+        if self.verbose:
+            slot_str = " | ".join(f"{row[4]}: {format_bytes(row[7] or 0)} ({row[9] or 0:.1f}s)"
+                                  for row in rows if row[4])
+            rate_str = f"{format_bytes(wal_rate)}/s" if wal_rate != '' else "-"
+            print(f"WAL: {rate_str}" + (f" | {slot_str}" if slot_str else ""))
+        return rows
+
+    def wal_bytes(self):
+        """WAL written between the first and the latest sample"""
+        return self.last_lsn - self.first_lsn if self.first_lsn is not None else 0
+
+    def wal_seconds(self):
+        return self.last_time - self.first_time if self.first_time is not None else 0.0
+
+    def stop(self):
+        """Stop sampling, take a last sample and close the connection"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.conn is not None and not self.conn.closed:
+            try:
+                self.sample()
+            except psycopg2.Error as e:
+                print(f"Error sampling replication lag: {e}")
+            self.conn.close()
+
+    def print_summary(self, operations=None):
+        wal_bytes = self.wal_bytes()
+        seconds = self.wal_seconds()
+        rate = wal_bytes / seconds if seconds > 0 else 0
+        summary = f"WAL written: {wal_bytes/1_000_000:.2f} MB ({format_bytes(rate)}/s"
+        if operations:
+            summary += f", {wal_bytes / operations:.0f} bytes per operation"
+        print(summary + ")")
+        for slot_name, (lag_bytes, lag_s) in sorted(self.max_lags.items()):
+            print(f"  Slot {slot_name}: max lag {format_bytes(lag_bytes)} ({lag_s:.1f}s)")
+        print(f"Replication lag samples written to {self.output_file}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sample WAL rate and replication slot lag')
+    parser.add_argument('--dbname', type=str, default='postgres',
+                      help='Database name (default: postgres)')
+    parser.add_argument('--user', type=str, default='postgres',
+                      help='Database user (default: postgres)')
+    parser.add_argument('--password', type=str, default='postgres',
+                      help='Database password (default: postgres)')
+    parser.add_argument('--host', type=str, default='localhost',
+                      help='Database host (default: localhost)')
+    parser.add_argument('--port', type=str, default='5432',
+                      help='Database port (default: 5432)')
+    parser.add_argument('--interval', type=float, default=1.0,
+                      help='Seconds between samples (default: 1.0)')
+    parser.add_argument('--output', type=str, default='replication_lag.csv',
+                      help='Time-series CSV, one row per slot per sample (default: replication_lag.csv)')
+    parser.add_argument('--duration', type=float, default=None,
+                      help='Stop after this many seconds (default: until interrupted)')
+
+    args = parser.parse_args()
+    sampler = ReplicationLagSampler(
+        {"dbname": args.dbname, "user": args.user, "password": args.password,
+         "host": args.host, "port": args.port},
+        output_file=args.output, interval=args.interval, verbose=True
+    )
+    sampler.start()
+    try:
+        if args.duration is not None:
+            time.sleep(args.duration)
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nStopping sampler...")
+    finally:
+        sampler.stop()
+        sampler.print_summary()
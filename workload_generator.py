@@ -1,37 +1,244 @@
 import psycopg2
 import psycopg2.extras
+import numpy as np
 import json
+import math
 import random
 import time
 import uuid
 from datetime import datetime, timedelta, date
 import argparse
-from collections import deque
-
-# Define format_data_rate function at module level
-def format_data_rate(bytes_per_sec):
-    if bytes_per_sec >= 1_000_000:
-        return f"{bytes_per_sec/1_000_000:.2f} MB/s"
-    elif bytes_per_sec >= 1_000:
-        return f"{bytes_per_sec/1_000:.2f} KB/s"
-    else:
-        return f"{bytes_per_sec:.2f} B/s"
+import asyncio
+import multiprocessing
+import queue
+from collections import Counter, deque
+from pg_copy import CopyWriter, column_types, preallocate_ids
+from id_store import IdStore, KeyDistribution
+import workload_log
+from wal_sampler import ReplicationLagSampler
+from formatting import format_data_rate
+from metrics import DURATION_BUCKETS_S, create_metrics, parse_metrics_target, parse_tags
+
+class RateSchedule:
+    """Target offered load in ops/s as a function of elapsed time"""
+    PROFILES = ("constant", "step", "linear", "sine")
+
+    def __init__(self, target_ops_per_sec, profile="constant", start_ops_per_sec=None,
+                 step_ops_per_sec=None, step_seconds=10.0, ramp_seconds=60.0,
+                 amplitude_ops_per_sec=None, period_seconds=60.0):
+        if profile not in self.PROFILES:
+            raise ValueError(f"Unsupported rate profile: {profile}")
+        self.target_ops_per_sec = target_ops_per_sec
+        self.profile = profile
+        # step and linear ramp up from start_ops_per_sec to the target
+        self.start_ops_per_sec = start_ops_per_sec if start_ops_per_sec is not None else target_ops_per_sec / 10
+        self.step_ops_per_sec = step_ops_per_sec if step_ops_per_sec is not None else target_ops_per_sec / 10
+        self.step_seconds = step_seconds
+        self.ramp_seconds = ramp_seconds
+        # sine oscillates around the target
+        self.amplitude_ops_per_sec = amplitude_ops_per_sec if amplitude_ops_per_sec is not None else target_ops_per_sec / 2
+        self.period_seconds = period_seconds
+
+    def rate_at(self, elapsed):
+        """Target ops/s at elapsed seconds since the schedule started"""
+        if self.profile == "step":
+            steps = int(elapsed // self.step_seconds)
+            rate = min(self.target_ops_per_sec, self.start_ops_per_sec + steps * self.step_ops_per_sec)
+        elif self.profile == "linear":
+            fraction = min(1.0, elapsed / self.ramp_seconds) if self.ramp_seconds > 0 else 1.0
+            rate = self.start_ops_per_sec + (self.target_ops_per_sec - self.start_ops_per_sec) * fraction
+        elif self.profile == "sine":
+            rate = self.target_ops_per_sec + self.amplitude_ops_per_sec * math.sin(
+                2 * math.pi * elapsed / self.period_seconds)
+        else:
+            rate = self.target_ops_per_sec
+        # Never let the schedule stall completely
+        return max(rate, 1.0)
+
+    def scaled(self, factor):
+        """Copy of this schedule with every rate multiplied by factor, e.g. one worker's share"""
+        return RateSchedule(
+            self.target_ops_per_sec * factor, self.profile,
+            start_ops_per_sec=self.start_ops_per_sec * factor,
+            step_ops_per_sec=self.step_ops_per_sec * factor,
+            step_seconds=self.step_seconds,
+            ramp_seconds=self.ramp_seconds,
+            amplitude_ops_per_sec=self.amplitude_ops_per_sec * factor,
+            period_seconds=self.period_seconds
+        )
+
+class OpenLoopScheduler:
+    """Issue batches on a fixed, deadline-based schedule.
+
+    Intended start times only depend on the rate schedule, never on how long
+    earlier batches took. When Postgres slows down the offered load is kept
+    and the delay shows up as start lag instead of disappearing (coordinated
+    omission).
+    """
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.start_time = None
+        self.next_start = None
+        self.lags = []
+
+    def start(self):
+        self.start_time = time.time()
+        self.next_start = self.start_time
+
+    def wait(self):
+        """Sleep until the next intended start time and return how far behind it we are"""
+        now = time.time()
+        if now < self.next_start:
+            time.sleep(self.next_start - now)
+            now = time.time()
+        lag = max(0.0, now - self.next_start)
+        self.lags.append(lag)
+        return lag
+
+    async def wait_async(self):
+        """wait() for callers running inside an asyncio event loop"""
+        delay = self.next_start - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lag = max(0.0, time.time() - self.next_start)
+        self.lags.append(lag)
+        return lag
+
+    def advance(self, operations):
+        """Schedule the next batch after issuing one of the given size"""
+        rate = self.schedule.rate_at(self.next_start - self.start_time)
+        self.next_start += max(operations, 1) / rate
+
+    def current_rate(self):
+        return self.schedule.rate_at(time.time() - self.start_time)
+
+def lag_summary(lags):
+    """p50/p99/max of schedule lags in milliseconds"""
+    if not lags:
+        return 0.0, 0.0, 0.0
+    lags_ms = np.asarray(lags) * 1000
+    return float(np.percentile(lags_ms, 50)), float(np.percentile(lags_ms, 99)), float(lags_ms.max())
+
+def txn_size_summary(txn_sizes):
+    """mean/p50/p99/max rows per transaction from a {rows: transactions} Counter"""
+    if not txn_sizes:
+        return 0.0, 0, 0, 0
+    sizes = np.array(sorted(txn_sizes), dtype=np.int64)
+    cumulative = np.cumsum([txn_sizes[size] for size in sizes])
+    total = cumulative[-1]
+    def percentile(q):
+        return int(sizes[np.searchsorted(cumulative, q * total)])
+    mean = sum(size * count for size, count in txn_sizes.items()) / total
+    return mean, percentile(0.5), percentile(0.99), int(sizes[-1])
+
+def random_uuids(count, rng):
+    """Build count version-4 UUIDs from one bulk draw of rng's random bytes"""
+    raw = np.frombuffer(rng.bytes(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    # Set the version (4) and RFC 4122 variant bits like uuid.uuid4()
+    raw[:, 6] = (raw[:, 6] & 0x0f) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3f) | 0x80
+    data = raw.tobytes()
+    return [uuid.UUID(bytes=data[i:i + 16]) for i in range(0, 16 * count, 16)]
+
+def concat(*parts):
+    """Element-wise string concatenation of arrays and constant strings"""
+    count = next(len(part) for part in parts if not isinstance(part, str))
+    columns = [
+        [part] * count if isinstance(part, str) else list(map(str, np.asarray(part).tolist()))
+        for part in parts
+    ]
+    return np.array([''.join(row) for row in zip(*columns)], dtype=object)
+
+def nullable(values, null_mask):
+    """Python values for a column, with None where null_mask is set"""
+    # astype(object) turns datetime64 values into datetime/date objects
+    return np.where(null_mask, None, np.asarray(values).astype(object)).tolist()
+
+# SQL counterparts of the random helpers above, for rows generated inside Postgres
+
+def sql_randint(low, high):
+    """Uniform integer in [low, high], like random.randint"""
+    return f"({low} + floor(random() * {high - low + 1}))::bigint"
+
+def sql_uniform(low, high, digits):
+    """Uniform number between low and high (either may be an SQL expression), rounded"""
+    return f"round(({low} + random() * ({high} - {low}))::numeric, {digits})"
+
+def sql_choice(values):
+    """One of values (strings or None), like random.choice"""
+    items = ', '.join('NULL' if value is None else "'" + value.replace("'", "''") + "'" for value in values)
+    return f"(ARRAY[{items}]::text[])[1 + floor(random() * {len(values)})::int]"
+
+def sql_nullable(expr, null_probability):
+    return f"CASE WHEN random() < {null_probability} THEN NULL ELSE {expr} END"
+
+def sql_days(low, high):
+    return f"{sql_randint(low, high)} * interval '1 day'"
+
+def sql_random_letters(length):
+    """Random lowercase string; correlated with the series row g so it differs per row"""
+    if length <= 0:
+        return "''"
+    return (
+        "substr((SELECT string_agg(translate(md5(random()::text), '0123456789', 'qrstuvwxyz'), '') "
+        f"FROM generate_series(1, {-(-length // 32)}) WHERE g IS NOT NULL), 1, {length})"
+    )
+
+def sql_advertiser_id(letters):
+    """Five dash-separated groups of a digit and a letter repeated four times"""
+    return (
+        f"array_to_string(ARRAY(SELECT repeat(floor(random() * 10)::int || "
+        f"substr('{letters}', 1 + floor(random() * {len(letters)})::int, 1), 4) "
+        "FROM generate_series(1, 5) WHERE g IS NOT NULL), '-')"
+    )
+
+class WriteSession:
+    """A connection with its open transaction and the ids it releases on commit"""
+
+    def __init__(self, conn, cur=None):
+        self.conn = conn
+        self.cur = cur if cur is not None else conn.cursor()
+        self.rows = 0
+        self.statements = 0
+        self.new_ids = []
+        self.updated_ids = []
+
+    def reset(self):
+        # Cleared in place: callers keep references to the id lists across commits
+        self.rows = 0
+        self.statements = 0
+        self.new_ids.clear()
+        self.updated_ids.clear()
 
 class WorkloadGenerator:
     def __init__(self, batch_size=100, interval=1.0, table_name="benchmark_records",
                  dbname="testdb", user="postgres", password="postgres", 
                  host="localhost", port="5432", target_bytes=100, num_columns=1,
-                 schema_type="benchmark"):
+                 schema_type="benchmark", insert_method="values", copy_format="text",
+                 rate_schedule=None, generator="python", writer="sync", async_connections=4,
+                 commit_ordering="strict", stamp_writes=False, seed=None, record_path=None,
+                 key_distribution="fifo", delete_distribution="uniform", zipf_s=0.99,
+                 hotspot_fraction=0.2, hotspot_probability=0.8, mix=(1, 1, 1), update_mode="shared",
+                 rows_per_txn=None, statements_per_txn=None, sessions=1, wal_sample_file=None,
+                 wal_sample_interval=1.0, metrics=None):
+        # Seed before anything random is generated, including the cached paddings
+        self.seed = seed
+        if seed is not None:
+            random.seed(seed)
+        
         # Register UUID adapter for psycopg2
         psycopg2.extras.register_uuid()
         
-        self.conn = psycopg2.connect(
-            dbname=dbname,
-            user=user,
-            password=password,
-            host=host,
-            port=port
-        )
+        # Kept so worker processes can open their own connections
+        self.db_params = {
+            "dbname": dbname,
+            "user": user,
+            "password": password,
+            "host": host,
+            "port": port
+        }
+        self.conn = psycopg2.connect(**self.db_params)
         self.batch_size = batch_size
         self.interval = interval
         self.table_name = table_name
@@ -41,11 +248,96 @@ class WorkloadGenerator:
         self.cached_paddings = self._generate_cached_paddings(1000)  # Generate 1000 unique paddings
         self.padding_index = 0
         self.schema_type = schema_type
+        self.insert_method = insert_method
+        self.copy_format = copy_format
+        # One CopyWriter per cursor and column list, created on first use
+        self.copy_writers = {}
+        # Open-loop mode replaces sleep(interval) with a deadline-based schedule
+        self.rate_schedule = rate_schedule
+        # "numpy" generates whole insert batches column by column
+        self.generator = generator
+        self.np_rng = np.random.default_rng(seed)
+        # "async" pipelines batches over several psycopg 3 connections (see async_writer.py)
+        self.writer = writer
+        self.async_connections = async_connections
+        self.commit_ordering = commit_ordering
+        # Stamp every inserted and updated row with its write time (epoch microseconds),
+        # so the stats collector can measure end-to-end latency
+        self.stamp_writes = stamp_writes
+        # Every write is appended to this log for replay (see workload_log.py)
+        self.recorder = None
+        if record_path:
+            self.recorder = workload_log.WorkloadLogWriter(record_path, {
+                "table_name": table_name,
+                "schema_type": schema_type,
+                "num_columns": num_columns,
+                "target_bytes": target_bytes,
+                "batch_size": batch_size,
+                "stamp_writes": stamp_writes,
+                "seed": seed
+            })
+        
+        # "fifo" updates the oldest inserted ids once each, then deletes them
+        self.key_distribution = key_distribution
+        self.delete_distribution = delete_distribution
+        self.zipf_s = zipf_s
+        self.hotspot_fraction = hotspot_fraction
+        self.hotspot_probability = hotspot_probability
+        # "shared" sets the same generated values on every updated row, "per-row"
+        # gives each row its own in a single UPDATE ... FROM unnest(...)
+        self.update_mode = update_mode
+        # {column: type} of the table, looked up on the first per-row update
+        self.column_type_map = None
+        # Relative insert:update:delete counts per batch; the largest gets batch_size
+        self.mix = mix
+        self.mix_carry = [0.0, 0.0, 0.0]
+        
+        # Transaction shape: by default every batch is one transaction. Otherwise a
+        # transaction commits once it holds rows_per_txn rows or statements_per_txn
+        # statements, and batches rotate over sessions connections, so up to that
+        # many transactions are open and interleaved at once
+        self.rows_per_txn = rows_per_txn
+        self.statements_per_txn = statements_per_txn
+        self.session_count = sessions
+        self.sessions = None
+        self.next_session = 0
+        # Ids updated by open transactions, which other sessions must not touch
+        self.locked_ids = set()
+        # Committed transactions by rows, and sizes not yet sent to the parent process
+        self.txn_sizes = Counter()
+        self.txn_statements = 0
+        self.unreported_txn_sizes = []
+        
+        # WAL rate and replication slot lag, sampled on a separate connection
+        # while the workload runs (see wal_sampler.py)
+        self.wal_sample_file = wal_sample_file
+        self.wal_sample_interval = wal_sample_interval
+        self.wal_sampler = None
+        # Optional live export of every batch (see metrics.py); only the parent process exports
+        self.metrics = metrics
         
-        # Maintain separate pools for update and delete operations
-        self.update_pool = deque()
-        self.delete_pool = deque()
+        if key_distribution == "fifo":
+            # Maintain separate pools for update and delete operations
+            self.update_pool = deque()
+            self.delete_pool = deque()
+        else:
+            # Every live row can be updated any number of times until it is deleted,
+            # so both pools are the same store
+            self.update_pool = self.delete_pool = IdStore()
+            self.update_keys = self.key_chooser(key_distribution)
+            self.delete_keys = self.key_chooser(delete_distribution)
         
+    def key_chooser(self, name):
+        return KeyDistribution(name, self.np_rng, zipf_s=self.zipf_s,
+                               hot_fraction=self.hotspot_fraction,
+                               hot_probability=self.hotspot_probability)
+    
+    def uuid4(self):
+        """uuid.uuid4(), drawn from the seeded random module when a seed is set"""
+        if self.seed is None:
+            return uuid.uuid4()
+        return uuid.UUID(int=random.getrandbits(128), version=4)
+    
     def _generate_cached_paddings(self, count):
         """Pre-generate a list of padding strings"""
         base_size = 93  # Base row size including headers and fixed fields
@@ -60,13 +352,18 @@ class WorkloadGenerator:
         self.cur.execute(f"TRUNCATE TABLE {self.table_name} RESTART IDENTITY")
         self.conn.commit()
         
-    def setup_table(self):
-        """Create the table if it doesn't exist and truncate it"""
+    def setup_table(self, truncate=True, create_indexes=True):
+        """Create the table if it doesn't exist and truncate it.
+
+        With create_indexes=False a new table gets neither its primary key nor
+        its secondary indexes, for bulk loads that call create_indexes() after.
+        """
+        primary_key = " PRIMARY KEY" if create_indexes else ""
         if self.schema_type == "benchmark":
             # Generate dynamic columns for benchmark schema
             extra_columns = [f"extra_col_{i} TEXT" for i in range(self.num_columns)]
             columns_def = ",\n                ".join([
-                "id SERIAL PRIMARY KEY",
+                f"id SERIAL{primary_key}",
                 "string_field TEXT",
                 "numeric_field DECIMAL",
                 "timestamp_field TIMESTAMP WITH TIME ZONE",
@@ -85,7 +382,7 @@ class WorkloadGenerator:
             # Create holdings table schema
             self.cur.execute(f"""
                 CREATE TABLE IF NOT EXISTS {self.table_name} (
-                    id BIGSERIAL PRIMARY KEY,
+                    id BIGSERIAL{primary_key},
                     shares NUMERIC(20,10) NOT NULL,
                     user_id INTEGER NOT NULL,
                     fund_id INTEGER NOT NULL,
@@ -112,18 +409,11 @@ class WorkloadGenerator:
                     originator_id BIGINT
                 )
             """)
-            # Create some basic indexes for the holdings table
-            self.cur.execute(f"""
-                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_investment_id ON {self.table_name} (investment_id);
-                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_type_user_id ON {self.table_name} (type, user_id);
-                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_updated_at ON {self.table_name} (updated_at);
-                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_investment_account_id ON {self.table_name} (investment_account_id);
-            """)
         elif self.schema_type == "devices":
             # Create devices table schema
             self.cur.execute(f"""
                 CREATE TABLE IF NOT EXISTS {self.table_name} (
-                    id SERIAL PRIMARY KEY,
+                    id SERIAL{primary_key},
                     udid VARCHAR(255),
                     created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
                     updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
@@ -143,17 +433,44 @@ class WorkloadGenerator:
                     user_uuid UUID
                 )
             """)
+        
+        if self.stamp_writes and self.schema_type != "benchmark":
+            # The benchmark schema carries the stamp in json_field instead
+            self.cur.execute(f"ALTER TABLE {self.table_name} ADD COLUMN IF NOT EXISTS write_ts_us BIGINT")
+        
+        self.conn.commit()
+        if create_indexes:
+            self.create_indexes()
+        if truncate:
+            self.truncate_table()
+        self.column_type_map = None
+        # Clear the pools
+        self.update_pool.clear()
+        self.delete_pool.clear()
+    
+    def create_indexes(self):
+        """Create the primary key, if the table was created without one, and the schema's indexes"""
+        self.cur.execute(
+            "SELECT 1 FROM pg_index WHERE indrelid = %s::regclass AND indisprimary",
+            (self.table_name,)
+        )
+        if self.cur.fetchone() is None:
+            self.cur.execute(f"ALTER TABLE {self.table_name} ADD PRIMARY KEY (id)")
+        if self.schema_type == "holdings":
+            # Create some basic indexes for the holdings table
+            self.cur.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_investment_id ON {self.table_name} (investment_id);
+                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_type_user_id ON {self.table_name} (type, user_id);
+                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_updated_at ON {self.table_name} (updated_at);
+                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_investment_account_id ON {self.table_name} (investment_account_id);
+            """)
+        elif self.schema_type == "devices":
             # Create some basic indexes for the devices table
             self.cur.execute(f"""
                 CREATE INDEX IF NOT EXISTS idx_{self.table_name}_user_id ON {self.table_name} (user_id);
                 CREATE INDEX IF NOT EXISTS idx_{self.table_name}_user_uuid ON {self.table_name} (user_uuid);
             """)
-        
         self.conn.commit()
-        self.truncate_table()
-        # Clear the pools
-        self.update_pool.clear()
-        self.delete_pool.clear()
         
     def generate_record(self):
         """Generate a single record with random data based on schema type"""
@@ -190,7 +507,7 @@ class WorkloadGenerator:
             settlement_date = (created_date + timedelta(days=random.randint(1, 4))).date()
             
             # Generate random investment account UUID
-            investment_account_id = uuid.uuid4()
+            investment_account_id = self.uuid4()
             
             # Generate random shares and price
             shares = round(random.uniform(0.01, 10.0), 10)
@@ -214,7 +531,7 @@ class WorkloadGenerator:
                 "chargeback_at": None if random.random() > 0.1 else updated_date + timedelta(days=random.randint(1, 30)),
                 "present_to_user": True if random.random() > 0.05 else False,
                 "investment_account_id": investment_account_id,
-                "acat_transfer_id": None if random.random() > 0.1 else uuid.uuid4(),
+                "acat_transfer_id": None if random.random() > 0.1 else self.uuid4(),
                 "fifo_complete": None if random.random() > 0.5 else (True if random.random() > 0.5 else False),
                 "tax_effective_date": None if random.random() > 0.3 else updated_date + timedelta(days=random.randint(1, 90)),
                 "holding_split_id": None if random.random() > 0.1 else random.randint(1000000, 9000000),
@@ -244,7 +561,7 @@ class WorkloadGenerator:
                 browser_version = ""
                 user_agent = f"Acorns/{build.split('.')[-1]} CFNetwork/{random.randint(900, 999)}.{random.randint(0, 9)}.{random.randint(1, 9)} Darwin/{random.randint(18, 22)}.{random.randint(0, 9)}.0"
                 version = ""
-                udid = f"ios-{uuid.uuid4()}"
+                udid = f"ios-{self.uuid4()}"
                 advertiser_id = '-'.join([f"{random.randint(0, 9)}{random.choice('ABCDEF')}" * 4 for _ in range(5)])
             elif platform == "android":
                 app = "com.acorns.android"
@@ -255,7 +572,7 @@ class WorkloadGenerator:
                 browser_version = ""
                 user_agent = f"Acorns/{build} (Linux; Android {os}; {hardware})"
                 version = ""
-                udid = f"android-{uuid.uuid4()}"
+                udid = f"android-{self.uuid4()}"
                 advertiser_id = '-'.join([f"{random.randint(0, 9)}{random.choice('abcdef')}" * 4 for _ in range(5)])
             else:  # web
                 app = ""
@@ -266,7 +583,7 @@ class WorkloadGenerator:
                 browser_version = f"{random.randint(70, 110)}.{random.randint(0, 9)}.{random.randint(0, 9)}.{random.randint(0, 9)}"
                 user_agent = f"Mozilla/5.0 ({os}) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{browser_version} Safari/537.36"
                 version = ""
-                udid = f"web-{uuid.uuid4()}"
+                udid = f"web-{self.uuid4()}"
                 advertiser_id = ""
             
             return {
@@ -286,213 +603,1232 @@ class WorkloadGenerator:
                 "browser": browser,
                 "browser_version": browser_version,
                 "advertiser_id": advertiser_id,
-                "user_uuid": uuid.uuid4()
+                "user_uuid": self.uuid4()
             }
     
-    def insert_batch(self):
+    def generate_batch(self, count):
+        """Generate a whole batch column by column with NumPy.
+
+        Returns (columns, rows) ready for insert_rows. Per-column distributions
+        match generate_record.
+        """
+        rng = self.np_rng
+        now = np.datetime64(datetime.now(), 'us')
+        
+        def days(low, high):
+            return rng.integers(low, high + 1, count).astype('timedelta64[D]')
+        
+        def null_mask(null_probability):
+            return rng.random(count) < null_probability
+        
+        if self.schema_type == "benchmark":
+            padding_idx = (self.padding_index + np.arange(count)) % len(self.cached_paddings)
+            self.padding_index = int((self.padding_index + count) % len(self.cached_paddings))
+            paddings = np.asarray(self.cached_paddings)[padding_idx]
+            data = {
+                "string_field": concat("test-", rng.integers(1, 1001, count)).tolist(),
+                "numeric_field": rng.uniform(1, 1000, count).round(2).tolist(),
+                "timestamp_field": [datetime.now()] * count,
+                "json_field": concat('{"hello": "world-', rng.integers(1, 101, count),
+                                     '", "padding": "', paddings, '"}').tolist()
+            }
+            for i in range(self.num_columns):
+                data[f"extra_col_{i}"] = concat("extra-", rng.integers(1, 1001, count)).tolist()
+        
+        elif self.schema_type == "holdings":
+            holding_types = np.array(["HoldingBought", "HoldingGifted", "HoldingReinvested", "HoldingDeposited"])
+            statuses = np.array(["settled", "pending", "chargeback", None], dtype=object)
+            created_date = now - days(1, 1095)
+            updated_date = created_date + days(1, 5)
+            shares = rng.uniform(0.01, 10.0, count).round(10)
+            # Only build UUIDs for the rows that get an acat_transfer_id
+            acat_transfer_id = np.full(count, None, dtype=object)
+            has_acat = ~null_mask(0.9)
+            acat_transfer_id[has_acat] = random_uuids(int(has_acat.sum()), rng)
+            
+            data = {
+                "shares": shares.tolist(),
+                "user_id": rng.integers(1000000, 20000001, count).tolist(),
+                "fund_id": rng.integers(1, 51, count).tolist(),
+                "investment_id": rng.integers(1000000000, 2000000001, count).tolist(),
+                "allocations_order_id": rng.integers(10000, 100001, count).tolist(),
+                "type": holding_types[rng.integers(0, len(holding_types), count)].tolist(),
+                "sold_by_id": nullable(rng.integers(1000000000, 2000000001, count), null_mask(0.7)),
+                "shares_sold": nullable(rng.uniform(0.01, shares).round(10), null_mask(0.7)),
+                "created_at": created_date.astype(object).tolist(),
+                "updated_at": updated_date.astype(object).tolist(),
+                "shares_price": rng.uniform(10.0, 500.0, count).round(4).tolist(),
+                "status": statuses[rng.integers(0, len(statuses), count)].tolist(),
+                "chargeback_allocations_order_id": nullable(rng.integers(10000, 100001, count), null_mask(0.9)),
+                "chargeback_shares": nullable(rng.uniform(0.01, shares).round(10), null_mask(0.9)),
+                "chargeback_at": nullable(updated_date + days(1, 30), null_mask(0.9)),
+                "present_to_user": (rng.random(count) > 0.05).tolist(),
+                "investment_account_id": random_uuids(count, rng),
+                "acat_transfer_id": acat_transfer_id.tolist(),
+                "fifo_complete": nullable(rng.random(count) > 0.5, null_mask(0.5)),
+                "tax_effective_date": nullable(updated_date + days(1, 90), null_mask(0.7)),
+                "holding_split_id": nullable(rng.integers(1000000, 9000001, count), null_mask(0.9)),
+                "settlement_date": (created_date + days(1, 4)).astype('datetime64[D]').astype(object).tolist(),
+                "trade_date": created_date.astype('datetime64[D]').astype(object).tolist(),
+                "originator_id": nullable(rng.integers(1000000, 9000001, count), null_mask(0.8))
+            }
+        
+        elif self.schema_type == "devices":
+            platform_names = np.array(["ios", "android", "web"])
+            platform = rng.integers(0, len(platform_names), count)
+            
+            created_date = now - days(1, 1095)
+            first_login_date = created_date + rng.integers(1, 61, count).astype('timedelta64[s]')
+            last_login_date = first_login_date + days(1, 365)
+            
+            # Every platform-specific column starts empty and is filled per platform
+            columns = {name: np.full(count, "", dtype=object) for name in (
+                "app", "build", "hardware", "os", "browser", "browser_version",
+                "user_agent", "version", "udid", "advertiser_id")}
+            
+            def digits(low, high, n):
+                return rng.integers(low, high + 1, n)
+            
+            def advertiser_ids(letters, n):
+                letter_choices = np.array(list(letters))
+                groups = [
+                    concat(digits(0, 9, n), letter_choices[rng.integers(0, len(letters), n)]) * 4
+                    for _ in range(5)
+                ]
+                result = groups[0]
+                for group in groups[1:]:
+                    result = concat(result, "-", group)
+                return result
+            
+            for platform_idx, name in enumerate(platform_names):
+                idx = np.flatnonzero(platform == platform_idx)
+                n = len(idx)
+                if n == 0:
+                    continue
+                udid = concat(f"{name}-", np.array([str(u) for u in random_uuids(n, rng)]))
+                if name in ("ios", "android"):
+                    build_number = digits(10000, 99999, n)
+                    build = concat(digits(1, 5, n), ".", digits(1, 9, n), ".", digits(1, 9, n), ".", build_number)
+                    columns["build"][idx] = build
+                    columns["udid"][idx] = udid
+                if name == "ios":
+                    columns["app"][idx] = "com.acorns.investor"
+                    columns["os"][idx] = concat(digits(10, 16, n), ".", digits(0, 9, n), ".", digits(0, 9, n))
+                    columns["user_agent"][idx] = concat(
+                        "Acorns/", build_number, " CFNetwork/", digits(900, 999, n), ".", digits(0, 9, n), ".",
+                        digits(1, 9, n), " Darwin/", digits(18, 22, n), ".", digits(0, 9, n), ".0")
+                    columns["advertiser_id"][idx] = advertiser_ids("ABCDEF", n)
+                elif name == "android":
+                    os_version = concat(digits(6, 13, n), ".", digits(0, 9, n), ".", digits(0, 9, n))
+                    hardware = concat("SM-G", digits(900, 999, n),
+                                      np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))[rng.integers(0, 26, n)])
+                    columns["app"][idx] = "com.acorns.android"
+                    columns["os"][idx] = os_version
+                    columns["hardware"][idx] = hardware
+                    columns["user_agent"][idx] = concat(
+                        "Acorns/", build, " (Linux; Android ", os_version, "; ", hardware, ")")
+                    columns["advertiser_id"][idx] = advertiser_ids("abcdef", n)
+                else:
+                    web_os = np.array(["Windows NT 10.0", "Macintosh; Intel Mac OS X 10_15", "X11; Linux x86_64"])
+                    browsers = np.array(["Chrome", "Firefox", "Safari", "Edge"])
+                    os_name = web_os[rng.integers(0, len(web_os), n)]
+                    browser_version = concat(digits(70, 110, n), ".", digits(0, 9, n), ".",
+                                             digits(0, 9, n), ".", digits(0, 9, n))
+                    columns["os"][idx] = os_name
+                    columns["browser"][idx] = browsers[rng.integers(0, len(browsers), n)]
+                    columns["browser_version"][idx] = browser_version
+                    columns["user_agent"][idx] = concat(
+                        "Mozilla/5.0 (", os_name, ") AppleWebKit/537.36 (KHTML, like Gecko) Chrome/",
+                        browser_version, " Safari/537.36")
+                    columns["udid"][idx] = udid
+            
+            data = {
+                "udid": columns["udid"].tolist(),
+                "created_at": created_date.astype(object).tolist(),
+                "updated_at": last_login_date.astype(object).tolist(),
+                "user_id": rng.integers(1000000, 20000001, count).tolist(),
+                "first_login_at": first_login_date.astype(object).tolist(),
+                "last_login_at": last_login_date.astype(object).tolist(),
+                "app": columns["app"].tolist(),
+                "build": columns["build"].tolist(),
+                "hardware": columns["hardware"].tolist(),
+                "os": columns["os"].tolist(),
+                "platform": platform_names[platform].tolist(),
+                "user_agent": columns["user_agent"].tolist(),
+                "version": columns["version"].tolist(),
+                "browser": columns["browser"].tolist(),
+                "browser_version": columns["browser_version"].tolist(),
+                "advertiser_id": columns["advertiser_id"].tolist(),
+                "user_uuid": random_uuids(count, rng)
+            }
+        
+        columns = list(data.keys())
+        return columns, list(zip(*data.values()))
+    
+    def build_series_insert_sql(self, first_id, last_id):
+        """INSERT ... SELECT generating rows first_id..last_id inside Postgres.
+
+        Value distributions match generate_record; only the random source
+        differs. Per-row values that other columns derive from (dates, shares,
+        platform) are computed in subqueries fenced with OFFSET 0, so each is
+        evaluated once per row rather than once per reference.
+        """
+        series = f"generate_series({first_id}, {last_id}) g"
+        
+        if self.schema_type == "benchmark":
+            padding_length = max(0, self.target_bytes - 93)
+            select = {
+                "string_field": f"'test-' || {sql_randint(1, 1000)}",
+                "numeric_field": sql_uniform(1, 1000, 2),
+                "timestamp_field": "clock_timestamp()",
+                "json_field": (f"jsonb_build_object('hello', 'world-' || {sql_randint(1, 100)}, "
+                               f"'padding', {sql_random_letters(padding_length)})")
+            }
+            for i in range(self.num_columns):
+                select[f"extra_col_{i}"] = f"'extra-' || {sql_randint(1, 1000)}"
+            source = series
+        
+        elif self.schema_type == "holdings":
+            select = {
+                "shares": "shares",
+                "user_id": sql_randint(1000000, 20000000),
+                "fund_id": sql_randint(1, 50),
+                "investment_id": sql_randint(1000000000, 2000000000),
+                "allocations_order_id": sql_randint(10000, 100000),
+                "type": sql_choice(["HoldingBought", "HoldingGifted", "HoldingReinvested", "HoldingDeposited"]),
+                "sold_by_id": sql_nullable(sql_randint(1000000000, 2000000000), 0.7),
+                "shares_sold": sql_nullable(sql_uniform(0.01, "shares", 10), 0.7),
+                "created_at": "created_at",
+                "updated_at": "updated_at",
+                "shares_price": sql_uniform(10.0, 500.0, 4),
+                "status": sql_choice(["settled", "pending", "chargeback", None]),
+                "chargeback_allocations_order_id": sql_nullable(sql_randint(10000, 100000), 0.9),
+                "chargeback_shares": sql_nullable(sql_uniform(0.01, "shares", 10), 0.9),
+                "chargeback_at": sql_nullable(f"updated_at + {sql_days(1, 30)}", 0.9),
+                "present_to_user": "random() > 0.05",
+                "investment_account_id": "gen_random_uuid()",
+                "acat_transfer_id": sql_nullable("gen_random_uuid()", 0.9),
+                "fifo_complete": sql_nullable("random() > 0.5", 0.5),
+                "tax_effective_date": sql_nullable(f"updated_at + {sql_days(1, 90)}", 0.7),
+                "holding_split_id": sql_nullable(sql_randint(1000000, 9000000), 0.9),
+                "settlement_date": f"(created_at + {sql_days(1, 4)})::date",
+                "trade_date": "created_at::date",
+                "originator_id": sql_nullable(sql_randint(1000000, 9000000), 0.8)
+            }
+            source = f"""(
+                SELECT g, created_at, created_at + {sql_days(1, 5)} AS updated_at, shares
+                FROM (
+                    SELECT g, localtimestamp - {sql_days(1, 1095)} AS created_at,
+                           {sql_uniform(0.01, 10.0, 10)} AS shares
+                    FROM {series}
+                    OFFSET 0
+                ) created
+                OFFSET 0
+            ) base"""
+        
+        elif self.schema_type == "devices":
+            digit = lambda low, high: f"{sql_randint(low, high)}::text"
+            select = {
+                "udid": "platform || '-' || gen_random_uuid()",
+                "created_at": "created_at",
+                "updated_at": "last_login_at",
+                "user_id": sql_randint(1000000, 20000000),
+                "first_login_at": "first_login_at",
+                "last_login_at": "last_login_at",
+                "app": ("CASE platform WHEN 'ios' THEN 'com.acorns.investor' "
+                        "WHEN 'android' THEN 'com.acorns.android' ELSE '' END"),
+                "build": "CASE WHEN platform = 'web' THEN '' ELSE build END",
+                "hardware": "CASE WHEN platform = 'android' THEN hardware ELSE '' END",
+                "os": "os",
+                "platform": "platform",
+                "user_agent": f"""CASE platform
+                    WHEN 'ios' THEN 'Acorns/' || build_number || ' CFNetwork/' || {digit(900, 999)} || '.'
+                        || {digit(0, 9)} || '.' || {digit(1, 9)} || ' Darwin/' || {digit(18, 22)} || '.'
+                        || {digit(0, 9)} || '.0'
+                    WHEN 'android' THEN 'Acorns/' || build || ' (Linux; Android ' || os || '; ' || hardware || ')'
+                    ELSE 'Mozilla/5.0 (' || os || ') AppleWebKit/537.36 (KHTML, like Gecko) Chrome/'
+                        || browser_version || ' Safari/537.36'
+                END""",
+                "version": "''",
+                "browser": f"CASE WHEN platform = 'web' THEN {sql_choice(['Chrome', 'Firefox', 'Safari', 'Edge'])} ELSE '' END",
+                "browser_version": "CASE WHEN platform = 'web' THEN browser_version ELSE '' END",
+                "advertiser_id": (f"CASE platform WHEN 'ios' THEN {sql_advertiser_id('ABCDEF')} "
+                                  f"WHEN 'android' THEN {sql_advertiser_id('abcdef')} ELSE '' END"),
+                "user_uuid": "gen_random_uuid()"
+            }
+            web_os = ["Windows NT 10.0", "Macintosh; Intel Mac OS X 10_15", "X11; Linux x86_64"]
+            source = f"""(
+                SELECT g, platform, created_at, build_number,
+                       created_at + login_seconds * interval '1 second' AS first_login_at,
+                       created_at + login_seconds * interval '1 second' + {sql_days(1, 365)} AS last_login_at,
+                       {digit(1, 5)} || '.' || {digit(1, 9)} || '.' || {digit(1, 9)} || '.' || build_number AS build,
+                       CASE platform
+                           WHEN 'ios' THEN {digit(10, 16)} || '.' || {digit(0, 9)} || '.' || {digit(0, 9)}
+                           WHEN 'android' THEN {digit(6, 13)} || '.' || {digit(0, 9)} || '.' || {digit(0, 9)}
+                           ELSE {sql_choice(web_os)}
+                       END AS os,
+                       'SM-G' || {digit(900, 999)} || chr(65 + floor(random() * 26)::int) AS hardware,
+                       {digit(70, 110)} || '.' || {digit(0, 9)} || '.' || {digit(0, 9)} || '.' || {digit(0, 9)}
+                           AS browser_version
+                FROM (
+                    SELECT g, {sql_choice(['ios', 'android', 'web'])} AS platform,
+                           localtimestamp - {sql_days(1, 1095)} AS created_at,
+                           {sql_randint(1, 60)} AS login_seconds,
+                           {sql_randint(10000, 99999)} AS build_number
+                    FROM {series}
+                    OFFSET 0
+                ) platforms
+                OFFSET 0
+            ) base"""
+        
+        return f"""
+            INSERT INTO {self.table_name}
+            (id, {', '.join(select)})
+            SELECT g, {', '.join(select.values())}
+            FROM {source}
+        """
+    
+    def generate_rows(self, count):
+        """Generate count records as (columns, rows) with the configured generator"""
+        if self.generator == "numpy":
+            columns, rows = self.generate_batch(count)
+        else:
+            records = [self.generate_record() for _ in range(count)]
+            columns = list(records[0].keys())
+            rows = [tuple(record.values()) for record in records]
+        
+        if self.stamp_writes:
+            columns, rows = self.stamp_rows(columns, rows)
+        return columns, rows
+    
+    def write_stamp(self):
+        """Current time in epoch microseconds"""
+        return time.time_ns() // 1000
+    
+    def stamp_json(self, json_field, write_ts_us):
+        """Add write_ts_us as the first key of a JSON object string, replacing an earlier stamp"""
+        if json_field.startswith('{"write_ts_us": '):
+            json_field = '{' + json_field.split(', ', 1)[1]
+        return f'{{"write_ts_us": {write_ts_us}, {json_field[1:]}'
+    
+    def stamp_rows(self, columns, rows):
+        """Stamp generated rows with the write time, just before they are written"""
+        write_ts_us = self.write_stamp()
+        if self.schema_type == "benchmark":
+            json_idx = columns.index("json_field")
+            rows = [
+                (*row[:json_idx], self.stamp_json(row[json_idx], write_ts_us), *row[json_idx + 1:])
+                for row in rows
+            ]
+            return columns, rows
+        if "write_ts_us" in columns:
+            # Replayed rows already carry a stamp from when they were recorded
+            stamp_idx = columns.index("write_ts_us")
+            return columns, [(*row[:stamp_idx], write_ts_us, *row[stamp_idx + 1:]) for row in rows]
+        return [*columns, "write_ts_us"], [(*row, write_ts_us) for row in rows]
+    
+    def stamp_values(self, values):
+        """Stamp an update's {column: value} map with the write time"""
+        values = dict(values)
+        if self.schema_type == "benchmark":
+            values["json_field"] = self.stamp_json(values["json_field"], self.write_stamp())
+        else:
+            values["write_ts_us"] = self.write_stamp()
+        return values
+    
+    def insert_batch(self, count=None):
         """Insert a batch of records"""
-        records = [self.generate_record() for _ in range(self.batch_size)]
+        return self.insert_rows(*self.generate_rows(self.batch_size if count is None else count))
+    
+    def insert_rows(self, columns, rows):
+        """Insert rows (tuples in column order) and return their ids"""
+        if self.insert_method == "copy":
+            # COPY can't return ids, so reserve them from the sequence up front
+            ids = preallocate_ids(self.cur, self.table_name, len(rows))
+            self.copy_rows([id_record[0] for id_record in ids], columns, rows)
+        else:
+            self.cur.execute(self.build_insert_sql(columns, rows))
+            ids = self.cur.fetchall()
         
-        # Build the column list and value placeholders
-        columns = list(records[0].keys())
-        placeholders = [f"%({col})s" for col in columns]
+        if self.recorder:
+            self.recorder.insert(columns, rows, [id_record[0] for id_record in ids])
+        return ids
+    
+    def insert_rows_with_ids(self, ids, columns, rows):
+        """Insert rows under the given ids, bypassing the id sequence"""
+        if self.insert_method == "copy":
+            self.copy_rows(ids, columns, rows)
+        else:
+            self.cur.execute(self.build_insert_sql(["id", *columns], [(row_id, *row) for row_id, row in zip(ids, rows)]))
+    
+    def copy_rows(self, ids, columns, rows):
+        """COPY rows with explicit ids, bypassing the id sequence"""
+        key = (self.cur, tuple(columns))
+        writer = self.copy_writers.get(key)
+        if writer is None:
+            writer = CopyWriter(self.cur, self.table_name, ["id", *columns], self.copy_format)
+            self.copy_writers[key] = writer
+        writer.copy_rows([(row_id, *row) for row_id, row in zip(ids, rows)])
+    
+    def build_insert_sql(self, columns, rows):
+        """Multi-row INSERT ... VALUES ... RETURNING id statement for rows"""
+        # Build the value placeholders
+        placeholders = ', '.join(['%s'] * len(columns))
         
         args_str = ','.join(self.cur.mogrify(
-            f"({', '.join(placeholders)})",
-            record
-        ).decode('utf-8') for record in records)
+            f"({placeholders})",
+            row
+        ).decode('utf-8') for row in rows)
         
-        self.cur.execute(f"""
+        return f"""
             INSERT INTO {self.table_name} 
             ({', '.join(columns)})
             VALUES {args_str}
             RETURNING id
-        """)
-        return self.cur.fetchall()
+        """
+    
+    def next_batch_counts(self):
+        """Inserts, updates and deletes for the next batch, following the mix ratio.
+
+        Fractional counts are carried over, so e.g. a 3:1:1 mix with a batch
+        size of 100 averages exactly 33.3 updates per batch.
+        """
+        largest = max(self.mix)
+        counts = []
+        for i, weight in enumerate(self.mix):
+            self.mix_carry[i] += self.batch_size * weight / largest
+            count = int(self.mix_carry[i])
+            self.mix_carry[i] -= count
+            counts.append(count)
+        return tuple(counts)
+    
+    def take_update_ids(self, count):
+        """Ids for the next update, or [] if the pool is too small"""
+        if count <= 0 or len(self.update_pool) < (count if self.key_distribution == "fifo" else 1):
+            return []
+        if self.key_distribution == "fifo":
+            return [self.update_pool.popleft() for _ in range(count)]
+        # Hot ids drawn more than once are updated once; they stay live for later updates
+        ids_to_update = self.update_pool.sample(self.update_keys, count, exclude=self.locked_ids)
+        if self.session_count > 1 or self.writer == "async":
+            # Another session or in-flight async batch updating them before we commit would
+            # block on the row locks, and with strict commit ordering never get them
+            self.locked_ids.update(ids_to_update)
+        return ids_to_update
+    
+    def take_delete_ids(self, count):
+        """Ids for the next delete, removed from the pools, or [] if there are too few"""
+        if count <= 0 or len(self.delete_pool) < count:
+            return []
+        if self.key_distribution == "fifo":
+            return [self.delete_pool.popleft() for _ in range(count)]
+        return self.delete_pool.take(self.delete_keys, count, exclude=self.locked_ids)
+    
+    def release_ids(self, new_ids, updated_ids, undeleted_ids=()):
+        """Make ids inserted and updated by a batch available to later batches.
+
+        undeleted_ids were taken for deletes that rolled back; the rows still
+        exist, so they go back into the delete pool.
+        """
+        self.update_pool.extend(new_ids)
+        if self.key_distribution == "fifo":
+            self.delete_pool.extend(updated_ids)
+            # Back at the front, where they were taken from
+            self.delete_pool.extendleft(reversed(undeleted_ids))
+        else:
+            self.locked_ids.difference_update(updated_ids)
+            self.delete_pool.extend(undeleted_ids)
     
     def update_batch(self, batch_size):
         """Update a batch of records from the update pool"""
-        if not self.update_pool or len(self.update_pool) < batch_size:
+        ids_to_update = self.take_update_ids(batch_size)
+        if not ids_to_update:
             # Not enough records to update, return empty list
             return []
         
-        # Take records from the update pool
-        ids_to_update = [self.update_pool.popleft() for _ in range(batch_size)]
-        
-        new_data = self.generate_record()
-        id_list = ','.join(str(id[0]) for id in ids_to_update)
+        if self.update_mode == "per-row":
+            columns, rows = self.generate_update_rows(len(ids_to_update))
+            self.cur.execute(*self.build_update_rows(ids_to_update, columns, rows))
+            if self.recorder:
+                self.recorder.update_rows([id_record[0] for id_record in ids_to_update], columns, rows)
+        else:
+            update_sql, values = self.build_update(ids_to_update)
+            self.cur.execute(update_sql, values)
+            if self.recorder:
+                self.recorder.update([id_record[0] for id_record in ids_to_update], values)
         
-        # Build the SET clause based on schema type
+        # Updated records move to the delete pool once the transaction commits
+        return ids_to_update
+    
+    def update_columns(self):
+        """Columns an update sets to newly generated values, based on schema type"""
         if self.schema_type == "benchmark":
-            set_clause = ', '.join([
-                "string_field = %(string_field)s",
-                "numeric_field = %(numeric_field)s",
-                "timestamp_field = %(timestamp_field)s",
-                "json_field = %(json_field)s"
-            ] + [
-                f"extra_col_{i} = %(extra_col_{i})s" for i in range(self.num_columns)
-            ] + ["updated_at = NOW()"])
+            columns = ["string_field", "numeric_field", "timestamp_field", "json_field"] + [
+                f"extra_col_{i}" for i in range(self.num_columns)
+            ]
         elif self.schema_type == "holdings":
-            set_clause = ', '.join([
-                "shares = %(shares)s",
-                "shares_price = %(shares_price)s",
-                "status = %(status)s",
-                "updated_at = %(updated_at)s",
-                "shares_sold = %(shares_sold)s",
-                "chargeback_shares = %(chargeback_shares)s",
-                "chargeback_at = %(chargeback_at)s",
-                "present_to_user = %(present_to_user)s",
-                "fifo_complete = %(fifo_complete)s",
-                "tax_effective_date = %(tax_effective_date)s"
-            ])
+            columns = ["shares", "shares_price", "status", "updated_at", "shares_sold",
+                       "chargeback_shares", "chargeback_at", "present_to_user", "fifo_complete",
+                       "tax_effective_date"]
         elif self.schema_type == "devices":
-            set_clause = ', '.join([
-                "updated_at = %(updated_at)s",
-                "last_login_at = %(last_login_at)s",
-                "os = %(os)s",
-                "user_agent = %(user_agent)s",
-                "browser = %(browser)s",
-                "browser_version = %(browser_version)s"
-            ])
+            columns = ["updated_at", "last_login_at", "os", "user_agent", "browser", "browser_version"]
+        return columns
+    
+    def build_update(self, ids_to_update, values=None):
+        """UPDATE statement and parameters giving ids_to_update new values.
+
+        values maps each update column to its new value; by default they are
+        freshly generated.
+        """
+        if values is None:
+            new_data = self.generate_record()
+            values = {column: new_data[column] for column in self.update_columns()}
+            if self.stamp_writes:
+                values = self.stamp_values(values)
+        id_list = ','.join(str(id[0]) for id in ids_to_update)
         
-        self.cur.execute(f"""
+        # Build the SET clause from the columns being updated
+        set_clause = ', '.join(f"{column} = %({column})s" for column in values)
+        if self.schema_type == "benchmark":
+            set_clause += ", updated_at = NOW()"
+        
+        return f"""
             UPDATE {self.table_name}
             SET {set_clause}
             WHERE id IN ({id_list})
-        """, new_data)
+        """, values
+    
+    def generate_update_rows(self, count):
+        """count rows of new values for the update columns, as (columns, rows)"""
+        columns, rows = self.generate_rows(count)
+        update_columns = self.update_columns()
+        if "write_ts_us" in columns:
+            update_columns.append("write_ts_us")
+        indexes = [columns.index(column) for column in update_columns]
+        return update_columns, [tuple(row[i] for i in indexes) for row in rows]
+    
+    def build_update_rows(self, ids_to_update, columns=None, rows=None):
+        """UPDATE statement and parameters giving each of ids_to_update its own values.
+
+        The values travel as one typed array per column and are joined back
+        into rows with unnest, so the whole batch is still one statement.
+        rows holds one tuple per id in columns order; by default they are
+        freshly generated.
+        """
+        if rows is None:
+            columns, rows = self.generate_update_rows(len(ids_to_update))
+        if self.column_type_map is None:
+            self.column_type_map = column_types(self.cur, self.table_name)
         
-        # Move updated records to the delete pool
-        for id_record in ids_to_update:
-            self.delete_pool.append(id_record)
-            
-        return ids_to_update
+        arrays = ', '.join(f"%s::{self.column_type_map[column]}[]" for column in ["id", *columns])
+        set_clause = ', '.join(f"{column} = v.{column}" for column in columns)
+        if self.schema_type == "benchmark":
+            set_clause += ", updated_at = NOW()"
+        params = [[id_record[0] for id_record in ids_to_update]]
+        params.extend(list(values) for values in zip(*rows))
+        
+        return f"""
+            UPDATE {self.table_name}
+            SET {set_clause}
+            FROM unnest({arrays}) AS v(id, {', '.join(columns)})
+            WHERE {self.table_name}.id = v.id
+        """, params
     
     def delete_batch(self, batch_size):
         """Delete a batch of records from the delete pool"""
-        if not self.delete_pool or len(self.delete_pool) < batch_size:
+        ids_to_delete = self.take_delete_ids(batch_size)
+        if not ids_to_delete:
             # Not enough records to delete, return empty list
             return []
         
-        # Take records from the delete pool
-        ids_to_delete = [self.delete_pool.popleft() for _ in range(batch_size)]
+        self.cur.execute(self.build_delete_sql(ids_to_delete))
+        if self.recorder:
+            self.recorder.delete([id_record[0] for id_record in ids_to_delete])
         
+        return ids_to_delete
+    
+    def build_delete_sql(self, ids_to_delete):
+        """DELETE statement removing ids_to_delete"""
         id_list = ','.join(str(id[0]) for id in ids_to_delete)
         
-        self.cur.execute(f"""
+        return f"""
             DELETE FROM {self.table_name}
             WHERE id IN ({id_list})
-        """)
+        """
+    
+    def prepopulate(self, warmup_batches=3):
+        """Pre-populate the database with some records for updates and deletes"""
+        for _ in range(warmup_batches):
+            new_ids = self.insert_batch()
+            if self.key_distribution != "fifo":
+                self.update_pool.extend(new_ids)
+                continue
+            # Add half to update pool, half to delete pool for initial operations
+            half_point = len(new_ids) // 2
+            for i, id_record in enumerate(new_ids):
+                if i < half_point:
+                    self.update_pool.append(id_record)
+                else:
+                    self.delete_pool.append(id_record)
+        self.conn.commit()
+        if self.recorder:
+            self.recorder.commit()
+
+    def open_sessions(self):
+        """The main connection plus sessions - 1 more, each with its own transaction"""
+        self.sessions = [WriteSession(self.conn, self.cur)] + [
+            WriteSession(psycopg2.connect(**self.db_params)) for _ in range(self.session_count - 1)
+        ]
+    
+    def close_sessions(self):
+        """Commit the transactions still open and close the extra connections"""
+        if self.sessions is None:
+            return
+        try:
+            for session in self.sessions:
+                self.commit_session(session)
+        except Exception as e:
+            print(f"Error committing open transactions: {e}")
+        for session in self.sessions[1:]:
+            session.conn.close()
+        self.sessions = None
+    
+    def transaction_full(self, session):
+        return ((self.rows_per_txn and session.rows >= self.rows_per_txn) or
+                (self.statements_per_txn and session.statements >= self.statements_per_txn))
+    
+    def commit_session(self, session):
+        """Commit a session's transaction and release the ids it inserted and updated"""
+        session.conn.commit()
+        if self.recorder:
+            self.recorder.commit()
+        self.release_ids(session.new_ids, session.updated_ids)
+        if session.statements:
+            self.txn_sizes[session.rows] += 1
+            self.txn_statements += session.statements
+            self.unreported_txn_sizes.append(session.rows)
+        session.reset()
+    
+    def run_statements(self, session, count, statement, pending=None):
+        """Run statement(n) until count rows are done, committing whenever the transaction fills up.
+
+        Ids returned by each statement are added to pending, to be released
+        when the transaction commits.
+        """
+        done_ids = []
+        remaining = count
+        while remaining > 0:
+            n = remaining
+            if self.rows_per_txn:
+                n = min(n, self.rows_per_txn - session.rows)
+            ids = statement(n)
+            if not ids:
+                # Not enough records in the pool
+                break
+            remaining -= n
+            done_ids.extend(ids)
+            if pending is not None:
+                pending.extend(ids)
+            session.rows += len(ids)
+            session.statements += 1
+            if self.transaction_full(session):
+                self.commit_session(session)
+        return done_ids
+    
+    def run_batch(self):
+        """Insert, update and delete one batch on the next session.
+
+        Without rows_per_txn or statements_per_txn the batch is a single
+        transaction. With them, the session's transaction commits whenever it
+        reaches a limit, which may be partway through this batch or many
+        batches later.
+        """
+        if self.sessions is None:
+            self.open_sessions()
+        session = self.sessions[self.next_session]
+        self.next_session = (self.next_session + 1) % len(self.sessions)
+        insert_count, update_count, delete_count = self.next_batch_counts()
         
-        return ids_to_delete
+        # Statements go through self.cur, so point it at this session's connection
+        self.cur = session.cur
+        try:
+            new_ids = self.run_statements(session, insert_count, self.insert_batch, session.new_ids)
+            updated_ids = self.run_statements(session, update_count, self.update_batch, session.updated_ids)
+            deleted_ids = self.run_statements(session, delete_count, self.delete_batch)
+            if not (self.rows_per_txn or self.statements_per_txn):
+                self.commit_session(session)
+        finally:
+            self.cur = self.sessions[0].cur
+        return len(new_ids), len(updated_ids), len(deleted_ids)
     
-    def run(self, duration_seconds=60):
+    def take_txn_report(self):
+        """Sizes of the transactions committed since the last call"""
+        sizes = self.unreported_txn_sizes
+        self.unreported_txn_sizes = []
+        return sizes
+
+    def print_status(self, progress, inserts, updates, deletes, update_pool_size, delete_pool_size,
+                     batch_elapsed, total_operations, total_bytes, overall_elapsed, workers=1,
+                     target_rate=None, lags=None, transactions=None):
+        """Redraw the progress bar and throughput metrics in place"""
+        batch_operations = inserts + updates + deletes
+        batch_bytes = batch_operations * self.target_bytes
+        
+        # Calculate throughput metrics
+        batch_throughput = batch_operations / batch_elapsed if batch_elapsed > 0 else 0
+        overall_throughput = total_operations / overall_elapsed if overall_elapsed > 0 else 0
+        
+        # Calculate data throughput
+        batch_data_throughput = batch_bytes / batch_elapsed if batch_elapsed > 0 else 0
+        overall_data_throughput = total_bytes / overall_elapsed if overall_elapsed > 0 else 0
+        
+        # Calculate progress
+        bar_width = 30
+        filled = int(bar_width * min(progress, 1.0))
+        bar = '█' * filled + '░' * (bar_width - filled)
+        percentage = progress * 100
+        
+        # Update status with progress bar and throughput metrics
+        status = (
+            f"\r[{bar}] {percentage:0.1f}%" + (f" | Workers: {workers}" if workers > 1 else "") + "\n"
+            f"Batch: {inserts}i/{updates}u/{deletes}d | "
+            f"Pools: {update_pool_size}u/{delete_pool_size}d | "
+            f"Batch time: {batch_elapsed:.2f}s | "
+            f"Batch throughput: {batch_throughput:.2f} ops/s | "
+            f"Data: {format_data_rate(batch_data_throughput)}\n"
+            f"Total operations: {total_operations} | "
+            f"Overall throughput: {overall_throughput:.2f} ops/s | "
+            f"Avg Data: {format_data_rate(overall_data_throughput)}"
+        )
+        if transactions is not None:
+            tps = transactions / overall_elapsed if overall_elapsed > 0 else 0
+            status += f" | Transactions: {transactions} ({tps:.2f} TPS)"
+        if target_rate is not None:
+            lag_p50, lag_p99, lag_max = lag_summary(lags)
+            status += (
+                f"\nTarget: {target_rate:.2f} ops/s | "
+                f"Schedule lag p50: {lag_p50:.1f}ms p99: {lag_p99:.1f}ms max: {lag_max:.1f}ms"
+            )
+        # Move the cursor back up to the progress bar line
+        print(f"{status}\033[{status.count(chr(10))}A", end='', flush=True)
+
+    def record_batch_metrics(self, inserts, updates, deletes, batch_elapsed, update_pool_size, delete_pool_size):
+        """Export one batch's operations by type, its duration and the pool sizes"""
+        if self.metrics is None:
+            return
+        self.metrics.increment('generator_operations', inserts, op='insert')
+        self.metrics.increment('generator_operations', updates, op='update')
+        self.metrics.increment('generator_operations', deletes, op='delete')
+        self.metrics.observe('generator_batch_duration_seconds', batch_elapsed, DURATION_BUCKETS_S)
+        self.metrics.gauge('generator_update_pool_size', update_pool_size)
+        self.metrics.gauge('generator_delete_pool_size', delete_pool_size)
+        self.metrics.maybe_flush()
+
+    def print_final_stats(self, total_operations, total_bytes, total_elapsed,
+                          update_pool_size, delete_pool_size, workers=1, lags=None, txn_sizes=None):
+        """Print the summary shown when the run ends"""
+        final_throughput = total_operations / total_elapsed if total_elapsed > 0 else 0
+        final_data_throughput = total_bytes / total_elapsed if total_elapsed > 0 else 0
+        print(f"\nFinal Statistics:")
+        print(f"Schema type: {self.schema_type}")
+        if workers > 1:
+            print(f"Workers: {workers}")
+        print(f"Total operations: {total_operations}")
+        print(f"Total data processed: {total_bytes/1_000_000:.2f} MB")
+        print(f"Total time: {total_elapsed:.2f}s")
+        print(f"Average throughput: {final_throughput:.2f} ops/s")
+        print(f"Average data throughput: {format_data_rate(final_data_throughput)}")
+        print(f"Remaining in pools: {update_pool_size} updates, {delete_pool_size} deletes")
+        if txn_sizes:
+            transactions = sum(txn_sizes.values())
+            mean, p50, p99, largest = txn_size_summary(txn_sizes)
+            print(f"Transactions: {transactions} | Average TPS: {transactions / total_elapsed:.2f}"
+                  if total_elapsed > 0 else f"Transactions: {transactions}")
+            print(f"Rows per transaction: mean {mean:.1f} | p50 {p50} | p99 {p99} | max {largest}")
+        if self.rate_schedule is not None:
+            lag_p50, lag_p99, lag_max = lag_summary(lags)
+            print(f"Rate profile: {self.rate_schedule.profile} (target {self.rate_schedule.target_ops_per_sec:.2f} ops/s)")
+            print(f"Schedule lag: p50 {lag_p50:.1f}ms | p99 {lag_p99:.1f}ms | max {lag_max:.1f}ms")
+        if self.wal_sampler is not None:
+            # Total data processed above assumes --byte-size per operation; this is what Postgres wrote
+            self.wal_sampler.print_summary(total_operations)
+
+    def start_wal_sampler(self):
+        if self.wal_sample_file:
+            self.wal_sampler = ReplicationLagSampler(self.db_params, output_file=self.wal_sample_file,
+                                                     interval=self.wal_sample_interval)
+            self.wal_sampler.start()
+
+    def stop_wal_sampler(self):
+        if self.wal_sampler is not None:
+            self.wal_sampler.stop()
+
+    def worker_kwargs(self):
+        """Constructor arguments for a worker process generating the same workload"""
+        return {
+            "batch_size": self.batch_size,
+            "interval": self.interval,
+            "table_name": self.table_name,
+            "target_bytes": self.target_bytes,
+            "num_columns": self.num_columns,
+            "schema_type": self.schema_type,
+            "insert_method": self.insert_method,
+            "copy_format": self.copy_format,
+            "rate_schedule": self.rate_schedule,
+            "generator": self.generator,
+            "stamp_writes": self.stamp_writes,
+            "seed": self.seed,
+            "key_distribution": self.key_distribution,
+            "delete_distribution": self.delete_distribution,
+            "zipf_s": self.zipf_s,
+            "hotspot_fraction": self.hotspot_fraction,
+            "hotspot_probability": self.hotspot_probability,
+            "mix": self.mix,
+            "update_mode": self.update_mode,
+            "rows_per_txn": self.rows_per_txn,
+            "statements_per_txn": self.statements_per_txn,
+            "sessions": self.session_count,
+            **self.db_params
+        }
+
+    def run(self, duration_seconds=60, workers=1):
         """Run the workload for a specified duration"""
+        if workers > 1:
+            return self.run_workers(duration_seconds, workers)
+        if self.writer == "async":
+            return self.run_async(duration_seconds)
+        scheduler = None
+        start_time = time.time()
+        total_operations = 0
+        total_bytes = 0
         try:
             self.setup_table()
             start_time = time.time()
-            total_operations = 0
-            total_bytes = 0
             batch_start_time = time.time()
             
             print("\033[2J\033[H")  # Clear screen and move cursor to top
             print(f"Running workload generator for schema: {self.schema_type}...\n")
             
-            # Pre-populate the database with some records for updates and deletes
-            warmup_batches = 3  # Number of batches to pre-populate
-            for _ in range(warmup_batches):
-                new_ids = self.insert_batch()
-                # Add half to update pool, half to delete pool for initial operations
-                half_point = len(new_ids) // 2
-                for i, id_record in enumerate(new_ids):
-                    if i < half_point:
-                        self.update_pool.append(id_record)
-                    else:
-                        self.delete_pool.append(id_record)
-            self.conn.commit()
+            self.prepopulate()
+            self.start_wal_sampler()
+            
+            if self.rate_schedule is not None:
+                scheduler = OpenLoopScheduler(self.rate_schedule)
+                scheduler.start()
             
             while time.time() - start_time < duration_seconds:
-                # Insert new records
-                new_ids = self.insert_batch()
-                
-                # Add new records to the update pool for future updates
-                for id_record in new_ids:
-                    self.update_pool.append(id_record)
-                
-                # Update records from the update pool
-                updated_ids = self.update_batch(self.batch_size)
-                
-                # Delete records from the delete pool
-                deleted_ids = self.delete_batch(self.batch_size)
-                
-                self.conn.commit()
+                if scheduler:
+                    scheduler.wait()
+                inserts, updates, deletes = self.run_batch()
                 
                 # Calculate operations and data volumes
-                inserts = len(new_ids)
-                updates = len(updated_ids)
-                deletes = len(deleted_ids)
                 batch_operations = inserts + updates + deletes
-                batch_bytes = (inserts + updates + deletes) * self.target_bytes
-                
                 total_operations += batch_operations
-                total_bytes += batch_bytes
+                total_bytes += batch_operations * self.target_bytes
                 
                 # Calculate elapsed time and throughput
                 current_time = time.time()
-                batch_elapsed = current_time - batch_start_time
-                overall_elapsed = current_time - start_time
-                
-                # Calculate throughput metrics
-                batch_throughput = batch_operations / batch_elapsed if batch_elapsed > 0 else 0
-                overall_throughput = total_operations / overall_elapsed if overall_elapsed > 0 else 0
+                self.record_batch_metrics(inserts, updates, deletes, current_time - batch_start_time,
+                                          len(self.update_pool), len(self.delete_pool))
+                self.print_status(
+                    progress=(current_time - start_time) / duration_seconds,
+                    inserts=inserts, updates=updates, deletes=deletes,
+                    update_pool_size=len(self.update_pool),
+                    delete_pool_size=len(self.delete_pool),
+                    batch_elapsed=current_time - batch_start_time,
+                    total_operations=total_operations,
+                    total_bytes=total_bytes,
+                    overall_elapsed=current_time - start_time,
+                    target_rate=scheduler.current_rate() if scheduler else None,
+                    lags=scheduler.lags[-1000:] if scheduler else None,
+                    transactions=sum(self.txn_sizes.values())
+                )
                 
-                # Calculate data throughput
-                batch_data_throughput = batch_bytes / batch_elapsed if batch_elapsed > 0 else 0
-                overall_data_throughput = total_bytes / overall_elapsed if overall_elapsed > 0 else 0
+                batch_start_time = time.time()
+                if scheduler:
+                    scheduler.advance(batch_operations)
+                else:
+                    time.sleep(self.interval)
                 
-                # Calculate progress
-                progress = (current_time - start_time) / duration_seconds
-                bar_width = 30
-                filled = int(bar_width * progress)
-                bar = '█' * filled + '░' * (bar_width - filled)
-                percentage = progress * 100
+        except KeyboardInterrupt:
+            print("\n\nStopping workload generator...")
+        except Exception as e:
+            print(f"\n\nError: {e}")
+        finally:
+            print("\n")
+            self.close_sessions()
+            self.stop_wal_sampler()
+            end_time = time.time()
+            self.print_final_stats(
+                total_operations, total_bytes, end_time - start_time,
+                len(self.update_pool), len(self.delete_pool),
+                lags=scheduler.lags if scheduler else None,
+                txn_sizes=self.txn_sizes
+            )
+            if self.recorder:
+                self.recorder.close()
+                print(f"Recorded {self.recorder.frames} operations")
+            self.conn.close()
+
+    def replay(self, log_path, speed=1.0):
+        """Re-issue a workload recorded with record_path against the table.
+
+        speed scales the recorded timing: 1.0 is real time, 2.0 twice as fast,
+        and None issues operations back to back. Inserts reuse the recorded
+        ids, so replayed updates and deletes hit the same rows. A recording
+        made with stamp_writes gets fresh stamps at replay time.
+        """
+        reader = workload_log.WorkloadLogReader(log_path)
+        header = reader.header
+        # The recorded schema decides the columns; the table name may differ
+        self.schema_type = header["schema_type"]
+        self.num_columns = header["num_columns"]
+        self.target_bytes = header["target_bytes"]
+        self.stamp_writes = self.stamp_writes or header.get("stamp_writes", False)
+        
+        start_time = time.time()
+        total_operations = 0
+        total_bytes = 0
+        inserts = updates = deletes = 0
+        try:
+            self.setup_table()
+            
+            print("\033[2J\033[H")  # Clear screen and move cursor to top
+            print(f"Replaying {log_path} ({self.schema_type}) at "
+                  + (f"{speed:g}x speed" if speed else "max speed") + "...\n")
+            self.start_wal_sampler()
+            
+            start_time = time.time()
+            batch_start_time = time.time()
+            for op, relative_time, payload in reader:
+                if speed:
+                    delay = start_time + relative_time / speed - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
                 
-                # Update status with progress bar and throughput metrics
-                status = (
-                    f"\r[{bar}] {percentage:0.1f}%\n"
-                    f"Batch: {inserts}i/{updates}u/{deletes}d | "
-                    f"Pools: {len(self.update_pool)}u/{len(self.delete_pool)}d | "
-                    f"Batch time: {batch_elapsed:.2f}s | "
-                    f"Batch throughput: {batch_throughput:.2f} ops/s | "
-                    f"Data: {format_data_rate(batch_data_throughput)}\n"
-                    f"Total operations: {total_operations} | "
-                    f"Overall throughput: {overall_throughput:.2f} ops/s | "
-                    f"Avg Data: {format_data_rate(overall_data_throughput)}"
+                if op == workload_log.INSERT:
+                    columns, rows, ids = payload
+                    if self.stamp_writes:
+                        columns, rows = self.stamp_rows(columns, rows)
+                    self.insert_rows_with_ids(ids, columns, rows)
+                    inserts += len(ids)
+                elif op == workload_log.UPDATE:
+                    ids, values = payload
+                    if self.stamp_writes:
+                        values = self.stamp_values(values)
+                    self.cur.execute(*self.build_update([(row_id,) for row_id in ids], values))
+                    updates += len(ids)
+                elif op == workload_log.UPDATE_ROWS:
+                    ids, columns, rows = payload
+                    if self.stamp_writes:
+                        columns, rows = self.stamp_rows(columns, rows)
+                    self.cur.execute(*self.build_update_rows([(row_id,) for row_id in ids], columns, rows))
+                    updates += len(ids)
+                elif op == workload_log.DELETE:
+                    self.cur.execute(self.build_delete_sql([(row_id,) for row_id in payload]))
+                    deletes += len(payload)
+                elif op == workload_log.COMMIT:
+                    self.conn.commit()
+                    batch_operations = inserts + updates + deletes
+                    total_operations += batch_operations
+                    total_bytes += batch_operations * self.target_bytes
+                    
+                    current_time = time.time()
+                    self.record_batch_metrics(inserts, updates, deletes, current_time - batch_start_time, 0, 0)
+                    self.print_status(
+                        progress=reader.progress(),
+                        inserts=inserts, updates=updates, deletes=deletes,
+                        update_pool_size=0, delete_pool_size=0,
+                        batch_elapsed=current_time - batch_start_time,
+                        total_operations=total_operations,
+                        total_bytes=total_bytes,
+                        overall_elapsed=current_time - start_time
+                    )
+                    inserts = updates = deletes = 0
+                    batch_start_time = time.time()
+            
+            # Rows were inserted under their recorded ids, so move the sequence past them
+            self.cur.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), (SELECT MAX(id) FROM {self.table_name}))",
+                (self.table_name,)
+            )
+            self.conn.commit()
+            
+        except KeyboardInterrupt:
+            print("\n\nStopping replay...")
+        except Exception as e:
+            print(f"\n\nError: {e}")
+        finally:
+            print("\n")
+            self.stop_wal_sampler()
+            self.print_final_stats(total_operations, total_bytes, time.time() - start_time, 0, 0)
+            reader.close()
+            self.conn.close()
+
+    def run_async(self, duration_seconds):
+        """Run the workload through the pipelined asyncio writer"""
+        # psycopg 3 is only needed for the async writer
+        from async_writer import AsyncBatchWriter
+        
+        scheduler = OpenLoopScheduler(self.rate_schedule) if self.rate_schedule is not None else None
+        totals = {"operations": 0, "bytes": 0, "last_print": 0.0}
+        start_time = time.time()
+        
+        def on_batch(inserts, updates, deletes, batch_elapsed):
+            batch_operations = inserts + updates + deletes
+            totals["operations"] += batch_operations
+            totals["bytes"] += batch_operations * self.target_bytes
+            # Every async batch is one transaction
+            self.txn_sizes[batch_operations] += 1
+            self.record_batch_metrics(inserts, updates, deletes, batch_elapsed,
+                                      len(self.update_pool), len(self.delete_pool))
+            current_time = time.time()
+            # Batches complete concurrently, so throttle redraws
+            if current_time - totals["last_print"] < 0.1:
+                return
+            totals["last_print"] = current_time
+            self.print_status(
+                progress=(current_time - start_time) / duration_seconds,
+                inserts=inserts, updates=updates, deletes=deletes,
+                update_pool_size=len(self.update_pool),
+                delete_pool_size=len(self.delete_pool),
+                batch_elapsed=batch_elapsed,
+                total_operations=totals["operations"],
+                total_bytes=totals["bytes"],
+                overall_elapsed=current_time - start_time,
+                target_rate=scheduler.current_rate() if scheduler else None,
+                lags=scheduler.lags[-1000:] if scheduler else None,
+                transactions=sum(self.txn_sizes.values())
+            )
+        
+        try:
+            self.setup_table()
+            
+            print("\033[2J\033[H")  # Clear screen and move cursor to top
+            print(f"Running workload generator for schema: {self.schema_type} "
+                  f"({self.async_connections} async connections, {self.commit_ordering} commit ordering)...\n")
+            
+            self.prepopulate()
+            self.start_wal_sampler()
+            start_time = time.time()
+            writer = AsyncBatchWriter(self, connections=self.async_connections,
+                                      commit_ordering=self.commit_ordering)
+            asyncio.run(writer.run(duration_seconds, on_batch, scheduler=scheduler))
+            
+        except KeyboardInterrupt:
+            print("\n\nStopping workload generator...")
+        except Exception as e:
+            print(f"\n\nError: {e}")
+        finally:
+            print("\n")
+            self.stop_wal_sampler()
+            end_time = time.time()
+            self.print_final_stats(
+                totals["operations"], totals["bytes"], end_time - start_time,
+                len(self.update_pool), len(self.delete_pool),
+                lags=scheduler.lags if scheduler else None,
+                txn_sizes=self.txn_sizes
+            )
+            self.conn.close()
+
+    def run_worker(self, worker_id, duration_seconds, stats_queue):
+        """Run the workload loop as one worker of a multi-process run.
+
+        The worker only ever updates and deletes ids it inserted itself, so its
+        pools form a disjoint id-range shard. Each batch is reported to the
+        parent through stats_queue.
+        """
+        try:
+            self.prepopulate()
+            scheduler = None
+            if self.rate_schedule is not None:
+                scheduler = OpenLoopScheduler(self.rate_schedule)
+                scheduler.start()
+            start_time = time.time()
+            while time.time() - start_time < duration_seconds:
+                lag = scheduler.wait() if scheduler else None
+                batch_start_time = time.time()
+                inserts, updates, deletes = self.run_batch()
+                stats_queue.put(('batch', worker_id, inserts, updates, deletes,
+                                 time.time() - batch_start_time,
+                                 len(self.update_pool), len(self.delete_pool), lag,
+                                 self.take_txn_report()))
+                if scheduler:
+                    scheduler.advance(inserts + updates + deletes)
+                else:
+                    time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            stats_queue.put(('error', worker_id, str(e)))
+        finally:
+            self.close_sessions()
+            stats_queue.put(('done', worker_id, len(self.update_pool), len(self.delete_pool),
+                             self.take_txn_report()))
+            self.conn.close()
+
+    def run_workers(self, duration_seconds, workers):
+        """Run the workload across several worker processes and aggregate their throughput"""
+        ctx = multiprocessing.get_context('spawn')
+        stats_queue = ctx.Queue()
+        processes = []
+        start_time = time.time()
+        total_operations = 0
+        total_bytes = 0
+        # Latest pool sizes reported by each worker
+        pool_sizes = {}
+        # Schedule lags reported by all workers in open-loop mode
+        lags = []
+        worker_kwargs = self.worker_kwargs()
+        if self.rate_schedule is not None:
+            # Each worker offers an equal share of the target rate
+            worker_kwargs["rate_schedule"] = self.rate_schedule.scaled(1 / workers)
+        try:
+            self.setup_table()
+            
+            print("\033[2J\033[H")  # Clear screen and move cursor to top
+            print(f"Running workload generator for schema: {self.schema_type} with {workers} workers...\n")
+            self.start_wal_sampler()
+            
+            for worker_id in range(workers):
+                process = ctx.Process(
+                    target=run_worker_process,
+                    args=(worker_id, worker_kwargs, duration_seconds, stats_queue)
                 )
-                print(f"{status}\033[2A", end='', flush=True)
+                process.start()
+                processes.append(process)
+            
+            start_time = time.time()
+            window_start = start_time
+            window_counts = [0, 0, 0]
+            running = set(range(workers))
+            
+            while running:
+                try:
+                    message = stats_queue.get(timeout=0.5)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processes):
+                        break
+                    message = None
                 
-                batch_start_time = time.time()
-                time.sleep(self.interval)
+                if message is not None:
+                    kind, worker_id = message[0], message[1]
+                    if kind == 'batch':
+                        (inserts, updates, deletes, batch_elapsed, update_pool_size, delete_pool_size,
+                         lag, txn_sizes) = message[2:]
+                        self.txn_sizes.update(txn_sizes)
+                        if lag is not None:
+                            lags.append(lag)
+                        window_counts[0] += inserts
+                        window_counts[1] += updates
+                        window_counts[2] += deletes
+                        batch_operations = inserts + updates + deletes
+                        total_operations += batch_operations
+                        total_bytes += batch_operations * self.target_bytes
+                        pool_sizes[worker_id] = (update_pool_size, delete_pool_size)
+                        self.record_batch_metrics(inserts, updates, deletes, batch_elapsed,
+                                                  sum(u for u, _ in pool_sizes.values()),
+                                                  sum(d for _, d in pool_sizes.values()))
+                    elif kind == 'error':
+                        print(f"\n\nWorker {worker_id} error: {message[2]}")
+                    elif kind == 'done':
+                        pool_sizes[worker_id] = message[2:4]
+                        self.txn_sizes.update(message[4])
+                        running.discard(worker_id)
                 
+                # Redraw the aggregated status at most once per second
+                current_time = time.time()
+                if current_time - window_start >= 1.0:
+                    self.print_status(
+                        progress=(current_time - start_time) / duration_seconds,
+                        inserts=window_counts[0], updates=window_counts[1], deletes=window_counts[2],
+                        update_pool_size=sum(u for u, _ in pool_sizes.values()),
+                        delete_pool_size=sum(d for _, d in pool_sizes.values()),
+                        batch_elapsed=current_time - window_start,
+                        total_operations=total_operations,
+                        total_bytes=total_bytes,
+                        overall_elapsed=current_time - start_time,
+                        workers=workers,
+                        target_rate=(self.rate_schedule.rate_at(current_time - start_time)
+                                     if self.rate_schedule else None),
+                        lags=lags[-1000:],
+                        transactions=sum(self.txn_sizes.values())
+                    )
+                    window_start = current_time
+                    window_counts = [0, 0, 0]
+                    
         except KeyboardInterrupt:
             print("\n\nStopping workload generator...")
         except Exception as e:
             print(f"\n\nError: {e}")
         finally:
+            # Pick up any reports sent after the display loop stopped. Read them before
+            # joining: a worker doesn't exit until its queued reports have been read
+            deadline = time.time() + 30
+            while time.time() < deadline:
+                try:
+                    message = stats_queue.get(timeout=0.2)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processes):
+                        break
+                    continue
+                except KeyboardInterrupt:
+                    break
+                if message[0] == 'batch':
+                    batch_operations = sum(message[2:5])
+                    total_operations += batch_operations
+                    total_bytes += batch_operations * self.target_bytes
+                    pool_sizes[message[1]] = tuple(message[6:8])
+                    if message[8] is not None:
+                        lags.append(message[8])
+                    self.txn_sizes.update(message[9])
+                elif message[0] == 'done':
+                    pool_sizes[message[1]] = tuple(message[2:4])
+                    self.txn_sizes.update(message[4])
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
             print("\n")
+            self.stop_wal_sampler()
             end_time = time.time()
-            total_elapsed = end_time - start_time
-            final_throughput = total_operations / total_elapsed if total_elapsed > 0 else 0
-            final_data_throughput = total_bytes / total_elapsed if total_elapsed > 0 else 0
-            print(f"\nFinal Statistics:")
-            print(f"Schema type: {self.schema_type}")
-            print(f"Total operations: {total_operations}")
-            print(f"Total data processed: {total_bytes/1_000_000:.2f} MB")
-            print(f"Total time: {total_elapsed:.2f}s")
-            print(f"Average throughput: {final_throughput:.2f} ops/s")
-            print(f"Average data throughput: {format_data_rate(final_data_throughput)}")
-            print(f"Remaining in pools: {len(self.update_pool)} updates, {len(self.delete_pool)} deletes")
+            self.print_final_stats(
+                total_operations, total_bytes, end_time - start_time,
+                sum(u for u, _ in pool_sizes.values()),
+                sum(d for _, d in pool_sizes.values()),
+                workers=workers,
+                lags=lags,
+                txn_sizes=self.txn_sizes
+            )
             self.conn.close()
 
+def parse_replay_speed(value):
+    """--replay-speed: a multiple of the recorded pace, or 'max' (None) for no pacing"""
+    if value == 'max':
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("replay speed must be positive or 'max'")
+    return speed
+
+def parse_mix(value):
+    """--mix: relative insert:update:delete counts per batch, e.g. 1:1:1 or 2:8:1"""
+    try:
+        mix = tuple(float(part) for part in value.split(':'))
+    except ValueError:
+        mix = ()
+    if len(mix) != 3 or min(mix) < 0 or max(mix) <= 0:
+        raise argparse.ArgumentTypeError("mix must be three non-negative numbers, e.g. 1:1:1")
+    return mix
+
+def run_worker_process(worker_id, generator_kwargs, duration_seconds, stats_queue):
+    """Entry point for a workload worker process; opens its own connection"""
+    if generator_kwargs.get("seed") is not None:
+        # Same seed in every worker would issue the same rows N times
+        generator_kwargs = {**generator_kwargs, "seed": generator_kwargs["seed"] + worker_id}
+    generator = WorkloadGenerator(**generator_kwargs)
+    generator.run_worker(worker_id, duration_seconds, stats_queue)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Generate database workload')
     parser.add_argument('--batch-size', type=int, default=100,
@@ -519,8 +1855,123 @@ if __name__ == "__main__":
                       help='Number of additional columns (default: 1)')
     parser.add_argument('--schema-type', type=str, choices=['benchmark', 'holdings', 'devices'], default='benchmark',
                       help='Schema type to use (default: benchmark)')
+    parser.add_argument('--insert-method', type=str, choices=['values', 'copy'], default='values',
+                      help='Insert with a multi-row INSERT ... VALUES or with COPY FROM STDIN (default: values)')
+    parser.add_argument('--copy-format', type=str, choices=['text', 'binary'], default='text',
+                      help='COPY format used by --insert-method copy (default: text)')
+    parser.add_argument('--generator', type=str, choices=['python', 'numpy'], default='python',
+                      help='Generate insert batches row by row or column by column with NumPy (default: python)')
+    parser.add_argument('--target-ops-per-sec', type=float, default=None,
+                      help='Open-loop mode: issue batches on a fixed schedule at this rate instead of sleeping --interval')
+    parser.add_argument('--rate-profile', type=str, choices=list(RateSchedule.PROFILES), default='constant',
+                      help='Shape of the offered load in open-loop mode (default: constant)')
+    parser.add_argument('--rate-start', type=float, default=None,
+                      help='Starting rate for the step and linear profiles (default: 10%% of target)')
+    parser.add_argument('--rate-step', type=float, default=None,
+                      help='Rate increase per step for the step profile (default: 10%% of target)')
+    parser.add_argument('--rate-step-seconds', type=float, default=10.0,
+                      help='Seconds between steps for the step profile (default: 10)')
+    parser.add_argument('--rate-ramp-seconds', type=float, default=None,
+                      help='Ramp duration for the linear profile (default: --duration)')
+    parser.add_argument('--rate-amplitude', type=float, default=None,
+                      help='Amplitude for the sine profile (default: 50%% of target)')
+    parser.add_argument('--rate-period', type=float, default=60.0,
+                      help='Period in seconds for the sine profile (default: 60)')
+    parser.add_argument('--writer', type=str, choices=['sync', 'async'], default='sync',
+                      help='Write over one synchronous psycopg2 connection or pipeline batches over '
+                           'several psycopg 3 connections (default: sync)')
+    parser.add_argument('--async-connections', type=int, default=4,
+                      help='Connections, and so batches in flight, for --writer async (default: 4)')
+    parser.add_argument('--commit-ordering', type=str, choices=['strict', 'independent'], default='strict',
+                      help='With --writer async, commit batches in generation order or independently per '
+                           'connection (default: strict)')
+    parser.add_argument('--workers', type=int, default=1,
+                      help='Number of worker processes, each with its own connection (default: 1)')
+    parser.add_argument('--seed', type=int, default=None,
+                      help='Seed the random generators so runs issue the same operations (default: unseeded)')
+    parser.add_argument('--record', type=str, default=None,
+                      help='Record every write to this binary log for --replay')
+    parser.add_argument('--replay', type=str, default=None,
+                      help='Re-issue the operations in a log written by --record instead of generating them')
+    parser.add_argument('--replay-speed', type=parse_replay_speed, default=1.0,
+                      help='Replay timing: 1 for the recorded pace, N for N times faster, or max (default: 1)')
+    parser.add_argument('--stamp-writes', action='store_true',
+                      help='Stamp inserted and updated rows with their write time for end-to-end latency '
+                           '(json_field for the benchmark schema, a write_ts_us column otherwise)')
+    parser.add_argument('--update-mode', type=str, choices=['shared', 'per-row'], default='shared',
+                      help='Give every updated row in a batch the same new values, or each row its own, applied '
+                           'in one UPDATE ... FROM unnest(...) (default: shared)')
+    parser.add_argument('--rows-per-txn', type=int, default=None,
+                      help='Commit each transaction once it holds this many rows, splitting or spanning batches '
+                           'as needed, e.g. 1 for single-row transactions or 2000000 for one huge one '
+                           '(default: one transaction per batch)')
+    parser.add_argument('--statements-per-txn', type=int, default=None,
+                      help='Commit each transaction after this many INSERT/UPDATE/DELETE statements '
+                           '(default: one transaction per batch)')
+    parser.add_argument('--sessions', type=int, default=1,
+                      help='Connections per process taking turns at batches, each with its own open '
+                           'transaction, so transactions interleave in the WAL; sessions never run in '
+                           'parallel, use --workers for concurrency. Needs --rows-per-txn or '
+                           '--statements-per-txn to keep transactions open across turns (default: 1)')
+    parser.add_argument('--mix', type=parse_mix, default=(1, 1, 1),
+                      help='Relative insert:update:delete counts per batch; the largest gets --batch-size '
+                           '(default: 1:1:1)')
+    parser.add_argument('--key-distribution', type=str, choices=['fifo', *KeyDistribution.NAMES], default='fifo',
+                      help='Rows picked for updates: fifo updates each row once, oldest first, then deletes it; '
+                           'the others keep rows live for repeated updates (default: fifo)')
+    parser.add_argument('--delete-distribution', type=str, choices=list(KeyDistribution.NAMES), default='uniform',
+                      help='Rows picked for deletes when --key-distribution is not fifo (default: uniform)')
+    parser.add_argument('--zipf-s', type=float, default=0.99,
+                      help='Skew of the zipf and latest distributions (default: 0.99)')
+    parser.add_argument('--hotspot-fraction', type=float, default=0.2,
+                      help='Fraction of live rows in the hot set of the hotspot distribution (default: 0.2)')
+    parser.add_argument('--hotspot-probability', type=float, default=0.8,
+                      help='Fraction of hotspot accesses that go to the hot set (default: 0.8)')
+    parser.add_argument('--wal-sample-file', type=str, default=None,
+                      help='Sample WAL bytes/s and every replication slot\'s lag into this CSV while the '
+                           'workload runs (see wal_sampler.py; default: off)')
+    parser.add_argument('--wal-sample-interval', type=float, default=1.0,
+                      help='Seconds between WAL and replication slot samples (default: 1.0)')
+    parser.add_argument('--metrics', type=parse_metrics_target, default=None,
+                      help='Export ops by type, batch durations and pool sizes live: prometheus:PORT serves '
+                           '/metrics, statsd:HOST:PORT sends to a DogStatsD agent (default: off)')
+    parser.add_argument('--metrics-tags', type=parse_tags, default={},
+                      help='key:value,... added to every exported metric, e.g. run:sequin')
     
     args = parser.parse_args()
+    if args.writer == 'async' and args.workers > 1:
+        parser.error('--writer async runs in one process; use --async-connections instead of --workers')
+    if args.writer == 'async' and args.insert_method == 'copy':
+        parser.error('--writer async inserts with INSERT ... VALUES; COPY cannot run in pipeline mode')
+    if args.record and (args.writer == 'async' or args.workers > 1):
+        parser.error('--record needs the single-process synchronous writer')
+    if args.writer == 'async' and (args.rows_per_txn or args.statements_per_txn or args.sessions > 1):
+        parser.error('--writer async commits one transaction per batch; --rows-per-txn, '
+                     '--statements-per-txn and --sessions need the synchronous writer')
+    if args.sessions > 1 and not (args.rows_per_txn or args.statements_per_txn):
+        parser.error('--sessions only interleaves transactions that stay open across batches; '
+                     'add --rows-per-txn or --statements-per-txn')
+    if args.record and args.sessions > 1:
+        parser.error('--record replays on one connection, so it needs --sessions 1')
+    if args.record and args.replay:
+        parser.error('--record and --replay are mutually exclusive')
+    
+    rate_schedule = None
+    if args.target_ops_per_sec:
+        rate_schedule = RateSchedule(
+            args.target_ops_per_sec,
+            profile=args.rate_profile,
+            start_ops_per_sec=args.rate_start,
+            step_ops_per_sec=args.rate_step,
+            step_seconds=args.rate_step_seconds,
+            ramp_seconds=args.rate_ramp_seconds if args.rate_ramp_seconds is not None else args.duration,
+            amplitude_ops_per_sec=args.rate_amplitude,
+            period_seconds=args.rate_period
+        )
+    
+    metrics = None
+    if args.metrics:
+        metrics = create_metrics(args.metrics, tags={'schema': args.schema_type, **args.metrics_tags})
     
     generator = WorkloadGenerator(
         batch_size=args.batch_size,
@@ -533,6 +1984,32 @@ if __name__ == "__main__":
         port=args.port,
         target_bytes=args.byte_size,
         num_columns=args.columns,
-        schema_type=args.schema_type
+        schema_type=args.schema_type,
+        insert_method=args.insert_method,
+        copy_format=args.copy_format,
+        rate_schedule=rate_schedule,
+        generator=args.generator,
+        writer=args.writer,
+        async_connections=args.async_connections,
+        commit_ordering=args.commit_ordering,
+        stamp_writes=args.stamp_writes,
+        seed=args.seed,
+        record_path=args.record,
+        key_distribution=args.key_distribution,
+        delete_distribution=args.delete_distribution,
+        zipf_s=args.zipf_s,
+        hotspot_fraction=args.hotspot_fraction,
+        hotspot_probability=args.hotspot_probability,
+        mix=args.mix,
+        update_mode=args.update_mode,
+        rows_per_txn=args.rows_per_txn,
+        statements_per_txn=args.statements_per_txn,
+        sessions=args.sessions,
+        wal_sample_file=args.wal_sample_file,
+        wal_sample_interval=args.wal_sample_interval,
+        metrics=metrics
     )
-    generator.run(duration_seconds=args.duration) 
+    if args.replay:
+        generator.replay(args.replay, speed=args.replay_speed)
+    else:
+        generator.run(duration_seconds=args.duration, workers=args.workers) 
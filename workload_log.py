@@ -0,0 +1,99 @@
+import json
+import os
+import pickle
+import struct
+import time
+import zlib
+
+MAGIC = b'WKLOG1\n'
+
+# Operation types
+INSERT = 1
+UPDATE = 2
+DELETE = 3
+COMMIT = 4
+UPDATE_ROWS = 5
+
+OP_NAMES = {INSERT: "insert", UPDATE: "update", DELETE: "delete", COMMIT: "commit",
+            UPDATE_ROWS: "update_rows"}
+
+# op type, seconds since the start of the recording, payload length
+FRAME_HEADER = struct.Struct('!BdI')
+HEADER_LENGTH = struct.Struct('!I')
+
+class WorkloadLogWriter:
+    """Append the exact operation stream of a workload run to a binary log.
+
+    The file starts with MAGIC and a length-prefixed JSON header describing
+    the table. Each operation is then one frame: op type, time relative to
+    the start of the recording, and a zlib-compressed pickle of its payload:
+      INSERT       (columns, rows, ids)   rows are tuples in column order
+      UPDATE       (ids, values)          values maps each SET column to its value
+      UPDATE_ROWS  (ids, columns, rows)   one row of new values per id
+      DELETE       ids
+      COMMIT       None
+    """
+
+    def __init__(self, path, header):
+        self.f = open(path, 'wb')
+        header_bytes = json.dumps(header).encode('utf-8')
+        self.f.write(MAGIC + HEADER_LENGTH.pack(len(header_bytes)) + header_bytes)
+        self.start_time = time.time()
+        self.frames = 0
+
+    def write(self, op, payload=None):
+        data = zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        self.f.write(FRAME_HEADER.pack(op, time.time() - self.start_time, len(data)))
+        self.f.write(data)
+        self.frames += 1
+
+    def insert(self, columns, rows, ids):
+        self.write(INSERT, (list(columns), rows, ids))
+
+    def update(self, ids, values):
+        self.write(UPDATE, (ids, values))
+
+    def update_rows(self, ids, columns, rows):
+        self.write(UPDATE_ROWS, (ids, list(columns), rows))
+
+    def delete(self, ids):
+        self.write(DELETE, ids)
+
+    def commit(self):
+        self.write(COMMIT)
+
+    def close(self):
+        self.f.close()
+
+class WorkloadLogReader:
+    """Iterate (op, relative_time, payload) over a log written by WorkloadLogWriter.
+
+    Payloads are pickles, so only replay logs you recorded yourself.
+    """
+
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        self.size = os.fstat(self.f.fileno()).st_size
+        if self.f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a workload log")
+        (length,) = HEADER_LENGTH.unpack(self.f.read(HEADER_LENGTH.size))
+        self.header = json.loads(self.f.read(length))
+
+    def progress(self):
+        """Fraction of the file read so far"""
+        return self.f.tell() / self.size if self.size else 1.0
+
+    def __iter__(self):
+        while True:
+            frame = self.f.read(FRAME_HEADER.size)
+            if len(frame) < FRAME_HEADER.size:
+                # End of file, or a frame cut short by a crash while recording
+                return
+            op, relative_time, length = FRAME_HEADER.unpack(frame)
+            data = self.f.read(length)
+            if len(data) < length:
+                return
+            yield op, relative_time, pickle.loads(zlib.decompress(data))
+
+    def close(self):
+        self.f.close()